@@ -0,0 +1,503 @@
+import random
+import select
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import metrics
+from framing import FrameError, check_length, recv_exactly, recv_into_exactly, sendall_buffers
+
+# Segment header: magic, protocol version, kind, flags, sequence number, payload length,
+# CRC-32 of the payload
+SEGMENT_MAGIC = b"CDSR"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct("!4sBBBIII")
+
+# Segment kinds: a chunk of the message, an acknowledgement (sequence number of the next
+# chunk expected in order, with a bitmap of the chunks received after it), a negative
+# acknowledgement of a corrupt chunk, and the end of the message (sent back as confirmation)
+KIND_DATA = 0
+KIND_ACK = 1
+KIND_NAK = 2
+KIND_END = 3
+
+# Set on the last chunk of a message
+FLAG_LAST = 0x01
+
+# Chunks that may be in flight past the oldest unacknowledged one
+WINDOW = 8
+
+# Retransmission timeout (seconds) before the first round-trip measurement, and its bounds
+INITIAL_TIMEOUT = 1.0
+MIN_TIMEOUT = 0.2
+MAX_TIMEOUT = 30.0
+
+# A chunk retransmitted this many times aborts the transfer
+MAX_RETRIES = 10
+
+
+class ArqError(ConnectionError):
+    """Raised when the receiver stops acknowledging a message."""
+
+
+class ArqReport:
+    """
+    What the ARQ layer had to do for one message.
+
+    The sender counts chunks sent, retransmissions and their causes; the
+    receiver counts chunks accepted, corrupt chunks and duplicates.
+    """
+
+    def __init__(self):
+        self.chunks = 0
+        self.retransmitted = 0
+        self.corrupt = 0
+        self.lost = 0
+        self.timeouts = 0
+        self.duplicates = 0
+
+    def __repr__(self):
+        return (
+            f"ArqReport(chunks={self.chunks}, retransmitted={self.retransmitted}, "
+            f"corrupt={self.corrupt}, lost={self.lost}, timeouts={self.timeouts}, "
+            f"duplicates={self.duplicates})"
+        )
+
+
+def segment_buffers(kind, seq, payload=b"", flags=0):
+    """Header and payload of one ARQ segment, ready for a gathered write."""
+    payload = memoryview(payload).cast("B")
+    check_length(payload.nbytes)
+    header = SEGMENT_HEADER.pack(
+        SEGMENT_MAGIC, SEGMENT_VERSION, kind, flags, seq, payload.nbytes, zlib.crc32(payload)
+    )
+    return [header, payload]
+
+
+def send_segment(sock, kind, seq, payload=b"", flags=0):
+    """Send one ARQ segment (header and payload in a single gathered write)."""
+    sendall_buffers(sock, segment_buffers(kind, seq, payload, flags))
+
+
+def parse_segment_header(header):
+    """
+    Unpack and validate a segment header.
+
+    Returns:
+        tuple: (kind, flags, seq, payload length, checksum)
+
+    Raises:
+        FrameError: If the magic or the version is wrong, or the length exceeds MAX_FRAME_BYTES
+    """
+    magic, version, kind, flags, seq, length, checksum = SEGMENT_HEADER.unpack(header)
+    if magic != SEGMENT_MAGIC:
+        raise FrameError("Cabeçalho de segmento inválido")
+    if version != SEGMENT_VERSION:
+        raise FrameError(f"Versão de segmento não suportada: {version}")
+    check_length(length)
+    return kind, flags, seq, length, checksum
+
+
+def _recv_segment_parts(sock):
+    """Receive one segment as (header bytes, kind, flags, seq, payload, checksum), or None at EOF."""
+    header = bytearray(SEGMENT_HEADER.size)
+    count = sock.recv_into(header)
+    if count == 0:
+        return None
+    recv_into_exactly(sock, memoryview(header)[count:])
+    kind, flags, seq, length, checksum = parse_segment_header(header)
+    with metrics.stage("recv") as timer:
+        payload = recv_exactly(sock, length)
+        timer.add(n_bytes=length)
+    return header, kind, flags, seq, payload, checksum
+
+
+def recv_segment(sock):
+    """
+    Receive one ARQ segment.
+
+    A corrupt payload is not an error here: the receiver answers it with a
+    NAK. Headers are trusted, as they are with frames.
+
+    Args:
+        sock (socket.socket): Connected socket
+
+    Returns:
+        tuple: (kind, flags, seq, payload, intact), or None if the peer closed
+            the connection between segments
+
+    Raises:
+        FrameError: If the header is invalid or the connection closes mid-segment
+    """
+    parts = _recv_segment_parts(sock)
+    if parts is None:
+        return None
+    _, kind, flags, seq, payload, checksum = parts
+    return kind, flags, seq, payload, zlib.crc32(payload) == checksum
+
+
+def _with_last(payloads):
+    """Pair each payload with whether it is the last one (an empty message is one empty chunk)."""
+    previous = None
+    for payload in payloads:
+        if previous is not None:
+            yield previous, False
+        previous = payload
+    yield (previous if previous is not None else b""), True
+
+
+def _received(bitmap, index):
+    return index < 8 * len(bitmap) and bitmap[index >> 3] >> (7 - (index & 7)) & 1
+
+
+class _SendWindow:
+    """Sender side of selective repeat: chunks in flight, their timers and the acknowledgements."""
+
+    def __init__(self, sock, report, size):
+        self.sock = sock
+        self.report = report
+        self.size = size
+        self.unacked = {}  # seq -> [payload, flags, last send time, retransmissions]
+        self.srtt = None
+        self.rttvar = 0.0
+        self.timeout = INITIAL_TIMEOUT
+
+    def send(self, seq, payload, flags):
+        send_segment(self.sock, KIND_DATA, seq, payload, flags)
+        self.unacked[seq] = [payload, flags, time.monotonic(), 0]
+        self.report.chunks += 1
+
+    def retransmit(self, seq):
+        entry = self.unacked[seq]
+        if entry[3] == MAX_RETRIES:
+            raise ArqError(f"Trecho {seq} sem confirmação após {MAX_RETRIES} retransmissões")
+        send_segment(self.sock, KIND_DATA, seq, entry[0], entry[1])
+        entry[2] = time.monotonic()
+        entry[3] += 1
+        self.report.retransmitted += 1
+
+    def full(self, seq):
+        return bool(self.unacked) and seq >= min(self.unacked) + self.size
+
+    def wait(self):
+        """Block until an acknowledgement arrives or the oldest chunk times out."""
+        oldest = min(entry[2] for entry in self.unacked.values())
+        self.poll(max(oldest + self.timeout - time.monotonic(), 0))
+        now = time.monotonic()
+        expired = [seq for seq, entry in self.unacked.items() if now - entry[2] >= self.timeout]
+        for seq in expired:
+            self.report.timeouts += 1
+            self.retransmit(seq)
+        if expired:
+            self.timeout = min(2 * self.timeout, MAX_TIMEOUT)
+
+    def poll(self, wait):
+        """Handle the segments that arrive within wait seconds (0: only those already here)."""
+        readable, _, _ = select.select([self.sock], [], [], wait)
+        while readable:
+            segment = recv_segment(self.sock)
+            if segment is None:
+                raise ArqError("O receptor encerrou a conexão antes de confirmar a mensagem")
+            self._control(*segment)
+            readable, _, _ = select.select([self.sock], [], [], 0)
+
+    def _control(self, kind, flags, seq, payload, intact):
+        if not intact:
+            return  # A damaged acknowledgement is ignored; a later one or the timeout covers it
+        if kind == KIND_NAK:
+            if seq in self.unacked:
+                self.report.corrupt += 1
+                self.retransmit(seq)
+            return
+        if kind != KIND_ACK:
+            raise FrameError(f"Segmento inesperado do receptor (tipo {kind})")
+
+        now = time.monotonic()
+        # seq itself is the chunk still expected: only those after it are in the bitmap
+        acked = [
+            s for s in self.unacked if s < seq or (s > seq and _received(payload, s - seq - 1))
+        ]
+        latest = None
+        for s in acked:
+            _, _, sent_at, retries = self.unacked.pop(s)
+            if not retries:  # Retransmitted chunks give ambiguous round trips (Karn)
+                self._measure(now - sent_at)
+            latest = sent_at if latest is None else max(latest, sent_at)
+
+        # Chunks arrive in order, so one sent before an acknowledged chunk and still missing was lost
+        if latest is not None:
+            for s in [s for s, entry in self.unacked.items() if entry[2] < latest]:
+                self.report.lost += 1
+                self.retransmit(s)
+
+    def _measure(self, rtt):
+        """Update the retransmission timeout from a round-trip sample (RFC 6298)."""
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.timeout = min(max(self.srtt + 4 * self.rttvar, MIN_TIMEOUT), MAX_TIMEOUT)
+
+
+def send_segments(sock, payloads, report=None, window=WINDOW):
+    """
+    Send a message as numbered chunks with selective-repeat ARQ.
+
+    Up to window chunks past the oldest unacknowledged one are kept in
+    flight. A chunk is sent again when the receiver reports it corrupt
+    (NAK), when a chunk sent after it is acknowledged first (it was lost)
+    or when its retransmission timeout expires. The timeout follows the
+    measured round trip, which includes the receiver's decoding time.
+    Returns only once the receiver has acknowledged every chunk.
+
+    Args:
+        sock (socket.socket): Connected socket
+        payloads (iterable): Bytes-like chunks, produced lazily
+        report (ArqReport): Filled with what was retransmitted and why
+        window (int): Window size in chunks (the receiver buffers as many)
+
+    Returns:
+        int: Number of payload bytes in the message (retransmissions not counted)
+
+    Raises:
+        ArqError: If a chunk is retransmitted MAX_RETRIES times or the receiver disconnects
+    """
+    sender = _SendWindow(sock, report if report is not None else ArqReport(), window)
+    sent = 0
+    for seq, (payload, last) in enumerate(_with_last(payloads)):
+        while sender.full(seq):
+            sender.wait()
+        sender.send(seq, payload, FLAG_LAST if last else 0)
+        sent += len(payload)
+        sender.poll(0)
+    while sender.unacked:
+        sender.wait()
+
+    # The receiver echoes END: whatever it sent before (late acknowledgements) is discarded
+    # here, so nothing is left on the connection for the next message
+    send_segment(sock, KIND_END, seq + 1)
+    while True:
+        segment = recv_segment(sock)
+        if segment is None:
+            raise ArqError("O receptor encerrou a conexão antes de confirmar a mensagem")
+        if segment[0] == KIND_END:
+            return sent
+
+
+class ReceiveWindow:
+    """
+    Receiver side of selective repeat, without I/O: shared by recv_segments and the asyncio server.
+
+    handle() takes each received segment and returns the segments to send
+    back and the chunks that are now in order; done is set once the
+    sender's END has been answered.
+
+    Args:
+        report (ArqReport): Filled with the corrupt and duplicate chunks seen
+        window (int): Window size in chunks (must match the sender's)
+    """
+
+    def __init__(self, report=None, window=WINDOW):
+        self.report = report if report is not None else ArqReport()
+        self.window = window
+        self.expected = 0
+        self.buffered = {}
+        self.total = None
+        self.done = False
+
+    def started(self):
+        """Whether any chunk of the message has been accepted."""
+        return self.expected > 0 or bool(self.buffered)
+
+    def handle(self, kind, flags, seq, payload, intact):
+        """
+        Process one segment from the sender.
+
+        Returns:
+            tuple: (replies as (kind, seq, payload) tuples, chunk payloads now in order)
+
+        Raises:
+            FrameError: If the sender breaks the protocol
+        """
+        if kind == KIND_END and self.total is not None and self.expected == self.total:
+            self.done = True
+            return [(KIND_END, seq, b"")], []
+        if kind != KIND_DATA:
+            raise FrameError(f"Segmento inesperado do transmissor (tipo {kind})")
+        if not intact:
+            self.report.corrupt += 1
+            return [(KIND_NAK, seq, b"")], []
+
+        if flags & FLAG_LAST:
+            self.total = seq + 1
+        if seq < self.expected or seq in self.buffered:
+            self.report.duplicates += 1
+        elif seq >= self.expected + self.window:
+            raise FrameError(f"Trecho {seq} fora da janela (esperado {self.expected})")
+        else:
+            self.buffered[seq] = payload
+            self.report.chunks += 1
+
+        ready = []
+        while self.expected in self.buffered:
+            ready.append(self.buffered.pop(self.expected))
+            self.expected += 1
+        return [(KIND_ACK, self.expected, self._bitmap())], ready
+
+    def _bitmap(self):
+        """Chunks received after the first missing one, one bit each (the ACK payload)."""
+        bitmap = bytearray((self.window + 7) // 8)
+        for seq in self.buffered:
+            index = seq - self.expected - 1
+            bitmap[index >> 3] |= 0x80 >> (index & 7)
+        return bitmap
+
+
+def recv_segments(sock, report=None, window=WINDOW):
+    """
+    Yield the chunks of one ARQ message in order, acknowledging them as they arrive.
+
+    Every chunk is acknowledged before it is yielded, so the sender's
+    timers do not wait for the decoding. Corrupt chunks are answered with
+    a NAK, chunks that arrive after a missing one wait in a buffer of at
+    most window chunks, and duplicates are acknowledged again.
+
+    Args:
+        sock (socket.socket): Connected socket
+        report (ArqReport): Filled with the corrupt and duplicate chunks seen
+        window (int): Window size in chunks (must match the sender's)
+
+    Yields:
+        bytearray: Chunk payloads, in order
+
+    Raises:
+        FrameError: If the connection closes mid-message or the sender breaks the protocol
+    """
+    receiver = ReceiveWindow(report, window)
+    while not receiver.done:
+        segment = recv_segment(sock)
+        if segment is None:
+            if not receiver.started():
+                return  # The sender closed between messages
+            raise FrameError(f"Conexão encerrada após {receiver.expected} trechos da mensagem")
+        replies, ready = receiver.handle(*segment)
+        for kind, seq, payload in replies:
+            send_segment(sock, kind, seq, payload)
+        yield from ready
+
+
+class LossyProxy:
+    """
+    TCP relay that loses and corrupts ARQ chunks, to exercise retransmission over loopback.
+
+    Each connection accepted on (host, port) is relayed to target. Chunks
+    on their way to the receiver are dropped with probability drop_rate or
+    get one payload byte flipped with probability corrupt_rate, and
+    acknowledgements on their way back are dropped with probability
+    ack_drop_rate. Headers and END segments always go through, since the
+    relay stands in for a link under a byte stream that keeps its framing.
+
+    Args:
+        target (tuple): (host, port) of the receiver
+        drop_rate (float): Probability of losing a chunk
+        corrupt_rate (float): Probability of corrupting a chunk
+        ack_drop_rate (float): Probability of losing an acknowledgement
+        seed (int): Seed of the random decisions (None: unpredictable)
+        host (str): Address to listen on
+        port (int): Port to listen on (0 picks a free one, see address)
+    """
+
+    def __init__(
+        self,
+        target,
+        drop_rate=0.0,
+        corrupt_rate=0.0,
+        ack_drop_rate=0.0,
+        seed=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.target = target
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.ack_drop_rate = ack_drop_rate
+        self.dropped = 0
+        self.corrupted = 0
+        self.acks_dropped = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()
+
+    def start(self):
+        """Accept connections in a background thread."""
+        threading.Thread(target=self._accept, name=f"proxy-{self.address[1]}", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop accepting connections (relays in progress end when their peers close)."""
+        self._server.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return  # stop() closed the listening socket
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                client.close()
+                continue
+            for source, destination, to_receiver in ((client, upstream, True), (upstream, client, False)):
+                threading.Thread(
+                    target=self._relay, args=(source, destination, to_receiver), daemon=True
+                ).start()
+
+    def _impair(self, kind, payload, to_receiver):
+        """Return the payload to relay (possibly corrupted), or None to drop the segment."""
+        with self._lock:
+            draw = self._random.random()
+            if to_receiver and kind == KIND_DATA:
+                if draw < self.drop_rate:
+                    self.dropped += 1
+                    return None
+                if draw < self.drop_rate + self.corrupt_rate and payload:
+                    self.corrupted += 1
+                    payload[self._random.randrange(len(payload))] ^= 0xFF
+            elif not to_receiver and kind == KIND_ACK and draw < self.ack_drop_rate:
+                self.acks_dropped += 1
+                return None
+        return payload
+
+    def _relay(self, source, destination, to_receiver):
+        try:
+            while True:
+                parts = _recv_segment_parts(source)
+                if parts is None:
+                    destination.shutdown(socket.SHUT_WR)
+                    return
+                header, kind, _, _, payload, _ = parts
+                payload = self._impair(kind, payload, to_receiver)
+                if payload is not None:
+                    destination.sendall(bytes(header) + payload)
+        except (OSError, FrameError):
+            for sock in (source, destination):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        finally:
+            if not to_receiver:
+                source.close()
+                destination.close()
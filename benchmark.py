@@ -0,0 +1,583 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from arq import ArqReport, LossyProxy
+from channel import Channel, run_trials
+from encoding_module import (
+    FORMAT_BASE3,
+    FORMAT_FLOAT32,
+    FORMAT_PACKED2,
+    bits_to_bytes,
+    bits_to_string,
+    bytes_to_bits,
+    decode_line_code,
+    decode_line_code_python,
+    encode_line_code,
+    encode_line_code_python,
+    encrypt_bytes,
+    encrypt_into,
+    encrypt_message,
+    pack_signal,
+    unpack_signal,
+)
+from fec import FecDecoder, encode_blocks
+from line_codes import LINE_CODES
+from pipeline import (
+    decoded_chunks,
+    encode_stream,
+    receive_stream,
+    send_stream,
+)
+
+# Largest message (bytes) processed as whole arrays; bigger ones only go through the chunked pipeline
+IN_MEMORY_BYTES = 4 * 1024 * 1024
+
+# Largest messages given to the original bit-by-bit implementations (the decoder is quadratic)
+PYTHON_ENCODE_BYTES = 16 * 1024
+PYTHON_DECODE_BYTES = 2 * 1024
+
+# A run is a regression when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 0.25
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+SIGNAL_FORMAT_NAMES = {
+    FORMAT_PACKED2: "packed2",
+    FORMAT_BASE3: "base3",
+    FORMAT_FLOAT32: "float32",
+}
+
+
+def parse_size(text):
+    """Parse a size such as 512, 64K or 256M into a number of bytes."""
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    return int(float(text[: len(text) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def format_size(n_bytes):
+    for unit in ("G", "M", "K"):
+        if n_bytes >= SIZE_UNITS[unit] and n_bytes % SIZE_UNITS[unit] == 0:
+            return f"{n_bytes // SIZE_UNITS[unit]}{unit}"
+    return str(n_bytes)
+
+
+def make_bits(n_bits, pattern="random", seed=0):
+    """
+    Build a bit array used as benchmark input.
+
+    Args:
+        n_bits (int): Number of bits
+        pattern (str): "random", "zeros" (forces a substitution every 4 bits), "ones"
+            or "sparse" (5% of ones: zero runs of every length)
+        seed (int): Seed for the random pattern
+
+    Returns:
+        numpy.ndarray: uint8 array of 0/1 values
+    """
+    if pattern == "zeros":
+        return np.zeros(n_bits, dtype=np.uint8)
+    if pattern == "ones":
+        return np.ones(n_bits, dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    if pattern == "sparse":
+        return (rng.random(n_bits) < 0.05).astype(np.uint8)
+    return rng.integers(0, 2, n_bits, dtype=np.uint8)
+
+
+def make_data(n_bytes, pattern="random", seed=0):
+    """Bytes whose bits follow the pattern of make_bits."""
+    if pattern == "zeros":
+        return bytes(n_bytes)
+    if pattern == "ones":
+        return b"\xff" * n_bytes
+    if pattern == "sparse":
+        return bits_to_bytes(make_bits(8 * n_bytes, pattern, seed))
+    return np.random.default_rng(seed).integers(0, 256, n_bytes, dtype=np.uint8).tobytes()
+
+
+def best_time(func, *args, repeat=3, **kwargs):
+    """Return the best wall-clock time (seconds) of func(*args, **kwargs) over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def consume(iterable):
+    """Drain an iterator (a pipeline of generators), returning the number of bytes it yielded."""
+    return sum(len(item) for item in iterable)
+
+
+class Results:
+    """
+    Collects timings as flat records and prints them as they come.
+
+    Each record is identified by (group, name, pattern, bytes), which is
+    what compare() matches between two runs.
+
+    Args:
+        repeat (int): Default number of runs per measurement (the best one is kept)
+    """
+
+    def __init__(self, repeat=3):
+        self.repeat = repeat
+        self.records = []
+
+    def time(self, group, name, pattern, n_bytes, func, *args, repeat=None, **kwargs):
+        seconds = best_time(func, *args, repeat=repeat or self.repeat, **kwargs)
+        rate = n_bytes / seconds if seconds else None
+        self.records.append(
+            {
+                "group": group,
+                "name": name,
+                "pattern": pattern,
+                "bytes": n_bytes,
+                "seconds": seconds,
+                "bytes_per_second": rate,
+            }
+        )
+        print(
+            f"{group:>10} {name:>18} {pattern:>7} {format_size(n_bytes):>6}"
+            f" {seconds:12.6f} s {rate / 1e6 if rate else 0:10.2f} MB/s"
+        )
+        return seconds
+
+    def to_json(self, path):
+        document = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "results": self.records,
+        }
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+
+
+def compare(records, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare a run against a baseline JSON file written by Results.to_json.
+
+    Args:
+        records (list): Records of the current run
+        baseline_path (str): Path of the baseline file
+        threshold (float): Relative slowdown considered a regression
+
+    Returns:
+        list: (key, baseline seconds, current seconds) of every regression
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    key = lambda r: (r["group"], r["name"], r["pattern"], r["bytes"])
+    previous = {key(r): r["seconds"] for r in baseline}
+
+    regressions = []
+    print(f"\nComparação com {baseline_path} (limite: +{threshold:.0%})")
+    for record in records:
+        before = previous.get(key(record))
+        if not before:
+            continue
+        change = record["seconds"] / before - 1
+        if change > threshold:
+            regressions.append((key(record), before, record["seconds"]))
+        group, name, pattern, n_bytes = key(record)
+        print(
+            f"{group:>10} {name:>18} {pattern:>7} {format_size(n_bytes):>6}"
+            f" {change:+9.1%} {'REGRESSÃO' if change > threshold else ''}"
+        )
+    return regressions
+
+
+def check_parallel_parity(bits, signal, workers):
+    """Check that the multiprocess encoder/decoder match the serial ones on this input."""
+    from parallel_hdb3 import parallel_decode, parallel_encode
+
+    if parallel_encode(bits, workers).tobytes() != signal.tobytes():
+        raise AssertionError("parallel_encode diverge de encode_line_code")
+    if parallel_decode(signal, workers).tobytes() != decode_line_code(signal).tobytes():
+        raise AssertionError("parallel_decode diverge de decode_line_code")
+
+
+def bench_line_codes(results, sizes, patterns):
+    """
+    Every registered line code through the same measurements: whole-array
+    encode/decode and the chunked pipeline roundtrip, packed 2 bits per symbol.
+    """
+    for pattern in patterns:
+        for n_bytes in sizes:
+            data = make_data(n_bytes, pattern)
+            repeat = 1 if n_bytes > IN_MEMORY_BYTES else None
+            for name, line_code in LINE_CODES.items():
+                if n_bytes <= IN_MEMORY_BYTES:
+                    bits = bytes_to_bits(data)
+                    signal = line_code.encode(bits)
+                    results.time("line_codes", f"encode {name}", pattern, n_bytes, line_code.encode, bits)
+                    results.time("line_codes", f"decode {name}", pattern, n_bytes, line_code.decode, signal)
+                results.time(
+                    "line_codes", f"roundtrip {name}", pattern, n_bytes,
+                    roundtrip, data, FORMAT_PACKED2, name, repeat=repeat,
+                )
+
+
+def bench_line_code(results, sizes, patterns, workers=None):
+    """
+    Whole-array HDB3 encode/decode, against the original implementations on small inputs.
+
+    Both engines are measured: "vector" (vectorized over the bits) and
+    "table" (one state/byte table lookup per input byte).
+    With workers, the multiprocess mode is also measured (its output is
+    checked against the serial one first).
+    """
+    for pattern in patterns:
+        for n_bytes in sizes:
+            if n_bytes > IN_MEMORY_BYTES:
+                continue
+            bits = make_bits(8 * n_bytes, pattern)
+            signal = encode_line_code(bits)
+            if n_bytes <= PYTHON_ENCODE_BYTES:
+                results.time(
+                    "line_code", "encode python", pattern, n_bytes,
+                    encode_line_code_python, bits_to_string(bits), repeat=1,
+                )
+            results.time("line_code", "encode vector", pattern, n_bytes, encode_line_code, bits)
+            results.time(
+                "line_code", "encode table", pattern, n_bytes,
+                encode_line_code, bits, engine="table",
+            )
+            if n_bytes <= PYTHON_DECODE_BYTES:
+                results.time(
+                    "line_code", "decode python", pattern, n_bytes,
+                    decode_line_code_python, signal, repeat=1,
+                )
+            results.time("line_code", "decode vector", pattern, n_bytes, decode_line_code, signal)
+            results.time(
+                "line_code", "decode table", pattern, n_bytes,
+                decode_line_code, signal, engine="table",
+            )
+            if workers:
+                check_parallel_parity(bits, signal, workers)
+                results.time(
+                    "line_code", f"encode x{workers}", pattern, n_bytes,
+                    encode_line_code, bits, workers,
+                )
+                results.time(
+                    "line_code", f"decode x{workers}", pattern, n_bytes,
+                    decode_line_code, signal, workers,
+                )
+
+
+def bench_bits(results, sizes, patterns):
+    """Bit conversion and the wire formats of the signal."""
+    for pattern in patterns:
+        for n_bytes in sizes:
+            if n_bytes > IN_MEMORY_BYTES:
+                continue
+            data = make_data(n_bytes, pattern)
+            bits = bytes_to_bits(data)
+            results.time("bits", "bytes_to_bits", pattern, n_bytes, bytes_to_bits, data)
+            results.time("bits", "bits_to_bytes", pattern, n_bytes, bits_to_bytes, bits)
+            signal = encode_line_code(bits)
+            for signal_format, name in SIGNAL_FORMAT_NAMES.items():
+                payload = pack_signal(signal, signal_format)
+                results.time(
+                    "bits", f"pack {name}", pattern, n_bytes, pack_signal, signal, signal_format
+                )
+                results.time("bits", f"unpack {name}", pattern, n_bytes, unpack_signal, payload)
+
+
+def bench_cipher(results, sizes):
+    """Caesar cipher: legacy str API, bytes API and in place."""
+    for n_bytes in sizes:
+        data = make_data(n_bytes)
+        buffer = bytearray(data)
+        if n_bytes <= IN_MEMORY_BYTES:
+            results.time(
+                "cipher", "encrypt_message", "random", n_bytes,
+                encrypt_message, data.decode("latin-1"),
+            )
+        results.time("cipher", "encrypt_bytes", "random", n_bytes, encrypt_bytes, data)
+        results.time("cipher", "encrypt_into", "random", n_bytes, encrypt_into, buffer)
+
+
+def roundtrip(data, signal_format, line_code="hdb3", engine="vector"):
+    """Chunked encode -> pack -> unpack -> decode of a whole message, without a socket."""
+    payloads = encode_stream(
+        data, shift=None, signal_format=signal_format, line_code=line_code, engine=engine
+    )
+    return consume(decoded_chunks(payloads, engine=engine))
+
+
+def fec_roundtrip(data, signal_format):
+    """Like roundtrip, with the FEC layer on."""
+    payloads = encode_stream(data, shift=None, signal_format=signal_format, fec=True)
+    decoder = FecDecoder()
+    return consume(decoded_chunks(payloads, decoder.report))
+
+
+def bench_fec(results, sizes, patterns):
+    """FEC layer alone (Hamming blocks + sync words) and the chunked pipeline with it on."""
+    for pattern in patterns:
+        for n_bytes in sizes:
+            data = make_data(n_bytes, pattern)
+            repeat = 1 if n_bytes > IN_MEMORY_BYTES else None
+            if n_bytes <= IN_MEMORY_BYTES:
+                blocks = bytes_to_bits(encode_blocks(data))
+                results.time("fec", "encode blocks", pattern, n_bytes, encode_blocks, data)
+                results.time(
+                    "fec", "decode blocks", pattern, n_bytes,
+                    lambda: FecDecoder().feed(blocks),
+                )
+            results.time(
+                "fec", "roundtrip packed2", pattern, n_bytes,
+                fec_roundtrip, data, FORMAT_PACKED2, repeat=repeat,
+            )
+
+
+def bench_pipeline(results, sizes, patterns, signal_format=FORMAT_PACKED2):
+    """Chunked pipeline, the path every size goes through (memory stays bounded)."""
+    name = SIGNAL_FORMAT_NAMES[signal_format]
+    for pattern in patterns:
+        for n_bytes in sizes:
+            data = make_data(n_bytes, pattern)
+            repeat = 1 if n_bytes > IN_MEMORY_BYTES else None
+            results.time(
+                "pipeline", f"encode {name}", pattern, n_bytes,
+                lambda: consume(encode_stream(data, None, signal_format)), repeat=repeat,
+            )
+            results.time(
+                "pipeline", f"roundtrip {name}", pattern, n_bytes,
+                roundtrip, data, signal_format, repeat=repeat,
+            )
+            results.time(
+                "pipeline", f"roundtrip {name} table", pattern, n_bytes,
+                roundtrip, data, signal_format, engine="table", repeat=repeat,
+            )
+
+
+def loopback_transfer(data, signal_format):
+    """Send one message over a loopback TCP connection and receive it in full."""
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        received = []
+
+        def receiver():
+            conn, _ = server.accept()
+            with conn:
+                received.append(consume(receive_stream(conn, shift=None)))
+
+        thread = threading.Thread(target=receiver)
+        thread.start()
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            send_stream(sock, data, shift=None, signal_format=signal_format)
+        thread.join()
+    if received != [len(data)]:
+        raise AssertionError(f"Transferência incompleta: {received} de {len(data)} bytes")
+
+
+def arq_transfer(data, drop_rate=0.0, corrupt_rate=0.0, chunk_size=64 * 1024, seed=0):
+    """
+    Send one message with ARQ through a LossyProxy over loopback and check it arrives intact.
+
+    Returns:
+        ArqReport: The sender's report
+    """
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        received = []
+
+        def receiver():
+            conn, _ = server.accept()
+            with conn:
+                received.append(b"".join(receive_stream(conn, None, arq_report=ArqReport())))
+
+        thread = threading.Thread(target=receiver)
+        thread.start()
+        report = ArqReport()
+        with LossyProxy(server.getsockname(), drop_rate, corrupt_rate, seed=seed) as proxy:
+            with socket.create_connection(proxy.address) as sock:
+                send_stream(sock, data, None, chunk_size=chunk_size, arq_report=report)
+            thread.join()
+    if received != [data]:
+        raise AssertionError(f"ARQ: mensagem diferente após a transferência ({report})")
+    return report
+
+
+def bench_arq(results, sizes, patterns, loss_rates=(0.0, 0.05, 0.2)):
+    """ARQ transfer over loopback through the lossy proxy, half of the loss being corruption."""
+    for pattern in patterns:
+        for n_bytes in sizes:
+            if n_bytes > IN_MEMORY_BYTES:
+                continue
+            data = make_data(n_bytes, pattern)
+            for rate in loss_rates:
+                results.time(
+                    "arq", f"loopback {rate:.0%} loss", pattern, n_bytes,
+                    arq_transfer, data, rate / 2, rate / 2, repeat=1,
+                )
+
+
+def bench_channel(results, sizes, n_bits=4096):
+    """Monte-Carlo channel simulation (trials of n_bits random bits), sized by total message bytes."""
+    channels = {
+        "awgn 12dB": Channel(snr_db=12),
+        "awgn+wander+slips": Channel(attenuation_db=6, snr_db=12, coupling=500, slip_rate=1e-5),
+    }
+    for n_bytes in sizes:
+        if n_bytes > IN_MEMORY_BYTES or 8 * n_bytes < n_bits:
+            continue
+        for name, channel in channels.items():
+            results.time(
+                "channel", name, "random", n_bytes,
+                run_trials, channel, 8 * n_bytes // n_bits, n_bits, repeat=1,
+            )
+
+
+def bench_socket(results, sizes, patterns, signal_format=FORMAT_PACKED2):
+    """End-to-end transfer over loopback TCP (encode, frame, send, receive, decode)."""
+    name = SIGNAL_FORMAT_NAMES[signal_format]
+    for pattern in patterns:
+        for n_bytes in sizes:
+            data = make_data(n_bytes, pattern)
+            repeat = 1 if n_bytes > IN_MEMORY_BYTES else None
+            results.time(
+                "socket", f"loopback {name}", pattern, n_bytes,
+                loopback_transfer, data, signal_format, repeat=repeat,
+            )
+
+
+def bench_plots(results, bit_counts):
+    """Time figure creation plus PNG rendering for both plots, as a function of bit count."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    from visualization import figure_to_png, plot_binary_signal, plot_signal_waveform
+
+    for n_bits in bit_counts:
+        bits = make_bits(n_bits)
+        signal = encode_line_code(bits)
+        n_bytes = n_bits // 8
+        results.time(
+            "plots", "signal_waveform", "random", n_bytes,
+            lambda: figure_to_png(plot_signal_waveform(signal)), repeat=1,
+        )
+        results.time(
+            "plots", "binary_signal", "random", n_bytes,
+            lambda: figure_to_png(plot_binary_signal(bits)), repeat=1,
+        )
+
+
+def bench_startup(results, repeat=5):
+    """
+    Time a cold interpreter start for the headless entry points.
+
+    Also checks that none of them drags in Streamlit or Matplotlib.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    check = (
+        "import sys, cli, pipeline, transmitter, receiver_server;"
+        "sys.exit(bool({'streamlit', 'matplotlib'} & set(sys.modules)))"
+    )
+    if subprocess.run([sys.executable, "-c", check], cwd=here).returncode:
+        raise AssertionError("A API sem interface importa streamlit ou matplotlib")
+
+    commands = {
+        "python -c pass": [sys.executable, "-c", "pass"],
+        "cli.py --help": [sys.executable, os.path.join(here, "cli.py"), "--help"],
+        "import pipeline": [sys.executable, "-c", "import pipeline"],
+    }
+    for name, command in commands.items():
+        results.time(
+            "startup", name, "-", 0,
+            subprocess.run, command, repeat=repeat, cwd=here, stdout=subprocess.DEVNULL,
+        )
+
+
+GROUPS = [
+    "line_code",
+    "line_codes",
+    "bits",
+    "cipher",
+    "pipeline",
+    "fec",
+    "channel",
+    "socket",
+    "arq",
+    "plots",
+    "startup",
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do codificador/decodificador de linha HDB3")
+    parser.add_argument(
+        "--sizes",
+        type=parse_size,
+        nargs="+",
+        default=[16, 1024, 64 * 1024, 1024**2, 16 * 1024**2],
+        help="Tamanhos das mensagens em bytes (aceita sufixos K, M, G)",
+    )
+    parser.add_argument(
+        "--large", action="store_true", help="Inclui uma mensagem de 256M (pipeline e socket)"
+    )
+    parser.add_argument(
+        "--patterns", nargs="+", default=["random", "zeros", "ones"]
+    )
+    parser.add_argument(
+        "--plot-sizes",
+        type=int,
+        nargs="+",
+        default=[16, 256, 4_096, 65_536, 1_000_000],
+        help="Quantidades de bits para o benchmark de renderização",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Também mede o modo multiprocesso com este número de processos"
+    )
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por medida (vale a melhor)")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    sizes = sorted(set(args.sizes + ([256 * 1024**2] if args.large else [])))
+    results = Results(args.repeat)
+    if "line_code" in args.only:
+        bench_line_code(results, sizes, args.patterns, args.workers)
+    if "line_codes" in args.only:
+        bench_line_codes(results, sizes, args.patterns)
+    if "bits" in args.only:
+        bench_bits(results, sizes, args.patterns)
+    if "cipher" in args.only:
+        bench_cipher(results, sizes)
+    if "pipeline" in args.only:
+        bench_pipeline(results, sizes, args.patterns)
+    if "fec" in args.only:
+        bench_fec(results, sizes, args.patterns)
+    if "channel" in args.only:
+        bench_channel(results, sizes)
+    if "socket" in args.only:
+        bench_socket(results, sizes, args.patterns)
+    if "arq" in args.only:
+        bench_arq(results, sizes, args.patterns)
+    if "plots" in args.only:
+        bench_plots(results, args.plot_sizes)
+    if "startup" in args.only:
+        bench_startup(results)
+
+    if args.json:
+        results.to_json(args.json)
+        print(f"\nResultados gravados em {args.json}")
+    if args.compare and compare(results.records, args.compare, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,348 @@
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from encoding_module import decode_line_code, encode_line_code
+
+# Slicer decision threshold, as a fraction of the pulse amplitude (midway between 0 and ±A)
+SLICER_THRESHOLD = 0.5
+
+# Percentile of |sample| taken by the slicer's gain control as a first estimate of the pulse
+# amplitude: HDB3 never leaves more than 3 zeros in a row, so in the sparsest case ("10000000"
+# repeated: 1 000V 000) only a quarter of the symbols are pulses, and the percentile sits in the
+# middle of that top quarter. The amplitude is then the median of the samples above half of it
+# (the pulses), which does not depend on how many there are.
+# It is estimated from at most AGC_SAMPLES evenly spaced samples of each row, with an odd
+# stride so the samples do not stay in phase with the 4-symbol period of the substitutions
+AGC_PERCENTILE = 87.5
+AGC_SAMPLES = 1024
+
+# Samples simulated per batch: larger runs are split so memory stays bounded
+BATCH_SAMPLES = 1 << 22
+
+# Zero symbols decoded after each trial: more than the HDB3 decoder looks ahead or back (a B00V or
+# 000V spans 4 symbols), so every trial is decoded as if it were the whole signal
+ROW_GUARD = 4
+
+# The AC coupling filter is truncated where its impulse response falls below this
+COUPLING_TAIL = 1e-4
+
+
+def ac_couple(signals, time_constant):
+    """
+    Pass signals through an AC-coupled (first-order high-pass) link, which causes baseline wander.
+
+    The blocked DC level follows an exponential moving average of the
+    signal, computed for every row at once as an FFT convolution.
+
+    Args:
+        signals (numpy.ndarray): float32 array (trials, samples)
+        time_constant (float): RC time constant of the coupling, in symbols
+
+    Returns:
+        numpy.ndarray: float32 array of the same shape
+    """
+    n = signals.shape[-1]
+    decay = math.exp(-1 / time_constant)
+    taps = min(n, math.ceil(time_constant * math.log(1 / COUPLING_TAIL)))
+    kernel = ((1 - decay) * decay ** np.arange(taps)).astype(np.float32)
+    size = 1 << (n + taps - 1).bit_length()
+    baseline = np.fft.irfft(
+        np.fft.rfft(signals, size, axis=-1) * np.fft.rfft(kernel, size), size, axis=-1
+    )[..., :n]
+    return (signals - baseline).astype(np.float32)
+
+
+def clock_slips(signals, rate, rng):
+    """
+    Make the receiver clock skip or repeat samples at random.
+
+    Each sample starts a slip with probability rate, equally likely a
+    skipped sample (the rest of the row moves one symbol earlier) or a
+    repeated one (one symbol later). Rows keep their length: the last
+    sample is repeated to fill in.
+
+    Args:
+        signals (numpy.ndarray): Array (trials, samples)
+        rate (float): Slip probability per sample
+        rng (numpy.random.Generator): Random source
+
+    Returns:
+        numpy.ndarray: Array of the same shape and dtype
+    """
+    trials, n = signals.shape
+    # Slips are rare: draw how many there are, then where, instead of one number per sample
+    count = rng.binomial(trials * n, rate)
+    steps = np.zeros(trials * n, dtype=np.int32)
+    np.add.at(steps, rng.integers(0, trials * n, count), rng.choice([-1, 1], count).astype(np.int32))
+    offsets = np.cumsum(steps.reshape(trials, n), axis=1, dtype=np.int32)
+    index = np.clip(np.arange(n, dtype=np.int32) + offsets, 0, n - 1)
+    return np.take_along_axis(signals, index, axis=1)
+
+
+def slicer(received, threshold=SLICER_THRESHOLD, amplitude=None):
+    """
+    Decide the ternary level of every received sample, as the receiver would before decoding.
+
+    Args:
+        received (numpy.ndarray): Received samples, one trial per row
+        threshold (float): Decision threshold as a fraction of the pulse amplitude
+        amplitude (float | numpy.ndarray): Pulse amplitude; None estimates it for each
+            row from the median of its pulses (automatic gain control, see AGC_PERCENTILE)
+
+    Returns:
+        numpy.ndarray: float32 array of -1, 0 and +1 values, ready for decode_line_code
+    """
+    if amplitude is None:
+        stride = max(1, received.shape[-1] // AGC_SAMPLES) | 1
+        samples = np.abs(received[..., ::stride])
+        rough = np.percentile(samples, AGC_PERCENTILE, axis=-1, keepdims=True)
+        pulses = np.where(samples > SLICER_THRESHOLD * rough, samples, np.nan)
+        amplitude = np.nanmedian(pulses, axis=-1, keepdims=True)
+    level = threshold * np.asarray(amplitude, dtype=np.float32)
+    return (received > level).astype(np.float32) - (received < -level)
+
+
+class Channel:
+    """
+    Impairments applied to a batch of line-code signals, one trial per row.
+
+    They are applied in the order of a real link: attenuation, AC
+    coupling (baseline wander), additive white Gaussian noise, then clock
+    slips at the receiver.
+
+    Args:
+        attenuation_db (float): Loss of the pulse amplitude in dB
+        snr_db (float): Received pulse amplitude over the noise standard deviation,
+            in dB (None: no noise)
+        coupling (float): Time constant of the AC coupling in symbols (None: DC coupled)
+        slip_rate (float): Probability per symbol of a clock slip
+    """
+
+    def __init__(self, attenuation_db=0.0, snr_db=None, coupling=None, slip_rate=0.0):
+        self.attenuation_db = attenuation_db
+        self.snr_db = snr_db
+        self.coupling = coupling
+        self.slip_rate = slip_rate
+
+    @property
+    def gain(self):
+        return 10 ** (-self.attenuation_db / 20)
+
+    @property
+    def noise_std(self):
+        return 0.0 if self.snr_db is None else self.gain / 10 ** (self.snr_db / 20)
+
+    def apply(self, signals, rng):
+        """
+        Send a batch of signals through the channel.
+
+        Args:
+            signals (numpy.ndarray): Transmitted levels (trials, samples)
+            rng (numpy.random.Generator): Random source
+
+        Returns:
+            numpy.ndarray: float32 received samples, same shape
+        """
+        received = signals.astype(np.float32) * np.float32(self.gain)
+        if self.coupling:
+            received = ac_couple(received, self.coupling)
+        if self.snr_db is not None:
+            noise = rng.standard_normal(received.shape, dtype=np.float32)
+            received += noise * np.float32(self.noise_std)
+        if self.slip_rate:
+            received = clock_slips(received, self.slip_rate, rng)
+        return received
+
+    def ideal_ser(self, zero_fraction):
+        """
+        Symbol error rate of the slicer under noise alone, with a known amplitude.
+
+        A zero is misread when the noise exceeds half the amplitude either
+        way, a pulse only when it pulls the sample below half its amplitude.
+
+        Args:
+            zero_fraction (float): Fraction of zero symbols in the signal
+        """
+        if self.snr_db is None:
+            return 0.0
+        tail = 0.5 * math.erfc(SLICER_THRESHOLD * 10 ** (self.snr_db / 20) / math.sqrt(2))
+        return zero_fraction * 2 * tail + (1 - zero_fraction) * tail
+
+    def __repr__(self):
+        return (
+            f"Channel(attenuation_db={self.attenuation_db}, snr_db={self.snr_db}, "
+            f"coupling={self.coupling}, slip_rate={self.slip_rate})"
+        )
+
+
+def run_trials(channel, trials=1000, n_bits=4096, seed=0, threshold=SLICER_THRESHOLD):
+    """
+    Monte-Carlo run: random bits -> HDB3 -> channel -> slicer -> HDB3 decoder, for many trials.
+
+    All trials of a batch are processed as one (trials, samples) array.
+    Every trial starts from the initial line code state, as a message of
+    its own: rows are encoded one by one, and decoded in a single pass with
+    ROW_GUARD zero symbols after each row, which end every look-ahead and
+    look-back of the decoder before the next row starts.
+
+    Args:
+        channel (Channel): Impairments to apply
+        trials (int): Number of trials (rows)
+        n_bits (int): Bits per trial
+        seed (int): Seed of the bits and of the impairments
+        threshold (float): Slicer threshold (fraction of the pulse amplitude)
+
+    Returns:
+        dict: trials, bits, bit_errors, ber, symbol_errors, ser, ideal_ser (slicer
+            under the same noise alone), worst_trial_ber, seconds and
+            symbols_per_second (simulation speed)
+    """
+    rng = np.random.default_rng(seed)
+    rows = max(1, BATCH_SAMPLES // n_bits)
+    bit_errors = symbol_errors = zeros = 0
+    worst = 0.0
+    start = time.perf_counter()
+    for first in range(0, trials, rows):
+        count = min(rows, trials - first)
+        bits = rng.integers(0, 2, (count, n_bits), dtype=np.uint8)
+        sent = np.stack([encode_line_code(row) for row in bits])
+        sliced = slicer(channel.apply(sent, rng), threshold)
+        guarded = np.zeros((count, n_bits + ROW_GUARD), dtype=sliced.dtype)
+        guarded[:, :n_bits] = sliced
+        decoded = decode_line_code(guarded.ravel()).reshape(count, -1)[:, :n_bits]
+
+        errors = np.count_nonzero(decoded != bits, axis=1)
+        bit_errors += int(errors.sum())
+        worst = max(worst, int(errors.max()) / n_bits)
+        symbol_errors += int(np.count_nonzero(sliced != sent))
+        zeros += int(np.count_nonzero(sent == 0))
+    seconds = time.perf_counter() - start
+
+    total = trials * n_bits
+    return {
+        "trials": trials,
+        "bits": total,
+        "bit_errors": bit_errors,
+        "ber": bit_errors / total,
+        "symbol_errors": symbol_errors,
+        "ser": symbol_errors / total,
+        "ideal_ser": channel.ideal_ser(zeros / total),
+        "worst_trial_ber": worst,
+        "seconds": seconds,
+        "symbols_per_second": total / seconds if seconds else None,
+    }
+
+
+def ber_curve(snr_dbs, trials=1000, n_bits=4096, seed=0, **channel_options):
+    """
+    Run the Monte-Carlo simulation at each SNR, with the other impairments fixed.
+
+    Args:
+        snr_dbs (iterable): SNR points in dB
+        trials (int): Trials per point
+        n_bits (int): Bits per trial
+        seed (int): Seed (the same for every point)
+        **channel_options: attenuation_db, coupling and slip_rate of the Channel
+
+    Returns:
+        list: One run_trials result per SNR, with its "snr_db"
+    """
+    return [
+        {"snr_db": snr_db, **run_trials(Channel(snr_db=snr_db, **channel_options), trials, n_bits, seed)}
+        for snr_db in snr_dbs
+    ]
+
+
+def plot_ber_curve(points, title="Taxa de erro do HDB3 no canal simulado", figsize=(8, 5)):
+    """
+    Plot the bit and symbol error rates of a simulated channel against the SNR.
+
+    Points without errors are left out, since they cannot be drawn on a
+    log scale.
+
+    Args:
+        points (list): Results of channel.ber_curve
+        title (str): The title of the plot
+        figsize (tuple): Figure size (width, height)
+
+    Returns:
+        matplotlib.figure.Figure: The created figure
+    """
+    import matplotlib.pyplot as plt  # Only needed for --plot
+
+    fig, ax = plt.subplots(figsize=figsize, facecolor="#f9f9f9")
+    ax.set_facecolor("#f9f9f9")
+    snr = np.array([point["snr_db"] for point in points])
+    for key, label, style in (
+        ("ber", "BER (após o decodificador)", "o-"),
+        ("ser", "SER (após o decisor)", "s--"),
+        ("ideal_ser", "SER teórica (só ruído)", ":"),
+    ):
+        rate = np.array([point[key] for point in points])
+        shown = rate > 0
+        ax.semilogy(snr[shown], rate[shown], style, label=label)
+
+    ax.set_title(title, fontsize=14, fontweight="bold")
+    ax.set_xlabel("SNR (dB)", fontsize=12)
+    ax.set_ylabel("Taxa de erro", fontsize=12)
+    ax.grid(True, which="both", linestyle="--", alpha=0.7)
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulação de Monte-Carlo do HDB3 em um canal com ruído (curva de BER)"
+    )
+    parser.add_argument(
+        "--snr", type=float, nargs="+", default=[6, 8, 10, 12, 14, 16, 18], help="Pontos de SNR (dB)"
+    )
+    parser.add_argument("--trials", type=int, default=1000, help="Ensaios por ponto")
+    parser.add_argument("--bits", type=int, default=4096, help="Bits por ensaio")
+    parser.add_argument("--attenuation", type=float, default=0.0, help="Atenuação (dB)")
+    parser.add_argument(
+        "--coupling", type=float, help="Constante de tempo do acoplamento AC, em símbolos"
+    )
+    parser.add_argument("--slip-rate", type=float, default=0.0, help="Escorregamentos por símbolo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Grava os pontos da curva neste arquivo JSON")
+    parser.add_argument("--plot", help="Grava o gráfico da curva neste PNG")
+    args = parser.parse_args(argv)
+
+    points = ber_curve(
+        args.snr,
+        args.trials,
+        args.bits,
+        args.seed,
+        attenuation_db=args.attenuation,
+        coupling=args.coupling,
+        slip_rate=args.slip_rate,
+    )
+    print(f"{'SNR (dB)':>9} {'BER':>11} {'SER':>11} {'SER ideal':>11} {'Msímb/s':>9}")
+    for point in points:
+        print(
+            f"{point['snr_db']:>9g} {point['ber']:>11.3e} {point['ser']:>11.3e} "
+            f"{point['ideal_ser']:>11.3e} {point['symbols_per_second'] / 1e6:>9.1f}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(points, f, indent=1)
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        fig = plot_ber_curve(points)
+        try:
+            fig.savefig(args.plot, format="png", dpi=150)
+        finally:
+            plt.close(fig)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+import argparse
+import socket
+import sys
+
+import metrics
+
+# Only the standard library is imported at startup: NumPy and the pipeline are
+# loaded when a command runs, and Streamlit/Matplotlib are never imported
+DEFAULT_PORT = 65432
+
+# Wire formats accepted on the command line (values of encoding_module.FORMAT_*,
+# repeated here so parsing the arguments does not import NumPy)
+FORMAT_NAMES = {"packed2": 1, "base3": 2, "float32": 0}
+
+# Names in line_codes.LINE_CODES, for the same reason; the receiver detects the code by itself
+LINE_CODE_NAMES = ("hdb3", "ami", "b8zs", "nrz", "manchester", "2b1q")
+
+# HDB3 engines (encoding_module.LINE_CODE_ENGINES); both produce the same output
+ENGINE_NAMES = ("vector", "table")
+
+
+def transmit(
+    host,
+    port,
+    source,
+    shift=3,
+    signal_format=FORMAT_NAMES["packed2"],
+    chunk_size=None,
+    timeout=10.0,
+    fec=False,
+    arq=False,
+    line_code="hdb3",
+    workers=1,
+    engine="vector",
+):
+    """
+    Encrypt, line-encode and send one message.
+
+    Args:
+        host (str): Receiver address
+        port (int): Receiver port
+        source: A bytes-like object or a binary file object
+        shift (int): Caesar cipher shift (None skips encryption)
+        signal_format (int): Wire format of the symbols
+        chunk_size (int): Input bytes per chunk (None uses pipeline.CHUNK_SIZE)
+        timeout (float): Connect/send timeout in seconds
+        fec (bool): Add the FEC layer (the receiver must use fec too)
+        arq (bool): Wait for the receiver to acknowledge every chunk, retransmitting
+            lost or corrupt ones (the receiver must use arq too)
+        line_code (str): Line code name (one of LINE_CODE_NAMES)
+        workers (int): Processes for the HDB3 encoder (None uses every core)
+        engine (str): HDB3 engine (one of ENGINE_NAMES)
+
+    Returns:
+        arq.ArqReport: What had to be retransmitted, or None without arq
+    """
+    from pipeline import CHUNK_SIZE
+    from transmitter import Transmitter
+
+    report = _new_arq_report() if arq else None
+    transmitter = Transmitter(host, port, timeout)
+    try:
+        transmitter.send(
+            source,
+            shift,
+            signal_format,
+            chunk_size or CHUNK_SIZE,
+            fec,
+            report,
+            line_code,
+            workers,
+            engine,
+        )
+    finally:
+        transmitter.close()
+    return report
+
+
+def peer_closed(sock):
+    """Block until the peer sends more data or closes; returns True if it closed."""
+    try:
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except ConnectionError:
+        return True
+
+
+def _incoming_messages(host, port, count, timeout):
+    """Accept transmitters one at a time, yielding (peer, connection) at the start of each message."""
+    received = 0
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen()
+        while not count or received < count:
+            conn, peer = server.accept()
+            with conn:
+                conn.settimeout(timeout)
+                while (not count or received < count) and not peer_closed(conn):
+                    yield peer, conn
+                    received += 1
+
+
+def receive(
+    host="0.0.0.0",
+    port=DEFAULT_PORT,
+    shift=3,
+    count=1,
+    timeout=None,
+    fec=False,
+    arq=False,
+    workers=1,
+    engine="vector",
+):
+    """
+    Accept transmitters one at a time and yield their decoded messages.
+
+    A transmitter may send several messages on the same connection; each
+    one is yielded as (peer, chunks), where chunks is a generator of the
+    decrypted bytes that must be consumed before the next message is read.
+
+    Args:
+        host (str): Address to bind
+        port (int): Port to listen on
+        shift (int): Caesar cipher shift (None skips decryption)
+        count (int): Messages to receive before returning (0 means no limit)
+        timeout (float): Socket timeout in seconds (None blocks)
+        fec (bool): Decode the FEC layer
+        arq (bool): Acknowledge each chunk and have lost or corrupt ones retransmitted
+        workers (int): Processes for the HDB3 decoder (None uses every core)
+        engine (str): HDB3 engine (one of ENGINE_NAMES)
+
+    Yields:
+        tuple: (peer address, generator of bytes chunks), plus the message's
+            fec.FecReport when fec is set and its arq.ArqReport when arq is set
+            (complete once the chunks are consumed)
+    """
+    from pipeline import receive_stream
+
+    for peer, conn in _incoming_messages(host, port, count, timeout):
+        fec_report, arq_report = _new_reports(fec, arq)
+        reports = [report for report in (fec_report, arq_report) if report is not None]
+        chunks = receive_stream(conn, shift, fec_report, arq_report, workers, engine)
+        yield (peer, chunks, *reports)
+
+
+def receive_files(
+    path,
+    host="0.0.0.0",
+    port=DEFAULT_PORT,
+    shift=3,
+    count=1,
+    timeout=None,
+    fec=False,
+    arq=False,
+    workers=1,
+    engine="vector",
+    append=False,
+):
+    """
+    Like receive, but the messages are written to a memory-mapped file.
+
+    The first message replaces the file's contents (unless append is set)
+    and the following ones are appended after it.
+
+    Yields:
+        tuple: (peer address, number of bytes written), plus the fec.FecReport
+            when fec is set and the arq.ArqReport when arq is set
+    """
+    from pipeline import receive_to_file
+
+    for peer, conn in _incoming_messages(host, port, count, timeout):
+        fec_report, arq_report = _new_reports(fec, arq)
+        reports = [report for report in (fec_report, arq_report) if report is not None]
+        size = receive_to_file(
+            conn, path, shift, fec_report, arq_report, workers, engine, append
+        )
+        append = True
+        yield (peer, size, *reports)
+
+
+def _new_reports(fec, arq):
+    """(FecReport or None, ArqReport or None) for one received message."""
+    if fec:
+        from fec import FecReport
+
+        fec_report = FecReport()
+    else:
+        fec_report = None
+    return fec_report, _new_arq_report() if arq else None
+
+
+def _new_arq_report():
+    from arq import ArqReport
+
+    return ArqReport()
+
+
+def _print_report(report, sender=False):
+    if hasattr(report, "corrected_bits"):
+        status = "OK" if report.ok else "com danos"
+        print(
+            f"FEC {status}: {report.blocks} blocos, {report.corrected_bits} bits corrigidos, "
+            f"{report.resyncs} ressincronizações",
+            file=sys.stderr,
+        )
+        if report.damaged:
+            print(f"Blocos danificados: {report.damaged}", file=sys.stderr)
+        return
+    if sender:
+        print(
+            f"ARQ: {report.chunks} trechos confirmados, {report.retransmitted} retransmissões "
+            f"({report.corrupt} corrompidos, {report.lost} perdidos, "
+            f"{report.timeouts} por tempo esgotado)",
+            file=sys.stderr,
+        )
+    else:
+        print(
+            f"ARQ: {report.chunks} trechos aceitos, {report.corrupt} corrompidos (pedidos de novo), "
+            f"{report.duplicates} duplicados",
+            file=sys.stderr,
+        )
+
+
+def _run_transmit(args):
+    def send(source):
+        return transmit(
+            args.host,
+            args.port,
+            source,
+            None if args.no_encrypt else args.shift,
+            FORMAT_NAMES[args.format],
+            args.chunk_size,
+            args.timeout,
+            args.fec,
+            args.arq,
+            args.line_code,
+            args.workers or None,
+            args.engine,
+        )
+
+    if args.message is not None:
+        from encoding_module import text_to_bytes
+
+        report = send(text_to_bytes(args.message))
+    elif args.file in (None, "-"):
+        report = send(sys.stdin.buffer)
+    else:
+        from pipeline import mapped_file
+
+        # The file is memory-mapped: chunks are views of it, never read() copies
+        with mapped_file(args.file) as data:
+            report = send(data)
+    if report is None:
+        print(f"Mensagem enviada para {args.host}:{args.port}", file=sys.stderr)
+        return
+    print(f"Mensagem confirmada por {args.host}:{args.port}", file=sys.stderr)
+    _print_report(report, sender=True)
+
+
+def _run_receive(args):
+    shift = None if args.no_encrypt else args.shift
+    options = dict(
+        shift=shift,
+        count=args.count,
+        fec=args.fec,
+        arq=args.arq,
+        workers=args.workers or None,
+        engine=args.engine,
+    )
+    if args.output not in (None, "-"):
+        messages = receive_files(args.output, args.host, args.port, append=args.append, **options)
+        for peer, size, *reports in messages:
+            print(f"Recebidos {size} bytes de {peer[0]}:{peer[1]}", file=sys.stderr)
+            for report in reports:
+                _print_report(report)
+        return
+
+    output = sys.stdout.buffer
+    for peer, chunks, *reports in receive(args.host, args.port, **options):
+        size = 0
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
+        output.flush()
+        print(f"Recebidos {size} bytes de {peer[0]}:{peer[1]}", file=sys.stderr)
+        for report in reports:
+            _print_report(report)
+
+
+def _run_proxy(args):
+    import time
+
+    from arq import LossyProxy
+
+    host, _, port = args.target.rpartition(":")
+    proxy = LossyProxy(
+        (host or "127.0.0.1", int(port)),
+        args.drop,
+        args.corrupt,
+        args.ack_drop,
+        args.seed,
+        args.host,
+        args.port,
+    ).start()
+    print(
+        f"Repassando {proxy.address[0]}:{proxy.address[1]} -> {args.target} "
+        f"(perda {args.drop:.0%}, corrupção {args.corrupt:.0%}, perda de confirmações {args.ack_drop:.0%})",
+        file=sys.stderr,
+    )
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        proxy.stop()
+        print(
+            f"Trechos perdidos: {proxy.dropped}, corrompidos: {proxy.corrupted}, "
+            f"confirmações perdidas: {proxy.acks_dropped}",
+            file=sys.stderr,
+        )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Transmissor/receptor HDB3 (e outros códigos de linha) sem interface gráfica"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tx = commands.add_parser("transmit", help="Envia uma mensagem ou arquivo")
+    tx.add_argument("host", help="IP do receptor")
+    tx.add_argument("--port", type=int, default=DEFAULT_PORT)
+    source = tx.add_mutually_exclusive_group()
+    source.add_argument("--message", help="Texto a enviar")
+    source.add_argument("--file", help="Arquivo a enviar ('-' para a entrada padrão)")
+    tx.add_argument("--format", choices=list(FORMAT_NAMES), default="packed2")
+    tx.add_argument(
+        "--line-code", choices=LINE_CODE_NAMES, default="hdb3", help="Código de linha (o receptor o detecta)"
+    )
+    tx.add_argument("--chunk-size", type=int, default=None, help="Bytes por trecho")
+    tx.add_argument("--timeout", type=float, default=10.0)
+    tx.set_defaults(run=_run_transmit)
+
+    rx = commands.add_parser("receive", help="Recebe mensagens")
+    rx.add_argument("--host", default="0.0.0.0")
+    rx.add_argument("--port", type=int, default=DEFAULT_PORT)
+    rx.add_argument("--output", help="Arquivo de saída, mapeado em memória (padrão: saída padrão)")
+    rx.add_argument(
+        "--append", action="store_true", help="Acrescenta ao final de --output em vez de substituí-lo"
+    )
+    rx.add_argument(
+        "--count", type=int, default=1, help="Mensagens a receber (0 = sem limite)"
+    )
+    rx.set_defaults(run=_run_receive)
+
+    proxy = commands.add_parser(
+        "proxy", help="Repassa uma conexão ARQ perdendo e corrompendo trechos (testes)"
+    )
+    proxy.add_argument("target", help="Receptor de destino (host:porta)")
+    proxy.add_argument("--host", default="127.0.0.1")
+    proxy.add_argument("--port", type=int, default=DEFAULT_PORT + 1)
+    proxy.add_argument("--drop", type=float, default=0.05, help="Probabilidade de perder um trecho")
+    proxy.add_argument(
+        "--corrupt", type=float, default=0.05, help="Probabilidade de corromper um trecho"
+    )
+    proxy.add_argument(
+        "--ack-drop", type=float, default=0.0, help="Probabilidade de perder uma confirmação"
+    )
+    proxy.add_argument("--seed", type=int)
+    proxy.set_defaults(run=_run_proxy, metrics_json=None, metrics_port=None)
+
+    for command in (tx, rx):
+        command.add_argument("--shift", type=int, default=3, help="Deslocamento da cifra")
+        command.add_argument("--no-encrypt", action="store_true", help="Sem cifra de César")
+        command.add_argument(
+            "--fec", action="store_true", help="Correção de erros (Hamming) e palavras de sincronização"
+        )
+        command.add_argument(
+            "--arq",
+            action="store_true",
+            help="Confirmação de cada trecho e retransmissão dos perdidos ou corrompidos",
+        )
+        command.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processos para o HDB3 em trechos grandes (0 = todos os núcleos)",
+        )
+        command.add_argument(
+            "--engine",
+            choices=ENGINE_NAMES,
+            default="vector",
+            help="Motor do HDB3: vetorizado ou por tabelas pré-calculadas (mesma saída)",
+        )
+        command.add_argument(
+            "--metrics-json", help="Acrescenta os tempos por etapa a este log JSON ao terminar"
+        )
+        command.add_argument(
+            "--metrics-port", type=int, help="Exporta os tempos no formato Prometheus nesta porta (/metrics)"
+        )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.metrics_json:
+            metrics.enable()
+        if args.metrics_port:
+            metrics.serve_prometheus(args.metrics_port)
+        args.run(args)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,59 @@
+import functools
+import struct
+
 import numpy as np
 
-# Criptografa uma mensagem usando a Cifra de César com ASCII estendido (256 caracteres)
+# Tabela de tradução (256 entradas) da Cifra de César para um deslocamento, calculada uma única vez por shift
+@functools.lru_cache(maxsize=256)
+def caesar_table(shift):
+    return bytes((code + shift) % 256 for code in range(256))
+
+# Criptografa bytes com a Cifra de César (bytes -> bytes), sem passar por strings Python
+def encrypt_bytes(data, shift=3):
+    if not isinstance(data, (bytes, bytearray)):
+        data = bytes(data) # memoryview e outros buffers
+    return data.translate(caesar_table(shift % 256))
+
+# Descriptografa bytes aplicando o deslocamento negativo
+def decrypt_bytes(data, shift=3):
+    return encrypt_bytes(data, -shift)
+
+# Criptografa qualquer buffer (por exemplo uma fatia de um arquivo mapeado em memória, somente leitura)
+# para um novo array uint8, em uma única passada e sem copiar antes para bytes
+def encrypt_array(data, shift=3):
+    return np.add(np.frombuffer(data, dtype=np.uint8), np.uint8(shift % 256))
+
+# Criptografa no próprio buffer (bytearray, memoryview gravável ou array uint8).
+# Somar o deslocamento em uint8 dá a volta em 256, o mesmo que consultar caesar_table, sem nenhuma cópia
+def encrypt_into(buffer, shift=3):
+    view = np.frombuffer(buffer, dtype=np.uint8)
+    np.add(view, np.uint8(shift % 256), out=view)
+    return buffer
+
+# Descriptografa no próprio buffer
+def decrypt_into(buffer, shift=3):
+    return encrypt_into(buffer, -shift)
+
+# Converte texto em bytes UTF-8, uma única vez na entrada: cifra, bits e código de linha trabalham sobre bytes,
+# então qualquer caractere (inclusive acima de U+00FF) chega inteiro ao receptor
+def text_to_bytes(message):
+    return message.encode("utf-8")
+
+# Converte os bytes recebidos em texto, uma única vez no final. Sequências que não são UTF-8 válido
+# (mensagem corrompida ou dados binários) aparecem como U+FFFD em vez de interromper a exibição
+def bytes_to_text(data):
+    return bytes(data).decode("utf-8", errors="replace")
+
+# Criptografa uma mensagem usando a Cifra de César sobre os seus bytes UTF-8
 def encrypt_message(message, shift=3): #usamos  como deslocamento padrão
-    encrypted = ""
-    
-    for char in message:
-        # Pega o código ASCII do caractere (0-255)
-        ascii_code = ord(char)
-        
-        # Aplica o deslocamento no conjunto completo ASCII (0-255)
-        shifted_code = (ascii_code + shift) % 256
-        
-        # Converte de volta para caractere
-        encrypted_char = chr(shifted_code)
-        encrypted += encrypted_char
-    
-    return encrypted
+    return encrypt_bytes(text_to_bytes(message), shift).decode("latin-1") # Cada byte cifrado vira um caractere (0-255)
 
-# Descriptografa considerando ASCII estendido
+# Descriptografa o resultado de encrypt_message: os caracteres voltam a ser os bytes cifrados
 def decrypt_message(encrypted_message, shift=3):
-    decrypted = ""
-    
-    for char in encrypted_message:
-        # Pega o código ASCII do caractere criptografado
-        ascii_code = ord(char)
-        
-        # Aplica o deslocamento negativo no conjunto completo ASCII (0-255)
-        original_code = (ascii_code - shift) % 256
-        
-        # Converte de volta para caractere original
-        decrypted_char = chr(original_code)
-        decrypted += decrypted_char
-    
-    return decrypted
+    return bytes_to_text(decrypt_bytes(encrypted_message.encode("latin-1"), shift))
 
-def encode_line_code(binary_string):
+# Implementação original, bit a bit, mantida como referência para validar o codificador vetorizado
+def encode_line_code_python(binary_string):
     
     signal = [] # Inicializando a lista do sinal
     last_polarity = -1 # Iniciando com polaridade negativa (Mas é apenas uma convenção)
@@ -64,7 +83,159 @@ def encode_line_code(binary_string):
         
     return np.array(signal, dtype=np.float32) # Retorna o sinal como um array NumPy de float32 para melhor compatibilidade com bibliotecas de processamento de sinal
 
-def decode_line_code(signal):
+# ---- Utilitários de bits: conversão bytes <-> array de bits uint8 (0/1) sem strings intermediárias ----
+
+# Converte bytes em um array de bits, 8 por byte, MSB primeiro (o mesmo que format(byte, "08b"))
+def bytes_to_bits(data):
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+# Empacota um array de bits (8 por byte, MSB primeiro) em bytes; um último byte incompleto é completado com zeros
+def bits_to_bytes(bits):
+    return np.packbits(bits).tobytes()
+
+# Converte a entrada do codificador em um array de bits (0/1) do tipo uint8
+# packed=True: um array uint8 é lido como bytes empacotados (np.packbits), não como bits soltos
+def as_bit_array(data, packed=False):
+    if isinstance(data, str): # String de '0'/'1' (formato antigo)
+        bits = np.frombuffer(data.replace(" ", "").encode("ascii"), dtype=np.uint8) - ord("0")
+    elif isinstance(data, (bytes, bytearray, memoryview)): # Bytes: cada byte vira 8 bits
+        bits = bytes_to_bits(data)
+    elif packed: # Array de bytes empacotados (np.packbits): cada elemento vira 8 bits
+        return np.unpackbits(np.asarray(data, dtype=np.uint8))
+    else: # Array de bits já desempacotado
+        bits = np.asarray(data, dtype=np.uint8)
+    if bits.size and bits.max() > 1:
+        raise ValueError("A sequência binária deve conter apenas 0 e 1 (bytes empacotados: use packed=True)")
+    return bits
+
+# Converte um array de bits na string de '0'/'1' usada só para exibição; group separa grupos de bits com espaço
+def bits_to_string(bits, group=None):
+    chars = np.asarray(bits, dtype=np.uint8) + ord("0")
+    if group and len(chars) > group:
+        positions = np.arange(len(chars))
+        spaced = np.full(len(chars) + (len(chars) - 1) // group, ord(" "), dtype=np.uint8)
+        spaced[positions + positions // group] = chars # Cada grupo completo desloca os seguintes em 1
+        chars = spaced
+    return chars.tobytes().decode("ascii")
+
+# Núcleo vetorizado do HDB3. Recebe o estado do codificador (polaridade do último pulso e paridade dos pulsos
+# desde a última substituição) e devolve o sinal junto com o estado final, para continuar em outro trecho
+def _encode_hdb3(bits, last_polarity=-1, one_count=0):
+
+    n = len(bits)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32), last_polarity, one_count
+    index_type = np.int32 if n < 2**31 else np.int64
+    positions = np.arange(1, n + 1, dtype=index_type)
+
+    # Posição de cada bit dentro da sua sequência de zeros (conta a partir do último 1)
+    after_last_one = np.maximum.accumulate(positions * bits) # Índice + 1 do último 1 visto (0 se nenhum)
+    zero_run = positions - after_last_one - 1
+
+    # O quarto zero de cada grupo de 4 zeros consecutivos recebe o pulso de violação V
+    violations = np.flatnonzero((bits == 0) & ((zero_run & 3) == 3))
+
+    # Paridade dos pulsos desde a última substituição decide entre B00V (par) e 000V (ímpar)
+    # (as somas acumuladas em uint8 dão a volta em 256, mas a paridade é preservada)
+    ones = np.cumsum(bits, dtype=np.uint8)
+    ones_before = ones[violations]
+    pulses_between = np.diff(ones_before, prepend=np.uint8(0))
+    pulses_between[:1] += np.uint8(one_count) # Pulsos herdados do trecho anterior
+    balancing = violations[(pulses_between & 1) == 0] - 3 # Posições dos pulsos B
+
+    # Cada 1 e cada B invertem a polaridade; V repete a polaridade atual
+    flips = bits.copy()
+    flips[balancing] = 1
+    flip_count = np.cumsum(flips, dtype=np.uint8) & 1
+    polarity = (flip_count.astype(np.float32) * -2 + 1) * last_polarity
+
+    pulses = bits.copy()
+    pulses[violations] = 1
+    pulses[balancing] = 1
+
+    signal = np.where(pulses == 1, polarity, np.float32(0))
+
+    if flip_count[-1]:
+        last_polarity = -last_polarity
+    if len(violations):
+        one_count = (int(ones[-1]) - int(ones_before[-1])) & 1
+    else:
+        one_count = (one_count + int(ones[-1])) & 1
+    return signal, last_polarity, one_count
+
+# Abaixo deste tamanho o custo de distribuir o trabalho entre processos supera o ganho.
+# Um trecho do pipeline (pipeline.CHUNK_SIZE, 256 KB) tem 2M símbolos, então cada trecho já é dividido
+PARALLEL_MIN_SYMBOLS = 1 << 20
+
+# Motores HDB3: "vector" (operações vetorizadas sobre os bits) ou "table" (tabelas pré-calculadas
+# indexadas por estado e byte, um byte por consulta, em hdb3_tables)
+LINE_CODE_ENGINES = ("vector", "table")
+
+def _check_engine(engine):
+    if engine not in LINE_CODE_ENGINES:
+        raise ValueError(f"Motor HDB3 desconhecido: {engine!r}")
+
+# Codificador HDB3 vetorizado: mesma saída de encode_line_code_python, amostra por amostra
+# Com workers != 1 (None = todos os núcleos) e mensagens grandes, os trechos são codificados em paralelo (parallel_hdb3), com a mesma saída
+# engine escolhe o motor (LINE_CODE_ENGINES); a saída é a mesma; packed=True aceita bytes empacotados (ver as_bit_array)
+def encode_line_code(bits, workers=1, engine="vector", packed=False):
+    _check_engine(engine)
+    bits = as_bit_array(bits, packed)
+    if engine == "table":
+        from hdb3_tables import table_encode
+        return table_encode(bits)
+    if workers != 1 and len(bits) >= PARALLEL_MIN_SYMBOLS:
+        from parallel_hdb3 import parallel_encode
+        return parallel_encode(bits, workers)
+    return _encode_hdb3(bits)[0] # Começa com polaridade negativa, como no original
+
+# Codificador HDB3 por trechos: o estado (última polaridade, paridade dos pulsos e zeros pendentes)
+# passa de um trecho para o outro, então a concatenação das saídas é igual a encode_line_code da mensagem inteira.
+# Com workers != 1, trechos grandes são codificados em vários processos; engine escolhe o motor (como em encode_line_code)
+class StreamingHDB3Encoder:
+
+    def __init__(self, workers=1, engine="vector"):
+        _check_engine(engine)
+        self.workers = workers
+        self.engine = engine
+        self.last_polarity = -1
+        self.one_count = 0
+        self.pending_zeros = 0 # Zeros do fim do trecho anterior que ainda podem virar B00V/000V
+
+    def feed(self, bits):
+        bits = as_bit_array(bits)
+        if self.pending_zeros:
+            bits = np.concatenate([np.zeros(self.pending_zeros, dtype=np.uint8), bits])
+        if len(bits) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        # Os últimos zeros (menos de 4) só são definidos quando o próximo bit chegar
+        last_one = len(bits) - 1 - int(bits[::-1].argmax()) if bits.any() else -1
+        self.pending_zeros = (len(bits) - 1 - last_one) % 4
+
+        bits = bits[: len(bits) - self.pending_zeros]
+        if self.engine == "table":
+            from hdb3_tables import table_encode_state
+            signal, self.last_polarity, self.one_count = table_encode_state(
+                bits, self.last_polarity, self.one_count
+            )
+            return signal
+        if self.workers != 1 and len(bits) >= PARALLEL_MIN_SYMBOLS:
+            from parallel_hdb3 import parallel_encode_state
+            signal, self.last_polarity, self.one_count = parallel_encode_state(
+                bits, self.last_polarity, self.one_count, self.workers
+            )
+            return signal
+        signal, self.last_polarity, self.one_count = _encode_hdb3(bits, self.last_polarity, self.one_count)
+        return signal
+
+    def flush(self):
+        signal = np.zeros(self.pending_zeros, dtype=np.float32) # Menos de 4 zeros no final continuam zeros
+        self.pending_zeros = 0
+        return signal
+
+# Implementação original do decodificador, mantida como referência para o decodificador vetorizado
+def decode_line_code_python(signal):
     
     binary_string = "" # Inicializando a string binária
     zero_count = 0 # Contador de zeros consecutivos
@@ -101,3 +272,269 @@ def decode_line_code(signal):
                 i += 1
 
     return binary_string
+
+# Resolve candidatos B00V sobrepostos como a leitura sequencial faria: um candidato em i consome o V em i + 3,
+# então em uma cadeia de candidatos espaçados de 3 em 3 só são aceitos o 1º, o 3º, o 5º...
+# accepted_before indica se as 3 posições anteriores ao trecho foram aceitas como B (consomem o início do trecho)
+def _accept_substitutions(candidates, accepted_before):
+    overlaps = np.any(candidates[3:] & candidates[:-3]) or np.any(candidates[:3] & accepted_before[: len(candidates)])
+    if not overlaps: # Caso comum (sinal HDB3 válido): não há sobreposição
+        return candidates
+
+    padding = (-len(candidates)) % 3
+    columns = np.concatenate([candidates, np.zeros(padding, dtype=bool)]).reshape(-1, 3) # Uma coluna por resto módulo 3
+    rows = np.arange(columns.shape[0])[:, None]
+    chain_start = np.maximum.accumulate(np.where(columns, -1, rows), axis=0) # Última linha sem candidato
+    chain_index = rows - chain_start - 1 # Posição do candidato dentro da sua cadeia
+    chain_index += (chain_start == -1) & accepted_before # Cadeias que começaram antes do trecho
+    accepted = columns & (chain_index % 2 == 0)
+    return accepted.ravel()[: len(candidates)]
+
+# Posições que podem ser o B de um B00V: pulso, dois zeros e outro pulso com a mesma polaridade
+def _b00v_candidates(window):
+    n = len(window)
+    candidates = np.zeros(n, dtype=bool)
+    candidates[: n - 3] = (
+        (window[: n - 3] != 0)
+        & (window[1 : n - 2] == 0)
+        & (window[2 : n - 1] == 0)
+        & (window[3:] == window[: n - 3])
+    )
+    return candidates
+
+# Núcleo do decodificador HDB3. context traz as 4 amostras anteriores ao sinal (zeros no início da transmissão)
+# e accepted_before diz quais das 3 últimas foram aceitas como pulso B. Com final=False as 3 últimas amostras
+# ficam sem decisão, porque o B00V precisa delas para olhar à frente.
+# Devolve os bits decididos e, para cada um, se a amostra é um pulso B (estado para o próximo trecho)
+def _decode_hdb3(signal, context=None, accepted_before=None, final=True):
+
+    if context is None:
+        context = np.zeros(4, dtype=np.float32)
+    if accepted_before is None:
+        accepted_before = np.zeros(3, dtype=bool)
+    window = np.concatenate([context, signal]) # Índices 0..3 são o contexto
+    n = len(window)
+    end = n if final else max(n - 3, 4) # Fim das amostras decididas agora
+    pulse = window != 0
+
+    candidates = _b00v_candidates(window)
+    candidates[:4] = False # O contexto já foi decidido
+    balancing = np.zeros(n, dtype=bool)
+    balancing[1:4] = accepted_before
+    balancing[4:end] = _accept_substitutions(candidates[4:end], accepted_before) # Pulsos B reconhecidos
+    violation = np.zeros(n, dtype=bool)
+    violation[3:] = balancing[:-3] # Pulsos V que fecham cada B00V
+
+    # 000V: pulso precedido por exatamente três zeros e com a mesma polaridade do pulso anterior
+    violation[4:] |= (
+        pulse[4:]
+        & pulse[:-4]
+        & (window[1:-3] == 0)
+        & (window[2:-2] == 0)
+        & (window[3:-1] == 0)
+        & (window[4:] == window[:-4])
+    )
+
+    # Só os pulsos que não fazem parte de uma substituição representam bits 1
+    bits = (pulse & ~balancing & ~violation)[4:end].view(np.uint8)
+    return bits, balancing[4:end]
+
+# Decodificador HDB3 vetorizado: devolve um array uint8 com um bit (0/1) por amostra do sinal,
+# idêntico ao resultado de decode_line_code_python (workers e engine como em encode_line_code;
+# o motor "table" espera um sinal ternário {-1, 0, +1})
+def decode_line_code(signal, workers=1, engine="vector"):
+    _check_engine(engine)
+    signal = np.asarray(signal)
+    if engine == "table":
+        from hdb3_tables import table_decode
+        return table_decode(signal)
+    if workers != 1 and len(signal) >= PARALLEL_MIN_SYMBOLS:
+        from parallel_hdb3 import parallel_decode
+        return parallel_decode(signal, workers)
+    return _decode_hdb3(signal)[0]
+
+# Decodificador HDB3 incremental: feed recebe trechos do sinal à medida que chegam e devolve os bits já
+# decididos; só as 3 últimas amostras (olhar à frente do B00V) e 4 de contexto ficam guardadas.
+# A concatenação das saídas de feed e flush é igual a decode_line_code do sinal inteiro.
+# Com workers != 1, trechos grandes são decodificados em vários processos
+class StreamingHDB3Decoder:
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.context = np.zeros(4, dtype=np.float32) # Últimas 4 amostras já decididas
+        self.accepted_before = np.zeros(3, dtype=bool) # Quais das 3 últimas decididas são pulsos B
+        self.pending = np.zeros(0, dtype=np.float32) # Amostras ainda sem decisão
+
+    def _decode(self, signal, final):
+        if self.workers != 1 and len(signal) >= PARALLEL_MIN_SYMBOLS:
+            from parallel_hdb3 import parallel_decode_state
+            bits, balancing = parallel_decode_state(
+                signal, self.context, self.accepted_before, final, self.workers
+            )
+        else:
+            bits, balancing = _decode_hdb3(signal, self.context, self.accepted_before, final)
+        decided = len(bits)
+        self.context = np.concatenate([self.context, signal[:decided]])[-4:]
+        self.accepted_before = np.concatenate([self.accepted_before, balancing])[-3:]
+        self.pending = signal[decided:]
+        return bits
+
+    def feed(self, chunk):
+        signal = np.concatenate([self.pending, np.asarray(chunk, dtype=np.float32)])
+        if len(signal) <= 3:
+            self.pending = signal
+            return np.zeros(0, dtype=np.uint8)
+        return self._decode(signal, final=False)
+
+    def flush(self):
+        bits = self._decode(self.pending, final=True)
+        self.__init__(self.workers) # Pronto para a próxima mensagem
+        return bits
+
+# Detector de erros pelas violações bipolares: num sinal HDB3 válido, todo pulso com a mesma polaridade
+# do anterior é o V de um 000V ou B00V (precedido de 00 e de B ou de 0 e um pulso igual), os V alternam
+# de polaridade e nunca há 4 zeros seguidos. feed devolve, para cada amostra, se ela quebra essas regras.
+# Como um pulso válido sempre tem o anterior a no máximo 4 amostras (senão já há 4 zeros, um erro),
+# basta guardar as 4 últimas amostras e a polaridade do último V entre um trecho e outro
+class HDB3ViolationDetector:
+
+    def __init__(self):
+        self.context = np.full(4, 2, dtype=np.int8) # 2 = antes do início (não é zero nem pulso)
+        self.last_violation = 0 # Nenhum V ainda
+
+    def feed(self, chunk):
+        window = np.concatenate([self.context, np.asarray(chunk).astype(np.int8)]) # Níveis em int8: comparações mais baratas
+        s, s1, s2, s3, s4 = window[4:], window[3:-1], window[2:-2], window[1:-3], window[:-4]
+        zero = window == 0
+        z, z1, z2, z3 = zero[4:], zero[3:-1], zero[2:-2], zero[1:-3]
+
+        # Violações bipolares: pulsos com a mesma polaridade do pulso anterior
+        previous = np.where(z1, np.where(z2, np.where(z3, s4, s3), s2), s1)
+        bipolar = ~z & (s == previous)
+        after_two_zeros = z1 & z2
+        legal = after_two_zeros & ((s3 == s) | (z3 & (s4 == s)))
+        errors = bipolar & ~legal
+
+        # Os V válidos precisam alternar de polaridade
+        violation = bipolar & legal
+        violation_polarity = s[violation]
+        errors[violation] |= violation_polarity == np.concatenate(
+            [[self.last_violation], violation_polarity[:-1]]
+        )
+
+        # 4 zeros seguidos nunca aparecem (seriam substituídos)
+        errors |= z & after_two_zeros & z3
+
+        self.context = window[-4:]
+        if len(violation_polarity):
+            self.last_violation = violation_polarity[-1]
+        return errors
+
+# Posições das amostras que quebram as regras do HDB3 (ver HDB3ViolationDetector)
+def line_code_errors(signal):
+    return np.flatnonzero(HDB3ViolationDetector().feed(signal))
+
+# Formato do sinal na rede: cabeçalho versionado + símbolos empacotados
+SIGNAL_MAGIC = b"H3"
+SIGNAL_VERSION = 1
+SIGNAL_HEADER = struct.Struct("!2sBBQ") # magic, versão, formato, número de símbolos
+
+# A versão 2 anuncia também o código de linha (ver line_codes), para o receptor escolher o decodificador.
+# Sinais HDB3 continuam saindo na versão 1, que os receptores antigos entendem
+SIGNAL_VERSION_LINE_CODE = 2
+SIGNAL_HEADER_LINE_CODE = struct.Struct("!2sBBBQ") # magic, versão, formato, código de linha, número de símbolos
+LINE_CODE_HDB3 = 0 # Código de linha dos sinais na versão 1 e dos transmissores sem cabeçalho
+
+FORMAT_FLOAT32 = 0 # Um float32 por símbolo (formato antigo, 32 bits por símbolo)
+FORMAT_PACKED2 = 1 # 2 bits por símbolo, 4 símbolos por byte
+FORMAT_BASE3 = 2 # Base 3, 5 símbolos por byte (3^5 = 243 <= 256)
+FORMAT_QUATERNARY2 = 3 # 2 bits por símbolo para códigos de 4 níveis (-3, -1, +1, +3), como o 2B1Q
+
+_PACKED2_LEVELS = np.array([0, 1, -1, 0], dtype=np.float32) # Código 2 bits -> nível (o código 3 não é usado)
+_QUATERNARY_LEVELS = np.array([-3, -1, 1, 3], dtype=np.float32)
+_BASE3_WEIGHTS = np.array([81, 27, 9, 3, 1], dtype=np.uint8)
+_BASE3_LEVELS = ((np.arange(243)[:, None] // _BASE3_WEIGHTS) % 3 - 1).astype(np.float32) # Byte -> 5 níveis
+
+# 4 códigos de 2 bits por byte, o primeiro nos bits mais altos
+def _pack2(codes):
+    n = len(codes)
+    padded = np.zeros(n + (-n) % 4, dtype=np.uint8)
+    padded[:n] = codes
+    padded = padded.reshape(-1, 4)
+    return (padded[:, 0] << 6 | padded[:, 1] << 4 | padded[:, 2] << 2 | padded[:, 3]).tobytes()
+
+def _unpack2(payload):
+    return np.stack([payload >> 6, (payload >> 4) & 3, (payload >> 2) & 3, payload & 3], axis=1).ravel()
+
+# Empacota o sinal ({-1, 0, +1}, ou {-3, -1, +1, +3} em FORMAT_QUATERNARY2) para envio, precedido do cabeçalho
+# line_code é o número do código de linha anunciado (ver line_codes); HDB3 usa o cabeçalho da versão 1
+def pack_signal(signal, signal_format=FORMAT_PACKED2, line_code=LINE_CODE_HDB3):
+    signal = np.asarray(signal, dtype=np.float32)
+    n = len(signal)
+
+    if signal_format == FORMAT_FLOAT32:
+        payload = signal.tobytes()
+    elif signal_format == FORMAT_PACKED2:
+        payload = _pack2((signal > 0) | ((signal < 0) << 1)) # +1 -> 01, -1 -> 10, 0 -> 00
+    elif signal_format == FORMAT_QUATERNARY2:
+        payload = _pack2(np.clip((signal + 3) / 2, 0, 3).astype(np.uint8)) # -3 -> 00, -1 -> 01, +1 -> 10, +3 -> 11
+    elif signal_format == FORMAT_BASE3:
+        digits = np.ones(n + (-n) % 5, dtype=np.uint8) # Preenchimento com o dígito 1 (nível 0)
+        digits[:n] = np.sign(signal) + 1
+        payload = (digits.reshape(-1, 5) @ _BASE3_WEIGHTS).astype(np.uint8).tobytes()
+    else:
+        raise ValueError(f"Formato de sinal desconhecido: {signal_format}")
+
+    if line_code == LINE_CODE_HDB3:
+        return SIGNAL_HEADER.pack(SIGNAL_MAGIC, SIGNAL_VERSION, signal_format, n) + payload
+    header = SIGNAL_HEADER_LINE_CODE.pack(
+        SIGNAL_MAGIC, SIGNAL_VERSION_LINE_CODE, signal_format, line_code, n
+    )
+    return header + payload
+
+# Lê o cabeçalho: (formato, código de linha, número de símbolos, tamanho do cabeçalho)
+def _signal_header(data):
+    version = data[2] if len(data) > 2 else None
+    if version == SIGNAL_VERSION:
+        _, _, signal_format, n = SIGNAL_HEADER.unpack(data[: SIGNAL_HEADER.size])
+        return signal_format, LINE_CODE_HDB3, n, SIGNAL_HEADER.size
+    if version == SIGNAL_VERSION_LINE_CODE:
+        _, _, signal_format, line_code, n = SIGNAL_HEADER_LINE_CODE.unpack(
+            data[: SIGNAL_HEADER_LINE_CODE.size]
+        )
+        return signal_format, line_code, n, SIGNAL_HEADER_LINE_CODE.size
+    raise ValueError(f"Versão do formato de sinal não suportada: {version}")
+
+# Código de linha anunciado por um sinal empacotado (HDB3 na versão 1 e sem cabeçalho)
+def signal_line_code(data):
+    data = memoryview(data)
+    if bytes(data[:2]) != SIGNAL_MAGIC:
+        return LINE_CODE_HDB3
+    return _signal_header(data)[1]
+
+# Desempacota um sinal recebido. Sem cabeçalho, os bytes são tratados como float32 (transmissores antigos):
+# um float32 de -1, 0 ou +1 sempre começa com dois bytes 0x00, então nunca é confundido com SIGNAL_MAGIC
+def unpack_signal(data):
+    data = memoryview(data)
+    if bytes(data[:2]) != SIGNAL_MAGIC:
+        return np.frombuffer(data, dtype=np.float32)
+
+    signal_format, _, n, header_size = _signal_header(data)
+    payload = np.frombuffer(data[header_size:], dtype=np.uint8)
+
+    if signal_format == FORMAT_FLOAT32:
+        signal = payload.view(np.float32)
+    elif signal_format == FORMAT_PACKED2:
+        signal = _PACKED2_LEVELS[_unpack2(payload)]
+    elif signal_format == FORMAT_QUATERNARY2:
+        signal = _QUATERNARY_LEVELS[_unpack2(payload)]
+    elif signal_format == FORMAT_BASE3:
+        if np.any(payload >= 243):
+            raise ValueError("Byte inválido no sinal em base 3")
+        signal = _BASE3_LEVELS[payload].ravel()
+    else:
+        raise ValueError(f"Formato de sinal desconhecido: {signal_format}")
+
+    if len(signal) < n:
+        raise ValueError(f"Sinal incompleto: {len(signal)} de {n} símbolos")
+    return signal[:n]
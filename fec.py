@@ -0,0 +1,407 @@
+import numpy as np
+
+# Each block starts with this 32-bit sync word (the CCSDS attached sync marker), so the
+# receiver can find block boundaries again after a dropped or inserted symbol
+SYNC_WORD = 0x1ACFFC1D
+SYNC_BITS = np.unpackbits(np.frombuffer(SYNC_WORD.to_bytes(4, "big"), dtype=np.uint8))
+SYNC_BYTES = SYNC_WORD.to_bytes(4, "big")
+
+# A sync word at the expected position is accepted with up to this many wrong bits
+SYNC_TOLERANCE = 4
+
+# When a sync word is missing, the search starts this many bits early, to catch dropped symbols
+MAX_SLIP = 8
+
+# Message bytes per block; the header carries a 16-bit sequence number and the data length
+BLOCK_DATA = 64
+HEADER_BYTES = 3
+
+# Every byte is sent as two Hamming(8,4) codewords
+BLOCK_BYTES = len(SYNC_BYTES) + 2 * (HEADER_BYTES + BLOCK_DATA)
+BLOCK_BITS = 8 * BLOCK_BYTES
+HEADER_BITS = 8 * (len(SYNC_BYTES) + 2 * HEADER_BYTES)
+
+# Status of a received codeword
+CODEWORD_OK = 0
+CODEWORD_CORRECTED = 1
+CODEWORD_FAILED = 2
+
+
+def _hamming_tables():
+    """
+    Build the extended Hamming(8,4) (SECDED) encoding and decoding tables over GF(2).
+
+    A codeword is the 4 data bits, 3 Hamming parity bits and an overall
+    parity bit (MSB first). Decoding corrects any single wrong bit and
+    flags any two wrong bits as uncorrectable.
+
+    Returns:
+        tuple: (encode[16] uint8, decode[256] uint8 nibble, status[256] uint8)
+    """
+    parity = np.array([[1, 1, 0], [1, 0, 1], [0, 1, 1], [1, 1, 1]], dtype=np.uint8)
+    generator = np.hstack([np.eye(4, dtype=np.uint8), parity])
+    generator = np.hstack([generator, generator.sum(axis=1, keepdims=True) % 2])
+    check = np.hstack([parity.T, np.eye(3, dtype=np.uint8)])
+
+    nibbles = np.unpackbits(np.arange(16, dtype=np.uint8)[:, None], axis=1)[:, 4:]
+    encode = np.packbits(nibbles @ generator % 2, axis=1).ravel()
+
+    received = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+    syndrome = (received[:, :7] @ check.T % 2) @ np.array([4, 2, 1])
+    overall = received.sum(axis=1) % 2
+    column_syndromes = check.T @ np.array([4, 2, 1])  # Syndrome of a single error at each of bits 0-6
+
+    corrected = received.copy()
+    single = (overall == 1) & (syndrome != 0)
+    positions = np.argmax(column_syndromes[None, :] == syndrome[single, None], axis=1)
+    corrected[np.flatnonzero(single), positions] ^= 1
+    decode = np.packbits(corrected[:, :4], axis=1).ravel() >> 4
+
+    status = np.full(256, CODEWORD_OK, dtype=np.uint8)
+    status[overall == 1] = CODEWORD_CORRECTED  # Syndrome 0 here means the overall parity bit itself was hit
+    status[(overall == 0) & (syndrome != 0)] = CODEWORD_FAILED
+    return encode.astype(np.uint8), decode.astype(np.uint8), status
+
+
+HAMMING_ENCODE, HAMMING_DECODE, HAMMING_STATUS = _hamming_tables()
+
+
+def hamming_encode(data):
+    """
+    Encode bytes as pairs of Hamming(8,4) codewords (high nibble first).
+
+    Args:
+        data (numpy.ndarray): uint8 array, any shape
+
+    Returns:
+        numpy.ndarray: uint8 array with the last axis twice as long
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    coded = np.stack([HAMMING_ENCODE[data >> 4], HAMMING_ENCODE[data & 0x0F]], axis=-1)
+    return coded.reshape(data.shape[:-1] + (2 * data.shape[-1],))
+
+
+def hamming_decode(codes):
+    """
+    Decode pairs of Hamming(8,4) codewords back into bytes.
+
+    Args:
+        codes (numpy.ndarray): uint8 array whose last axis has even length
+
+    Returns:
+        tuple: (data bytes, corrected bits per byte (0-2), uncorrectable flag per byte)
+    """
+    high, low = codes[..., 0::2], codes[..., 1::2]
+    data = HAMMING_DECODE[high] << 4 | HAMMING_DECODE[low]
+    status_high, status_low = HAMMING_STATUS[high], HAMMING_STATUS[low]
+    corrected = (status_high == CODEWORD_CORRECTED).astype(np.uint8) + (
+        status_low == CODEWORD_CORRECTED
+    )
+    failed = (status_high == CODEWORD_FAILED) | (status_low == CODEWORD_FAILED)
+    return data, corrected, failed
+
+
+def encode_blocks(data, first_seq=0):
+    """
+    Split bytes into FEC blocks: sync word, then the Hamming-coded header and data.
+
+    Args:
+        data (bytes-like): Message bytes (every block but the last is full)
+        first_seq (int): Sequence number of the first block
+
+    Returns:
+        bytes: The blocks, back to back
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    if len(data) == 0:
+        return b""
+    n_blocks = -(-len(data) // BLOCK_DATA)
+    plain = np.zeros((n_blocks, HEADER_BYTES + BLOCK_DATA), dtype=np.uint8)
+    seq = (first_seq + np.arange(n_blocks)) & 0xFFFF
+    plain[:, 0] = seq >> 8
+    plain[:, 1] = seq & 0xFF
+    plain[:, 2] = BLOCK_DATA
+    plain[-1, 2] = len(data) - BLOCK_DATA * (n_blocks - 1)
+    padded = np.zeros(n_blocks * BLOCK_DATA, dtype=np.uint8)
+    padded[: len(data)] = data
+    plain[:, HEADER_BYTES:] = padded.reshape(n_blocks, BLOCK_DATA)
+
+    coded = hamming_encode(plain)
+    header, body = coded[:, : 2 * HEADER_BYTES], coded[:, 2 * HEADER_BYTES :]
+    last = 2 * int(plain[-1, 2])  # The last block only carries its own bytes
+    start = len(SYNC_BYTES) + 2 * HEADER_BYTES
+
+    blocks = np.empty((n_blocks, BLOCK_BYTES), dtype=np.uint8)
+    blocks[:, : len(SYNC_BYTES)] = np.frombuffer(SYNC_BYTES, dtype=np.uint8)
+    blocks[:, len(SYNC_BYTES) : start] = header
+    blocks[:, start:] = interleave(body)
+    blocks[-1, start : start + last] = interleave(body[-1:, :last])
+    return blocks.tobytes()[: blocks.size - (2 * BLOCK_DATA - last)]
+
+
+def interleave(codes):
+    """
+    Reorder the bits of each row of codewords: bit 0 of every codeword, then bit 1, and so on.
+
+    A burst of wrong symbols shorter than the row then hits each codeword
+    at most once, which the Hamming code corrects (one HDB3 symbol error
+    usually garbles a few neighbouring bits).
+
+    Args:
+        codes (numpy.ndarray): uint8 codewords, one row per block
+
+    Returns:
+        numpy.ndarray: uint8 array of the same shape, in transmission order
+    """
+    rows, n = codes.shape
+    bits = np.unpackbits(codes, axis=1).reshape(rows, n, 8)
+    return np.packbits(bits.transpose(0, 2, 1).reshape(rows, 8 * n), axis=1)
+
+
+def deinterleave(bits, n_codes):
+    """
+    Undo interleave on received bits.
+
+    Args:
+        bits (numpy.ndarray): uint8 bits, one row of 8 * n_codes per block
+        n_codes (int): Codewords per row
+
+    Returns:
+        numpy.ndarray: uint8 codewords, one row per block
+    """
+    rows = bits.shape[0]
+    return np.packbits(bits.reshape(rows, 8, n_codes).transpose(0, 2, 1).reshape(rows, -1), axis=1)
+
+
+def find_sync(bits, start=0):
+    """Return the position of the first exact sync word at or after start, or None."""
+    window = bits[start:]
+    n = len(window) - len(SYNC_BITS) + 1
+    if n <= 0:
+        return None
+    match = window[:n] == SYNC_BITS[0]
+    for k in range(1, 8):  # The first byte narrows the search to about 1 position in 256
+        match &= window[k : k + n] == SYNC_BITS[k]
+    candidates = np.flatnonzero(match)
+    full = (window[candidates[:, None] + np.arange(len(SYNC_BITS))] == SYNC_BITS).all(axis=1)
+    return start + int(candidates[full][0]) if full.any() else None
+
+
+class FecEncoder:
+    """
+    Streaming FEC encoder: message bytes in, sync-delimited blocks out.
+
+    The concatenation of the outputs of feed and flush equals
+    encode_blocks applied to the whole message.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._seq = 0
+
+    def feed(self, chunk):
+        data = self._pending + bytes(chunk) if self._pending else chunk
+        full = len(data) - len(data) % BLOCK_DATA
+        self._pending = bytes(data[full:])
+        blocks = encode_blocks(data[:full], self._seq)
+        self._seq += full // BLOCK_DATA
+        return blocks
+
+    def flush(self):
+        blocks = encode_blocks(self._pending, self._seq)
+        self._pending = b""
+        return blocks
+
+
+class FecReport:
+    """
+    What the FEC decoder found in one message.
+
+    Attributes:
+        blocks (int): Blocks decoded
+        corrected_bits (int): Bits fixed by the Hamming code
+        damaged (list): Sequence numbers of blocks with uncorrectable or missing data
+        suspect (list): Sequence numbers of blocks where the line code was violated
+        resyncs (int): Times the decoder had to search for the next sync word
+        lost_bits (int): Bits skipped while searching
+    """
+
+    def __init__(self):
+        self.blocks = 0
+        self.corrected_bits = 0
+        self.damaged = []
+        self.suspect = []
+        self.resyncs = 0
+        self.lost_bits = 0
+
+    @property
+    def ok(self):
+        return not self.damaged and not self.lost_bits
+
+    def __repr__(self):
+        return (
+            f"FecReport(blocks={self.blocks}, corrected_bits={self.corrected_bits}, "
+            f"damaged={self.damaged}, suspect={self.suspect}, resyncs={self.resyncs}, "
+            f"lost_bits={self.lost_bits})"
+        )
+
+
+class FecDecoder:
+    """
+    Streaming FEC decoder: decoded HDB3 bits in, message bytes out.
+
+    Runs of full blocks whose sync words sit where expected are decoded in
+    one vectorized pass. When a sync word is missing (a dropped or extra
+    symbol shifted the stream), the bits are searched for the next one, so
+    the damage stays inside the blocks it hit. Blocks lost that way are
+    detected from the gap in sequence numbers, replaced by BLOCK_DATA zero
+    bytes (so the rest of the message keeps its offsets) and listed in the
+    report.
+
+    Args:
+        report (FecReport): Filled while decoding (a new one if None)
+    """
+
+    def __init__(self, report=None):
+        self.report = report if report is not None else FecReport()
+        self._bits = np.zeros(0, dtype=np.uint8)
+        self._suspect = np.zeros(0, dtype=bool)
+        self._seq = 0
+        self._in_sync = False  # The last thing decoded was a block (not skipped bits)
+
+    def feed(self, bits, suspect=None):
+        """
+        Decode the blocks completed by these bits.
+
+        Args:
+            bits (numpy.ndarray): uint8 bits from the HDB3 decoder
+            suspect (numpy.ndarray): Optional bool flags, one per bit, marking line code
+                violations (see encoding_module.HDB3ViolationDetector)
+
+        Returns:
+            bytes: Message bytes of the completed blocks
+        """
+        if suspect is None:
+            suspect = np.zeros(len(bits), dtype=bool)
+        self._bits = np.concatenate([self._bits, bits])
+        self._suspect = np.concatenate([self._suspect, suspect])
+        return self._decode(final=False)
+
+    def flush(self):
+        """Decode what is left at the end of the message."""
+        return self._decode(final=True)
+
+    def _decode(self, final):
+        bits, out, pos = self._bits, [], 0
+        while True:
+            count = (len(bits) - pos) // BLOCK_BITS
+            if count:
+                run = bits[pos : pos + count * BLOCK_BITS]
+                pos += self._decode_run(run, pos, count, out) * BLOCK_BITS
+            pos, wait = self._decode_one(bits, pos, final, out)
+            if wait:
+                break
+
+        if final:
+            if pos < len(bits):
+                self.report.lost_bits += len(bits) - pos
+            pos = len(bits)
+        self._bits, self._suspect = bits[pos:], self._suspect[pos:]
+        return b"".join(out)
+
+    def _decode_run(self, bits, pos, count, out):
+        """Vectorized path: decode the leading full blocks found exactly where expected."""
+        blocks = bits.reshape(count, BLOCK_BITS)
+        sync_errors = (blocks[:, : len(SYNC_BITS)] != SYNC_BITS).sum(axis=1)
+        header = np.packbits(blocks[:, len(SYNC_BITS) : HEADER_BITS], axis=1)
+        body = deinterleave(blocks[:, HEADER_BITS:], 2 * BLOCK_DATA)
+        data, corrected, failed = hamming_decode(np.concatenate([header, body], axis=1))
+        seq = data[:, 0].astype(np.int64) << 8 | data[:, 1]
+        expected = (self._seq + np.arange(count)) & 0xFFFF
+        good = (
+            (sync_errors <= SYNC_TOLERANCE)
+            & ~failed[:, :HEADER_BYTES].any(axis=1)
+            & (data[:, 2] == BLOCK_DATA)
+            & (seq == expected)
+        )
+        taken = count if good.all() else int(good.argmin())
+        if taken:
+            out.append(data[:taken, HEADER_BYTES:].tobytes())
+            suspect = self._suspect[pos : pos + taken * BLOCK_BITS].reshape(taken, BLOCK_BITS)
+            self._account(
+                expected[:taken],
+                int(corrected[:taken].sum()),
+                failed[:taken, HEADER_BYTES:].any(axis=1),
+                suspect.any(axis=1),
+            )
+        return taken
+
+    def _decode_one(self, bits, pos, final, out):
+        """
+        Slow path for one block: a short block, a sequence gap or a lost sync.
+
+        Returns:
+            tuple: (position after what was consumed, whether to wait for more bits)
+        """
+        if len(bits) - pos < HEADER_BITS:
+            return pos, True
+        n_sync = len(SYNC_BITS)
+        if (bits[pos : pos + n_sync] != SYNC_BITS).sum() <= SYNC_TOLERANCE:
+            header, _, failed = hamming_decode(np.packbits(bits[pos + n_sync : pos + HEADER_BITS]))
+            length = int(header[2])
+            if not failed.any() and length <= BLOCK_DATA:
+                end = pos + HEADER_BITS + 16 * length
+                if end > len(bits):
+                    return (pos, True) if not final else self._resync(bits, pos, final)
+                seq = int(header[0]) << 8 | int(header[1])
+                gap = (seq - self._seq) & 0xFFFF
+                if gap < 0x8000:  # Anything else is a stale or garbled sequence number
+                    if gap:
+                        self.report.damaged += [(self._seq + k) & 0xFFFF for k in range(gap)]
+                        out.append(bytes(BLOCK_DATA * gap))
+                        self._seq = seq
+                    body = deinterleave(bits[None, pos + HEADER_BITS : end], 2 * length)
+                    data, corrected, failed = hamming_decode(body[0])
+                    out.append(data.tobytes())
+                    self._account(
+                        np.array([seq]),
+                        int(corrected.sum()),
+                        np.array([failed.any()]),
+                        np.array([self._suspect[pos:end].any()]),
+                    )
+                    return end, False
+        return self._resync(bits, pos, final)
+
+    def _resync(self, bits, pos, final):
+        """
+        Skip to the next sync word, or wait for more bits if there is none yet.
+
+        A slip is only noticed at the sync word after it, so the block just
+        decoded is reported as damaged too: interleaving turns a shifted
+        block into valid codewords, which the Hamming code cannot flag.
+        """
+        previous = (self._seq - 1) & 0xFFFF
+        if self._in_sync and self.report.damaged[-1:] != [previous]:
+            self.report.damaged.append(previous)
+        self._in_sync = False
+        found = find_sync(bits, max(pos - MAX_SLIP, 0))
+        if found == pos:
+            found = find_sync(bits, pos + 1)
+        if found is None:
+            if final:
+                return pos, True
+            # Keep the tail: a sync word may start in it
+            keep = max(pos, len(bits) - len(SYNC_BITS) + 1)
+            self.report.lost_bits += keep - pos
+            return keep, True
+        self.report.resyncs += 1
+        self.report.lost_bits += max(found - pos, 0)
+        return found, False
+
+    def _account(self, seqs, corrected_bits, failed, suspect):
+        self.report.blocks += len(seqs)
+        self.report.corrected_bits += corrected_bits
+        self.report.damaged += seqs[failed].tolist()
+        self.report.suspect += seqs[suspect].tolist()
+        self._seq = (int(seqs[-1]) + 1) & 0xFFFF
+        self._in_sync = True
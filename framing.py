@@ -0,0 +1,272 @@
+import struct
+import zlib
+
+import metrics
+
+# Frame header: magic, protocol version, flags, reserved, payload length, CRC-32 of the payload
+FRAME_MAGIC = b"CDFR"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("!4sBBHQI")
+
+# Flag set on every frame of a streamed message except the last one
+FLAG_MORE = 0x01
+
+RECV_CHUNK_SIZE = 1 << 20
+
+# Largest payload accepted in one frame. The length field is checked against it before anything is
+# allocated, so a corrupt or hostile header cannot make the receiver reserve up to 2**64 bytes.
+# A default chunk takes at most a few tens of MB on the wire (float32 samples, Manchester and FEC)
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+
+
+class FrameError(ValueError):
+    """Raised when a received frame is truncated, corrupt or uses an unknown version."""
+
+
+def frame_header(payload, flags=0):
+    """
+    Build the header that precedes a payload on the wire.
+
+    Args:
+        payload (bytes-like): The payload that will follow the header
+        flags (int): Frame flags (FLAG_MORE)
+
+    Returns:
+        bytes: The packed header
+
+    Raises:
+        FrameError: If the payload is larger than MAX_FRAME_BYTES
+    """
+    payload = memoryview(payload)
+    check_length(payload.nbytes)
+    return FRAME_HEADER.pack(
+        FRAME_MAGIC, FRAME_VERSION, flags, 0, payload.nbytes, zlib.crc32(payload)
+    )
+
+
+def send_frame(sock, payload, more=False):
+    """
+    Send one length-prefixed frame over a connected socket.
+
+    Args:
+        sock (socket.socket): Connected socket
+        payload (bytes-like): The payload to send
+        more (bool): Whether more frames of the same message follow
+    """
+    sendall_buffers(sock, [frame_header(payload, FLAG_MORE if more else 0), payload])
+
+
+def sendall_buffers(sock, buffers):
+    """
+    Send several buffers with as few system calls as possible.
+
+    Uses scatter/gather sendmsg where the platform has it (no copy into a
+    single buffer), falling back to one joined sendall (e.g. on Windows).
+
+    Args:
+        sock (socket.socket): Connected socket
+        buffers (list): Bytes-like objects, sent in order
+    """
+    with metrics.stage("send") as timer:
+        if not hasattr(sock, "sendmsg"):
+            sock.sendall(b"".join(buffers))
+        else:
+            _sendmsg_all(sock, [memoryview(buffer).cast("B") for buffer in buffers])
+        if metrics.is_enabled():
+            timer.add(n_bytes=sum(memoryview(buffer).nbytes for buffer in buffers))
+
+
+def _sendmsg_all(sock, views):
+    index = 0
+    while index < len(views):
+        sent = sock.sendmsg(views[index : index + 1024])  # IOV_MAX is 1024 on Linux/macOS
+        while index < len(views) and sent >= len(views[index]):
+            sent -= len(views[index])
+            index += 1
+        if sent:
+            views[index] = views[index][sent:]
+
+
+def send_frames(sock, payloads):
+    """
+    Send a message as a sequence of frames, as the payloads are produced.
+
+    Every frame but the last carries FLAG_MORE, so the receiver knows where
+    the message ends without knowing its total size in advance.
+
+    Args:
+        sock (socket.socket): Connected socket
+        payloads (iterable): Iterable of bytes-like payloads
+
+    Returns:
+        int: Number of payload bytes sent
+    """
+    sent = 0
+    previous = None
+    for payload in payloads:
+        if previous is not None:
+            send_frame(sock, previous, more=True)
+            sent += len(previous)
+        previous = payload
+    send_frame(sock, previous if previous is not None else b"")
+    return sent + (len(previous) if previous is not None else 0)
+
+
+def parse_frame_header(header):
+    """
+    Unpack and validate a frame header.
+
+    Args:
+        header (bytes-like): FRAME_HEADER.size bytes
+
+    Returns:
+        tuple: (flags, payload length, checksum)
+
+    Raises:
+        FrameError: If the magic or the version is wrong, or the length exceeds MAX_FRAME_BYTES
+    """
+    magic, version, flags, _, length, checksum = FRAME_HEADER.unpack(header)
+    if magic != FRAME_MAGIC:
+        raise FrameError("Cabeçalho de quadro inválido")
+    if version != FRAME_VERSION:
+        raise FrameError(f"Versão de quadro não suportada: {version}")
+    check_length(length)
+    return flags, length, checksum
+
+
+def check_length(length):
+    """Raise FrameError if a payload of this many bytes exceeds MAX_FRAME_BYTES."""
+    if length > MAX_FRAME_BYTES:
+        raise FrameError(
+            f"Quadro de {length} bytes excede o limite de {MAX_FRAME_BYTES} bytes "
+            "(use trechos menores: --chunk-size)"
+        )
+
+
+def verify_payload(payload, checksum):
+    """Raise FrameError if the payload does not match the checksum from its header."""
+    if zlib.crc32(payload) != checksum:
+        raise FrameError("Checksum inválido: o quadro foi corrompido")
+
+
+def recv_into_exactly(sock, view):
+    """
+    Fill a writable buffer completely from the socket using recv_into.
+
+    Args:
+        sock (socket.socket): Connected socket
+        view (memoryview): Writable buffer to fill
+
+    Raises:
+        FrameError: If the connection closes before the buffer is full
+    """
+    view = memoryview(view).cast("B")
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:], min(len(view) - received, RECV_CHUNK_SIZE))
+        if count == 0:
+            raise FrameError(
+                f"Conexão encerrada após {received} de {len(view)} bytes"
+            )
+        received += count
+
+
+def recv_exactly(sock, size):
+    """Receive exactly size bytes into a single preallocated bytearray."""
+    buffer = bytearray(size)
+    recv_into_exactly(sock, buffer)
+    return buffer
+
+
+def recv_until_closed(sock, prefix=b""):
+    """Receive everything until the peer closes the connection (unframed senders)."""
+    buffer = bytearray(prefix)
+    chunk = bytearray(RECV_CHUNK_SIZE)
+    while True:
+        count = sock.recv_into(chunk)
+        if count == 0:
+            return buffer
+        buffer += memoryview(chunk)[:count]
+
+
+def _recv_frame(sock, legacy=True):
+    """
+    Receive one frame, returning (payload, flags); see recv_frame.
+
+    Without legacy (frames after the first of a message), bytes that do not
+    start with FRAME_MAGIC are an invalid header rather than an unframed sender.
+    """
+    header = bytearray(FRAME_HEADER.size)
+    view = memoryview(header)
+    received = 0
+    while received < len(header):
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            break
+        received += count
+        if bytes(view[: min(received, len(FRAME_MAGIC))]) != FRAME_MAGIC[:received]:
+            if not legacy:
+                raise FrameError("Cabeçalho de quadro inválido")
+            return recv_until_closed(sock, view[:received]), 0
+
+    if received == 0:
+        return None, 0
+    if received < len(header):
+        raise FrameError(f"Cabeçalho incompleto: {received} de {len(header)} bytes")
+
+    flags, length, checksum = parse_frame_header(header)
+    with metrics.stage("recv") as timer:
+        payload = recv_exactly(sock, length)
+        timer.add(n_bytes=length)
+    verify_payload(payload, checksum)
+    return payload, flags
+
+
+def recv_frame(sock):
+    """
+    Receive one frame and verify its checksum.
+
+    Senders that predate framing write the raw payload and close the
+    connection; if the first bytes are not FRAME_MAGIC the rest of the
+    stream is read until EOF and returned as the payload.
+
+    Args:
+        sock (socket.socket): Connected socket
+
+    Returns:
+        bytearray: The payload, or None if the peer closed without sending anything
+
+    Raises:
+        FrameError: If the frame is truncated, corrupt or has an unknown version
+    """
+    return _recv_frame(sock)[0]
+
+
+def recv_frames(sock):
+    """
+    Yield the payloads of one streamed message, frame by frame.
+
+    Stops after the first frame without FLAG_MORE (a single-frame message
+    yields exactly one payload).
+
+    Args:
+        sock (socket.socket): Connected socket
+
+    Yields:
+        bytearray: Frame payloads, in order
+
+    Raises:
+        FrameError: If the connection closes after a frame with FLAG_MORE
+            (the message would otherwise end silently truncated)
+    """
+    flags = 0
+    while True:
+        more = flags & FLAG_MORE
+        payload, flags = _recv_frame(sock, legacy=not more)
+        if payload is None:
+            if more:
+                raise FrameError("Conexão encerrada no meio da mensagem (faltam quadros)")
+            return
+        yield payload
+        if not flags & FLAG_MORE:
+            return
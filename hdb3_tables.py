@@ -0,0 +1,268 @@
+import functools
+
+import numpy as np
+
+from encoding_module import _encode_hdb3
+
+# Encoder state: polarity of the last pulse (0: -1, 1: +1), parity of the 1s since the last
+# substitution and zeros (0-3) since the last pulse or substitution
+ENCODER_STATES = 16
+
+# Decoder state: 3 pending symbols (codes 0: zero, 1: +1, 2: -1), the last pulse before the
+# next decision (0: none within 4 samples, else polarity and gap), and the B flags of the last 3 decisions
+DECODER_STATES = 27 * 9 * 8
+
+
+def _encoder_state(polarity, parity, zeros):
+    return (polarity > 0) << 3 | parity << 2 | zeros
+
+
+@functools.lru_cache(maxsize=None)
+def encoder_tables():
+    """
+    Build the byte-at-a-time HDB3 encoder tables (once per process).
+
+    Returns:
+        tuple: (symbols[state, byte, 8] int8, next state[state, byte] as a
+            flat list for the sequential walk, patch position[state, byte]
+            into the previous byte's symbols or -1, patch value[state, byte])
+    """
+    symbols = np.zeros((ENCODER_STATES, 256, 8), dtype=np.int8)
+    next_state = [0] * (ENCODER_STATES * 256)
+    patch_position = np.full((ENCODER_STATES, 256), -1, dtype=np.int8)
+    patch_value = np.zeros((ENCODER_STATES, 256), dtype=np.int8)
+
+    for state in range(ENCODER_STATES):
+        for byte in range(256):
+            polarity = 1 if state >> 3 else -1
+            parity = state >> 2 & 1
+            zeros = state & 3
+            for k in range(8):
+                if byte >> (7 - k) & 1:
+                    polarity = -polarity
+                    symbols[state, byte, k] = polarity
+                    parity ^= 1
+                    zeros = 0
+                    continue
+                zeros += 1
+                if zeros < 4:
+                    continue
+                if parity == 0:  # B00V: the B goes on the first of the four zeros
+                    polarity = -polarity
+                    if k >= 3:
+                        symbols[state, byte, k - 3] = polarity
+                    else:  # That zero was already emitted with the previous byte
+                        patch_position[state, byte] = k + 5
+                        patch_value[state, byte] = polarity
+                symbols[state, byte, k] = polarity  # V repeats the polarity
+                parity = 0
+                zeros = 0
+            next_state[state << 8 | byte] = _encoder_state(polarity, parity, zeros)
+    return symbols, next_state, patch_position, patch_value
+
+
+def table_encode(bits):
+    """
+    HDB3-encode a bit array one byte per table lookup.
+
+    The state sequence is a walk over the bytes; symbols and B back-patches
+    are then gathered from the tables for all bytes at once. Trailing bits
+    that do not fill a byte are encoded by the vectorized engine from the
+    final state.
+
+    Args:
+        bits (numpy.ndarray): uint8 array of 0/1 values
+
+    Returns:
+        numpy.ndarray: float32 signal, identical to encode_line_code(bits)
+    """
+    return table_encode_state(bits)[0]
+
+
+def table_encode_state(bits, last_polarity=-1, one_count=0):
+    """
+    Like table_encode, starting from and returning the encoder state of _encode_hdb3.
+
+    The bits must start after a 1 or a complete group of four zeros (as the
+    chunks of StreamingHDB3Encoder do), so no zeros are pending on entry.
+
+    Returns:
+        tuple: (float32 signal, last polarity, parity of the 1s since the last substitution)
+    """
+    symbols, next_state, patch_position, patch_value = encoder_tables()
+    full = len(bits) - len(bits) % 8
+    data = np.packbits(bits[:full])
+
+    states = bytearray(len(data))
+    state = _encoder_state(last_polarity, one_count, 0)
+    for i, byte in enumerate(data.tolist()):
+        states[i] = state
+        state = next_state[state << 8 | byte]
+    states = np.frombuffer(states, dtype=np.uint8)
+
+    signal = symbols[states, data].ravel().astype(np.float32)
+    patched = np.flatnonzero(patch_position[states, data] >= 0)
+    signal[(patched - 1) * 8 + patch_position[states[patched], data[patched]]] = patch_value[
+        states[patched], data[patched]
+    ]
+
+    # Leftover bits: re-encode the pending zeros together with them
+    zeros = state & 3
+    last_polarity, one_count = 1 if state >> 3 else -1, state >> 2 & 1
+    if full == len(bits):
+        return signal, last_polarity, one_count
+    tail, last_polarity, one_count = _encode_hdb3(
+        np.concatenate([np.zeros(zeros, dtype=np.uint8), bits[full:]]), last_polarity, one_count
+    )
+    return np.concatenate([signal[: full - zeros], tail]), last_polarity, one_count
+
+
+def _decoder_step():
+    """
+    One-symbol transition of the decoder transducer, for every state and symbol.
+
+    Reading symbol x decides the oldest pending symbol p0 (whose look-ahead
+    is p1, p2, x), exactly as _decode_hdb3 does: p0 is a B if it starts a
+    B00V candidate and the position 3 before it was not a B; it is a V if
+    that position was a B or if it closes a 000V.
+
+    Returns:
+        tuple: (next state[state, symbol], decided bit[state, symbol])
+    """
+    state = np.arange(DECODER_STATES)[:, None]
+    x = np.arange(3)[None, :]
+    flags = state % 8
+    last = state // 8 % 9
+    pending = state // 72
+    p0, p1, p2 = pending // 9, pending // 3 % 3, pending % 3
+
+    last_polarity = (last - 1) // 4 + 1  # Same codes as the symbols
+    gap = (last - 1) % 4 + 1
+    pulse = p0 != 0
+    b_before = (flags >> 2 & 1).astype(bool)
+
+    balancing = pulse & (p1 == 0) & (p2 == 0) & (x == p0) & ~b_before
+    violation = b_before | (pulse & (last > 0) & (gap == 4) & (last_polarity == p0))
+    bit = pulse & ~balancing & ~violation
+
+    next_last = np.where(pulse, (p0 - 1) * 4 + 1, np.where((last == 0) | (gap == 4), 0, last + 1))
+    next_flags = (flags << 1 & 7) | balancing
+    next_pending = p1 * 9 + p2 * 3 + x
+    return (next_pending * 9 + next_last) * 8 + next_flags, bit.astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=None)
+def decoder_tables():
+    """
+    Compose the one-symbol transducer into tables over PACKED2 bytes (4 symbols each).
+
+    Returns:
+        tuple: (next state[state, byte] as a flat list, decided bits[state, byte]
+            as a nibble, first symbol in the high bit)
+    """
+    step, bit = _decoder_step()
+    codes = np.arange(256)
+    state = np.repeat(np.arange(DECODER_STATES)[:, None], 256, axis=1)
+    nibbles = np.zeros((DECODER_STATES, 256), dtype=np.uint8)
+    for shift in (6, 4, 2, 0):
+        symbol = (codes >> shift) & 3
+        symbol = np.where(symbol == 3, 0, symbol)  # Unused code 3 decodes as a zero, as in unpack_signal
+        nibbles = nibbles << 1 | bit[state, symbol]
+        state = step[state, symbol]
+    return state.astype(np.int64).ravel().tolist(), nibbles
+
+
+def table_decode_packed(payload, n_symbols):
+    """
+    HDB3-decode a PACKED2 payload one byte (4 symbols) per table lookup.
+
+    Args:
+        payload (bytes-like): Packed symbols (FORMAT_PACKED2 without its header)
+        n_symbols (int): Number of symbols in the payload
+
+    Returns:
+        numpy.ndarray: uint8 bit array, one bit per symbol
+    """
+    # Each lookup decides the symbol 3 places back, so 3 zeros are fed after the last one
+    # (a zero never completes a B00V, like the end of the signal)
+    data = np.zeros(-(-(n_symbols + 3) // 4), dtype=np.uint8)
+    data[: len(payload)] = np.frombuffer(payload, dtype=np.uint8)[: len(data)]
+    bits, _ = _walk_decoder(data, 0)  # Three zeros pending, no previous pulse, no B flags
+    return bits[3 : 3 + n_symbols]  # The first 3 decisions are the initial zeros
+
+
+def _walk_decoder(data, state):
+    """Run the decoder tables over PACKED2 bytes from state; returns (decided bits, final state)."""
+    next_state, nibbles = decoder_tables()
+    walk = []
+    for byte in data.tolist():
+        walk.append(state)
+        state = next_state[state << 8 | byte]
+    states = np.array(walk, dtype=np.uint16)
+    return np.unpackbits(nibbles[states, data][:, None], axis=1)[:, 4:].ravel(), state
+
+
+def _symbol_codes(signal):
+    """Ternary samples to the 2-bit codes of FORMAT_PACKED2 (0: zero, 1: +1, 2: -1)."""
+    signal = np.asarray(signal)
+    return ((signal > 0) | ((signal < 0) << 1)).astype(np.uint8)
+
+
+def _pack_codes(codes):
+    codes = codes.reshape(-1, 4)
+    return codes[:, 0] << 6 | codes[:, 1] << 4 | codes[:, 2] << 2 | codes[:, 3]
+
+
+def table_decode(signal):
+    """
+    HDB3-decode a ternary signal ({-1, 0, +1}) with the byte tables.
+
+    Returns:
+        numpy.ndarray: uint8 bit array, identical to decode_line_code(signal)
+    """
+    n = len(signal)
+    codes = np.zeros(n + (-n) % 4, dtype=np.uint8)
+    codes[:n] = _symbol_codes(signal)
+    return table_decode_packed(_pack_codes(codes), n)
+
+
+class StreamingTableDecoder:
+    """
+    Chunk-by-chunk HDB3 decoder over the byte tables (same interface as StreamingHDB3Decoder).
+
+    The transducer state carries across chunks; symbols that do not fill a
+    byte wait for the next chunk. The concatenation of the outputs of feed
+    and flush equals table_decode of the whole signal.
+    """
+
+    def __init__(self):
+        self.state = 0  # As in table_decode_packed: three zeros pending
+        self.pending = np.zeros(0, dtype=np.uint8)  # Codes of the symbols short of a byte
+        self.skip = 3  # Decisions still owed to the initial zeros
+        self.symbols = 0  # Symbols fed so far
+        self.decided = 0  # Bits returned so far
+
+    def _decode(self, codes):
+        bits, self.state = _walk_decoder(_pack_codes(codes), self.state)
+        skipped = min(self.skip, len(bits))
+        self.skip -= skipped
+        bits = bits[skipped:]
+        self.decided += len(bits)
+        return bits
+
+    def feed(self, chunk):
+        codes = np.concatenate([self.pending, _symbol_codes(chunk)])
+        self.symbols += len(codes) - len(self.pending)
+        full = len(codes) - len(codes) % 4
+        self.pending = codes[full:]
+        return self._decode(codes[:full])
+
+    def flush(self):
+        # Three zeros decide the last symbols, as at the end of table_decode_packed
+        n = len(self.pending) + 3
+        codes = np.zeros(n + (-n) % 4, dtype=np.uint8)
+        codes[: len(self.pending)] = self.pending
+        owed = self.symbols - self.decided
+        bits = self._decode(codes)[:owed]
+        self.__init__()  # Ready for the next message
+        return bits
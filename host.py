@@ -1,8 +1,61 @@
+import os
 import streamlit as st
-import socket
 import numpy as np
-from encoding_module import encode_line_code, encrypt_message
-from visualization import plot_signal_waveform, plot_binary_signal
+import metrics
+from arq import ArqReport
+from encoding_module import (
+    FORMAT_BASE3,
+    FORMAT_FLOAT32,
+    FORMAT_PACKED2,
+    as_bit_array,
+    bits_to_bytes,
+    bits_to_string,
+    bytes_to_bits,
+    encrypt_bytes,
+    text_to_bytes,
+)
+from line_codes import LINE_CODES, get_line_code
+from pipeline import mapped_file
+from transmitter import get_transmitter
+from visualization import (
+    RENDER_CACHE_ENTRIES,
+    content_key,
+    render_binary_signal,
+    render_signal_waveform,
+    show_arq_report,
+    show_metrics_sidebar,
+)
+from waveform_viewer import show_waveform_viewer
+
+# Caesar cipher shift applied before transmission
+SHIFT = 3
+
+
+# Encryption and line coding are cached per (message, shift, line code): reruns caused by
+# other widgets redisplay the previous results without recomputing them
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+def encode_message(message, shift=SHIFT, line_code="hdb3"):
+    with metrics.stage("encrypt") as timer:
+        encrypted_bytes = encrypt_bytes(text_to_bytes(message), shift)
+        timer.add(n_bytes=len(encrypted_bytes))
+    with metrics.stage("bits") as timer:
+        message_bits = bytes_to_bits(encrypted_bytes)
+        timer.add(n_bytes=len(encrypted_bytes))
+    return encrypted_bytes, message_bits, encode_symbols(message_bits, line_code)
+
+
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+def encode_binary(binary_string, line_code="hdb3"):
+    message_bits = as_bit_array(binary_string)
+    return message_bits, encode_symbols(message_bits, line_code)
+
+
+def encode_symbols(message_bits, line_code="hdb3"):
+    with metrics.stage("line_code_encode") as timer:
+        encoded_signal = get_line_code(line_code).encode(message_bits)
+        timer.add(symbols=len(encoded_signal))
+    return encoded_signal
+
 
 # Initialize session state for reset functionality
 if "reset" not in st.session_state:
@@ -17,6 +70,7 @@ if "test_mode" not in st.session_state:
     st.session_state.test_mode = False
 
 st.title("Host A - Transmissor")
+show_metrics_sidebar()
 
 
 # Function to reset input fields
@@ -46,6 +100,37 @@ with col2:
         key="port_input",
     )
 
+# Wire format of the encoded signal
+SIGNAL_FORMATS = {
+    "2 bits por símbolo": FORMAT_PACKED2,
+    "Base 3 (5 símbolos por byte)": FORMAT_BASE3,
+    "float32 (compatível com receptores antigos)": FORMAT_FLOAT32,
+}
+signal_format = SIGNAL_FORMATS[
+    st.selectbox("Formato de transmissão:", options=list(SIGNAL_FORMATS))
+]
+
+# Line code: announced in every payload, so the receiver picks the decoder by itself
+line_code = st.selectbox(
+    "Código de linha:",
+    options=list(LINE_CODES),
+    format_func=lambda name: LINE_CODES[name].description,
+)
+
+# Forward error correction: the receiver has to enable it as well
+use_fec = st.toggle(
+    "🛡️ FEC (Hamming + palavras de sincronização)",
+    help="Blocos corrigem 1 bit por palavra e se ressincronizam após símbolos perdidos; "
+    "dobra o tamanho do sinal. Ligue também no receptor.",
+)
+
+# Acknowledged transfer: the send only succeeds once the receiver confirmed every chunk
+use_arq = st.toggle(
+    "🔁 Confirmação e retransmissão (ARQ)",
+    help="O receptor confirma cada trecho e só os perdidos ou corrompidos são reenviados. "
+    "Ligue também no receptor.",
+)
+
 # Test mode toggle
 st.markdown("---")
 st.session_state.test_mode = st.toggle(
@@ -53,6 +138,48 @@ st.session_state.test_mode = st.toggle(
     value=st.session_state.test_mode,
 )
 
+# File mode: sends a file from this computer, memory-mapped instead of read into the session
+file_mode = not st.session_state.test_mode and st.toggle(
+    "📁 Modo Arquivo (enviar um arquivo deste computador)"
+)
+if file_mode:
+    file_path = st.text_input("Caminho do arquivo:", key="file_path")
+    if file_path and not os.path.isfile(file_path):
+        st.error(f"❌ Arquivo não encontrado: {file_path}")
+    elif file_path:
+        file_size = os.path.getsize(file_path)
+        st.write(
+            f"📄 **{os.path.basename(file_path)}**: {file_size:,} bytes "
+            f"({round(8 * file_size * LINE_CODES[line_code].symbols_per_bit):,} símbolos "
+            f"{line_code.upper()})"
+        )
+        # Large HDB3 chunks are split among this many processes (0 = every core)
+        workers = st.number_input(
+            "Processos para o HDB3 (0 = todos os núcleos):", min_value=0, value=1
+        )
+        if st.button("📡 Enviar Arquivo"):
+            try:
+                arq_report = ArqReport() if use_arq else None
+                with st.spinner("Enviando..."), mapped_file(file_path) as data:
+                    get_transmitter(receiver_ip, st.session_state.port_input).send(
+                        data,
+                        shift=SHIFT,
+                        signal_format=signal_format,
+                        fec=use_fec,
+                        arq_report=arq_report,
+                        line_code=line_code,
+                        workers=workers or None,
+                    )
+                st.success(
+                    f"Arquivo {'confirmado por' if use_arq else 'enviado com sucesso para'} "
+                    f"{receiver_ip}:{st.session_state.port_input}!"
+                )
+                if arq_report is not None:
+                    show_arq_report(arq_report)
+            except Exception as e:
+                st.error(f"Erro ao enviar: {e}")
+    st.stop()
+
 # Message input (only show if not in test mode)
 if not st.session_state.test_mode:
     message = st.text_input("Digite a mensagem:", key="message")
@@ -75,10 +202,8 @@ if message or st.session_state.test_mode:
         st.write("❌ Pulada no modo de teste")
 
         # Use test binary directly
-        binary_msg = " ".join(
-            test_binary[i : i + 8] for i in range(0, len(test_binary), 8)
-        )
-        final_binary = test_binary
+        message_bits, encoded_signal = encode_binary(test_binary, line_code)
+        message_key = content_key(test_binary, line_code)
 
     else:
         # Normal mode: process message
@@ -86,36 +211,35 @@ if message or st.session_state.test_mode:
         st.subheader("📝 Mensagem Original")
         st.write(message)
 
-        # Encrypt
-        encrypted = encrypt_message(message)
+        # Encrypt, convert to binary and apply line coding (cached)
+        encrypted_bytes, message_bits, encoded_signal = encode_message(message, SHIFT, line_code)
+        message_key = content_key(message, SHIFT, line_code)
         st.subheader("🔐 Mensagem Criptografada")
-        st.write(encrypted)
+        st.write(encrypted_bytes.decode("latin-1"))  # Not UTF-8: one character per byte
 
-        # Convert to binary
-        binary_msg = " ".join(format(ord(c), "08b") for c in encrypted)
-        final_binary = binary_msg.replace(" ", "")
-
-    # Show binary representation
+    # Show binary representation (text only for display)
+    binary_msg = bits_to_string(message_bits, group=8)
     st.subheader("🔢 Representação Binária")
     st.write(binary_msg)
 
-    # Visualize binary data
-    binary_fig = plot_binary_signal(
-        binary_msg,
+    # Visualize binary data (PNG cached per message, shift and plot parameters)
+    binary_png = render_binary_signal(
+        message_key,
+        message_bits,
         title=(
             "Bits da mensagem"
             if not st.session_state.test_mode
             else "Bits da sequência de teste"
         ),
     )
-    st.pyplot(binary_fig)
+    st.image(binary_png, use_container_width=True)
 
-    # Apply line coding
-    encoded_signal = encode_line_code(final_binary)
+    # Line coding was applied together with the encryption
     st.subheader("⚡ Sinal Codificado")
 
     # Show waveform
-    fig = plot_signal_waveform(
+    waveform_png = render_signal_waveform(
+        message_key,
         encoded_signal,
         (
             "📊 Forma de onda do sinal codificado"
@@ -123,7 +247,13 @@ if message or st.session_state.test_mode:
             else "📊 Forma de onda do sinal de teste"
         ),
     )
-    st.pyplot(fig)
+    st.image(waveform_png, use_container_width=True)
+
+    # Zoomable view, fed from a multi-resolution pyramid of the signal
+    if st.toggle("🔍 Visualizador interativo (zoom)"):
+        show_waveform_viewer(
+            encoded_signal, message_key, title="Visão geral do sinal codificado"
+        )
 
     # Send buttons
     button_col1, button_col2 = st.columns(2)
@@ -136,16 +266,38 @@ if message or st.session_state.test_mode:
         )
         if st.button(send_label):
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.connect((receiver_ip, st.session_state.port_input))
-                    s.sendall(encoded_signal.tobytes())
+                # Reuses the kept-alive connection to this receiver (reconnects if needed)
+                transmitter = get_transmitter(receiver_ip, st.session_state.port_input)
+                arq_report = ArqReport() if use_arq else None
+                if st.session_state.test_mode:
+                    transmitter.send(
+                        bits_to_bytes(message_bits),
+                        shift=None,
+                        signal_format=signal_format,
+                        fec=use_fec,
+                        arq_report=arq_report,
+                        line_code=line_code,
+                    )
+                else:
+                    # Already encrypted (and cached) by encode_message: sent as is, like the test bits
+                    transmitter.send(
+                        encrypted_bytes,
+                        shift=None,
+                        signal_format=signal_format,
+                        fec=use_fec,
+                        arq_report=arq_report,
+                        line_code=line_code,
+                    )
 
+                sent = "confirmada por" if use_arq else "enviada com sucesso para"
                 success_msg = (
-                    f"Mensagem enviada com sucesso para {receiver_ip}:{st.session_state.port_input}!"
+                    f"Mensagem {sent} {receiver_ip}:{st.session_state.port_input}!"
                     if not st.session_state.test_mode
-                    else f"Sequência de teste enviada com sucesso para {receiver_ip}:{st.session_state.port_input}!"
+                    else f"Sequência de teste {sent} {receiver_ip}:{st.session_state.port_input}!"
                 )
                 st.success(success_msg)
+                if arq_report is not None:
+                    show_arq_report(arq_report)
             except Exception as e:
                 st.error(f"Erro ao enviar: {e}")
 
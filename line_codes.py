@@ -0,0 +1,428 @@
+import abc
+
+import numpy as np
+
+from encoding_module import (
+    FORMAT_BASE3,
+    FORMAT_PACKED2,
+    FORMAT_QUATERNARY2,
+    LINE_CODE_HDB3,
+    StreamingHDB3Decoder,
+    StreamingHDB3Encoder,
+    _check_engine,
+    as_bit_array,
+    decode_line_code,
+    encode_line_code,
+)
+
+# Registered line codes by name, and by the number announced in the signal header
+LINE_CODES = {}
+_BY_CODE = {}
+
+# B8ZS replaces 8 zeros with 000VB0VB: offsets from the last of the 8 zeros and polarity
+# relative to the pulse before them (V repeats it, B alternates)
+_B8ZS_PATTERN = {-4: 1, -3: -1, -1: -1, 0: 1}
+
+_NO_BITS = np.zeros(0, dtype=np.uint8)
+_NO_SIGNAL = np.zeros(0, dtype=np.float32)
+
+
+def register(line_code):
+    """
+    Add a line code to the registry, making it available by name and by header number.
+
+    Args:
+        line_code (LineCode): The engine (its name and code must be unused)
+
+    Returns:
+        LineCode: line_code itself
+    """
+    if line_code.name in LINE_CODES or line_code.code in _BY_CODE:
+        raise ValueError(f"Código de linha já registrado: {line_code.name} ({line_code.code})")
+    LINE_CODES[line_code.name] = line_code
+    _BY_CODE[line_code.code] = line_code
+    return line_code
+
+
+def get_line_code(key):
+    """
+    Look a line code up by name (as on the command line) or by the number in the signal header.
+
+    Args:
+        key (str | int): Name or header number; a LineCode is returned as is
+
+    Returns:
+        LineCode: The registered engine
+    """
+    if isinstance(key, LineCode):
+        return key
+    line_code = LINE_CODES.get(key) if isinstance(key, str) else _BY_CODE.get(key)
+    if line_code is None:
+        raise ValueError(f"Código de linha desconhecido: {key!r}")
+    return line_code
+
+
+class LineCode(abc.ABC):
+    """
+    A line code engine: bit arrays to symbol levels and back, whole or chunk by chunk.
+
+    encoder() and decoder() return fresh streaming objects with feed(chunk)
+    and flush(), like StreamingHDB3Encoder/Decoder; the concatenation of
+    their outputs equals encode()/decode() of the whole array. Bits are
+    uint8 arrays of 0/1 and signals float32 arrays of the code's levels.
+    Their keyword options tune engines that have them (workers and engine
+    for HDB3, see encoding_module.LINE_CODE_ENGINES); other codes ignore them.
+
+    Attributes:
+        name (str): Registry key, used on the command line and in the UIs
+        code (int): Number announced in the signal header (0-255)
+        levels (tuple): Symbol levels the encoder produces
+        symbols_per_bit (float): Symbols on the line per message bit
+        description (str): One-line description for the UIs
+    """
+
+    name = None
+    code = None
+    levels = (-1, 0, 1)
+    symbols_per_bit = 1
+    description = ""
+
+    @abc.abstractmethod
+    def encoder(self, **options):
+        """Fresh streaming encoder (feed(bits) -> signal, flush())."""
+
+    @abc.abstractmethod
+    def decoder(self, **options):
+        """Fresh streaming decoder (feed(signal) -> bits, flush())."""
+
+    def encode(self, bits):
+        encoder = self.encoder()
+        return np.concatenate([encoder.feed(bits), encoder.flush()])
+
+    def decode(self, signal):
+        decoder = self.decoder()
+        return np.concatenate([decoder.feed(signal), decoder.flush()])
+
+    def wire_format(self, signal_format):
+        """
+        Wire format that carries this code's symbols, given the one requested.
+
+        Codes of up to three levels use it unchanged; four-level codes are
+        packed 2 bits per symbol in FORMAT_QUATERNARY2 instead of
+        FORMAT_PACKED2, and cannot be sent in base 3.
+        """
+        if len(self.levels) <= 3:
+            return signal_format
+        if signal_format == FORMAT_BASE3:
+            raise ValueError(f"O formato base 3 não comporta os {len(self.levels)} níveis do {self.name}")
+        return FORMAT_QUATERNARY2 if signal_format == FORMAT_PACKED2 else signal_format
+
+    def __repr__(self):
+        return f"<LineCode {self.name} ({self.code})>"
+
+
+class _BlockEncoder:
+    """
+    Streaming encoder for codes that map every block of bits on its own.
+
+    A trailing incomplete block waits for the next chunk. One still
+    incomplete at flush is rejected: padding it would make the decoder
+    return bits that were never sent, and the signal cannot tell them apart.
+    """
+
+    def __init__(self, encode_blocks, block=1):
+        self.encode_blocks = encode_blocks
+        self.block = block
+        self.pending = _NO_BITS
+
+    def feed(self, bits):
+        bits = as_bit_array(bits)
+        if len(self.pending):
+            bits = np.concatenate([self.pending, bits])
+        complete = len(bits) - len(bits) % self.block
+        self.pending = bits[complete:]
+        return self.encode_blocks(bits[:complete])
+
+    def flush(self):
+        if len(self.pending):
+            left = len(self.pending)
+            self.pending = _NO_BITS
+            raise ValueError(
+                f"A mensagem termina com {left} bit(s) fora de um bloco de {self.block}: "
+                f"este código de linha exige um múltiplo de {self.block} bits"
+            )
+        return _NO_SIGNAL
+
+
+class _BlockDecoder:
+    """
+    Streaming decoder for codes whose every block of symbols decodes on its own.
+
+    A trailing incomplete block waits for the next chunk; flush drops it.
+    """
+
+    def __init__(self, decode_blocks, block=1):
+        self.decode_blocks = decode_blocks
+        self.block = block
+        self.pending = _NO_SIGNAL
+
+    def feed(self, chunk):
+        signal = np.asarray(chunk, dtype=np.float32)
+        if len(self.pending):
+            signal = np.concatenate([self.pending, signal])
+        complete = len(signal) - len(signal) % self.block
+        self.pending = signal[complete:]
+        return self.decode_blocks(signal[:complete])
+
+    def flush(self):
+        self.pending = _NO_SIGNAL
+        return _NO_BITS
+
+
+class _WindowDecoder:
+    """
+    Streaming decoder for codes where a symbol's bit depends on its neighbours.
+
+    decode_window(window, start, end) decodes window[start:end], where
+    start samples of context come before and the window runs to the end
+    of the signal or at least lookahead samples past end.
+    """
+
+    def __init__(self, decode_window, context, lookahead):
+        self.decode_window = decode_window
+        self.context = context
+        self.lookahead = lookahead
+        self.window = np.zeros(context, dtype=np.float32)  # Zeros before the start of the message
+
+    def _decode(self, end):
+        bits = self.decode_window(self.window, self.context, end)
+        self.window = self.window[end - self.context :]
+        return bits
+
+    def feed(self, chunk):
+        self.window = np.concatenate([self.window, np.asarray(chunk, dtype=np.float32)])
+        end = len(self.window) - self.lookahead
+        if end <= self.context:
+            return _NO_BITS
+        return self._decode(end)
+
+    def flush(self):
+        bits = self._decode(len(self.window))
+        self.window = np.zeros(self.context, dtype=np.float32)
+        return bits
+
+
+def _bipolar(bits, last_polarity, substitute=None):
+    """
+    AMI core: ones alternate polarity, zeros stay zero.
+
+    With substitute=8, every run of 8 zeros becomes the B8ZS pattern
+    (the caller makes sure no run is cut at the end of bits). Runs are
+    found from the positions of the ones, so zeros cost nothing extra.
+
+    Returns:
+        tuple: (float32 signal, polarity of the last pulse)
+    """
+    if not len(bits):
+        return _NO_SIGNAL, last_polarity
+    odd = (np.cumsum(bits, dtype=np.uint8) & 1).view(np.int8)  # Parity of the ones so far (uint8 wraps)
+    polarity = (2 * odd - 1) * np.int8(-last_polarity)  # Of the last pulse at each bit
+    signal = polarity * bits.view(np.int8)
+
+    if substitute:
+        ones = np.flatnonzero(bits)
+        starts = np.concatenate([[0], ones + 1])  # First zero after each one
+        runs = (np.append(ones, len(bits)) - starts) // substitute  # Whole groups of zeros in each run
+        groups = np.repeat(starts, runs)
+        index = np.arange(len(groups)) - np.repeat(np.cumsum(runs) - runs, runs)
+        ends = groups + substitute * index + substitute - 1  # Last zero of each group
+        before = polarity[ends]
+        for offset, relative in _B8ZS_PATTERN.items():
+            signal[ends + offset] = relative * before
+
+    return signal.astype(np.float32), float(polarity[-1])
+
+
+class _BipolarEncoder:
+    """Streaming AMI/B8ZS encoder: trailing zeros that may still complete a run of 8 wait for the next chunk."""
+
+    def __init__(self, substitute=None):
+        self.substitute = substitute
+        self.last_polarity = -1.0  # The first pulse is +1, as in HDB3
+        self.pending_zeros = 0
+
+    def feed(self, bits):
+        bits = as_bit_array(bits)
+        if not self.substitute:
+            signal, self.last_polarity = _bipolar(bits, self.last_polarity)
+            return signal
+        if self.pending_zeros:
+            bits = np.concatenate([np.zeros(self.pending_zeros, dtype=np.uint8), bits])
+        trailing = int(bits[::-1].argmax()) if bits.any() else len(bits)
+        self.pending_zeros = trailing % self.substitute
+        signal, self.last_polarity = _bipolar(
+            bits[: len(bits) - self.pending_zeros], self.last_polarity, self.substitute
+        )
+        return signal
+
+    def flush(self):
+        signal = np.zeros(self.pending_zeros, dtype=np.float32)
+        self.pending_zeros = 0
+        return signal
+
+
+def _nonzero_bits(signal):
+    return (signal != 0).view(np.uint8)
+
+
+def _b8zs_bits(window, start, end):
+    """
+    Decode window[start:end] of a B8ZS signal: pulses are ones, except those of a 000VB0VB.
+
+    A substitution is recognised by its two bipolar violations: three zeros,
+    a pulse repeating the polarity before them, the opposite pulse, a zero,
+    and the same pair again.
+    """
+    window = window.astype(np.int8)  # Levels in int8: cheaper comparisons
+    n = len(window)
+    last = n - 7
+    s = [window[i : last + i] for i in range(8)]
+    found = (
+        (s[0] == 0)
+        & (s[1] == 0)
+        & (s[2] == 0)
+        & (s[3] != 0)
+        & (s[4] == -s[3])
+        & (s[5] == 0)
+        & (s[6] == s[4])
+        & (s[7] == s[3])
+    )
+    substituted = np.zeros(n, dtype=bool)
+    for offset in (3, 4, 6, 7):
+        substituted[offset : offset + last] |= found
+    return ((window[start:end] != 0) & ~substituted[start:end]).view(np.uint8)
+
+
+def _nrz_symbols(bits):
+    return bits.astype(np.float32) * 2 - 1
+
+
+def _nrz_bits(signal):
+    return (signal > 0).view(np.uint8)
+
+
+def _manchester_symbols(bits):
+    level = bits.astype(np.float32) * 2 - 1
+    signal = np.empty(2 * len(bits), dtype=np.float32)
+    signal[0::2] = -level  # IEEE 802.3: a 1 is a rising edge in the middle of the bit
+    signal[1::2] = level
+    return signal
+
+
+def _manchester_bits(signal):
+    return (signal[1::2] > signal[0::2]).view(np.uint8)
+
+
+def _2b1q_symbols(bits):
+    sign = bits[0::2].astype(np.float32) * 2 - 1  # First bit: sign
+    magnitude = 3 - 2 * bits[1::2].astype(np.float32)  # Second bit: 0 -> 3, 1 -> 1
+    return sign * magnitude
+
+
+def _2b1q_bits(signal):
+    bits = np.empty(2 * len(signal), dtype=np.uint8)
+    bits[0::2] = signal > 0
+    bits[1::2] = np.abs(signal) < 2
+    return bits
+
+
+class HDB3(LineCode):
+    name = "hdb3"
+    code = LINE_CODE_HDB3
+    description = "HDB3: bipolar, no máximo 3 zeros seguidos"
+
+    def encoder(self, workers=1, engine="vector", **options):
+        return StreamingHDB3Encoder(workers, engine)
+
+    def decoder(self, workers=1, engine="vector", **options):
+        _check_engine(engine)
+        if engine == "table":
+            from hdb3_tables import StreamingTableDecoder
+
+            return StreamingTableDecoder()
+        return StreamingHDB3Decoder(workers)
+
+    def encode(self, bits):
+        return encode_line_code(bits)
+
+    def decode(self, signal):
+        return decode_line_code(signal)
+
+
+class NRZ(LineCode):
+    name = "nrz"
+    code = 1
+    levels = (-1, 1)
+    description = "NRZ polar: +1 para 1, -1 para 0"
+
+    def encoder(self, **options):
+        return _BlockEncoder(_nrz_symbols)
+
+    def decoder(self, **options):
+        return _BlockDecoder(_nrz_bits)
+
+
+class Manchester(LineCode):
+    name = "manchester"
+    code = 2
+    levels = (-1, 1)
+    symbols_per_bit = 2
+    description = "Manchester: uma transição no meio de cada bit"
+
+    def encoder(self, **options):
+        return _BlockEncoder(_manchester_symbols)
+
+    def decoder(self, **options):
+        return _BlockDecoder(_manchester_bits, 2)
+
+
+class AMI(LineCode):
+    name = "ami"
+    code = 3
+    description = "AMI: bipolar, uns com polaridade alternada"
+
+    def encoder(self, **options):
+        return _BipolarEncoder()
+
+    def decoder(self, **options):
+        return _BlockDecoder(_nonzero_bits)
+
+
+class B8ZS(LineCode):
+    name = "b8zs"
+    code = 4
+    description = "B8ZS: AMI com 8 zeros substituídos por 000VB0VB"
+
+    def encoder(self, **options):
+        return _BipolarEncoder(substitute=8)
+
+    def decoder(self, **options):
+        return _WindowDecoder(_b8zs_bits, context=7, lookahead=4)
+
+
+class TwoB1Q(LineCode):
+    name = "2b1q"
+    code = 5
+    levels = (-3, -1, 1, 3)
+    symbols_per_bit = 0.5
+    description = "2B1Q: 2 bits por símbolo em 4 níveis"
+
+    def encoder(self, **options):
+        return _BlockEncoder(_2b1q_symbols, 2)
+
+    def decoder(self, **options):
+        return _BlockDecoder(_2b1q_bits)
+
+
+for _line_code in (HDB3(), NRZ(), Manchester(), AMI(), B8ZS(), TwoB1Q()):
+    register(_line_code)
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation is off unless enabled here or with HDB3_METRICS=1. When off, stage() and
+# connection() return a shared no-op timer, so an instrumented chunk costs one call and one check.
+# Only the standard library is used, so the CLI can import this module at no cost.
+_enabled = os.environ.get("HDB3_METRICS", "") not in ("", "0")
+
+# Pipeline stages, in the order a message goes through them (others are listed after these)
+STAGES = (
+    "encrypt",
+    "bits",
+    "fec_encode",
+    "line_code_encode",
+    "pack",
+    "send",
+    "recv",
+    "unpack",
+    "line_code_decode",
+    "fec_decode",
+    "bytes",
+    "decrypt",
+    "plot",
+)
+
+_lock = threading.Lock()
+_stages = {}
+_connections = {}
+
+
+def enable(on=True):
+    """Turn instrumentation on or off for the whole process (collected values are kept)."""
+    global _enabled
+    _enabled = bool(on)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget every collected value."""
+    with _lock:
+        _stages.clear()
+        _connections.clear()
+
+
+class _Timer:
+    """Times a `with` block and adds it, with the bytes/symbols reported by add(), to one entry."""
+
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+        self.n_bytes = 0
+        self.symbols = 0
+
+    def add(self, n_bytes=0, symbols=0):
+        self.n_bytes += n_bytes
+        self.symbols += symbols
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        with _lock:
+            entry = self.table.setdefault(
+                self.key, {"calls": 0, "seconds": 0.0, "last_seconds": 0.0, "bytes": 0, "symbols": 0}
+            )
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["last_seconds"] = seconds
+            entry["bytes"] += self.n_bytes
+            entry["symbols"] += self.symbols
+        return False
+
+
+class _NoopTimer:
+    def add(self, n_bytes=0, symbols=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def stage(name):
+    """
+    Time one run of a pipeline stage.
+
+    Usage::
+
+        with metrics.stage("encrypt") as timer:
+            out = encrypt_bytes(chunk)
+            timer.add(n_bytes=len(chunk))
+
+    Args:
+        name (str): Stage name (see STAGES)
+
+    Returns:
+        A context manager whose add(n_bytes, symbols) counts the data processed
+    """
+    return _Timer(_stages, name) if _enabled else _NOOP
+
+
+def connection(peer):
+    """
+    Time one message on one connection, for per-connection throughput.
+
+    Args:
+        peer: (host, port) of the other end, or any string
+
+    Returns:
+        A context manager like stage(); add(n_bytes) counts the bytes transferred
+    """
+    if not _enabled:
+        return _NOOP
+    key = f"{peer[0]}:{peer[1]}" if isinstance(peer, tuple) else str(peer)
+    return _Timer(_connections, key)
+
+
+def counted(items, peer):
+    """
+    Pass a message's chunks through, adding their sizes to the entry of its connection.
+
+    Args:
+        items (iterable): Bytes-like chunks (e.g. frame payloads)
+        peer: A connected socket, or the (host, port) of the other end
+
+    Returns:
+        iterable: The same chunks (items itself when instrumentation is off)
+    """
+    if not _enabled:
+        return items
+    if hasattr(peer, "getpeername"):
+        peer = peer.getpeername()
+    return _counted(items, peer)
+
+
+def _counted(items, peer):
+    with connection(peer) as timer:
+        for item in items:
+            timer.add(n_bytes=len(item))
+            yield item
+
+
+def _ordered(stages):
+    order = {name: i for i, name in enumerate(STAGES)}
+    return dict(sorted(stages.items(), key=lambda item: (order.get(item[0], len(order)), item[0])))
+
+
+def snapshot():
+    """
+    Return a copy of everything collected so far.
+
+    Returns:
+        dict: {"stages": {name: totals}, "connections": {peer: totals}}, where
+            totals holds calls, seconds, last_seconds, bytes, symbols and
+            bytes_per_second
+    """
+    with _lock:
+        stages = {name: dict(entry) for name, entry in _stages.items()}
+        connections = {peer: dict(entry) for peer, entry in _connections.items()}
+    for entry in list(stages.values()) + list(connections.values()):
+        entry["bytes_per_second"] = entry["bytes"] / entry["seconds"] if entry["seconds"] else None
+    return {"stages": _ordered(stages), "connections": connections}
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """Render the collected values in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+    series = [
+        ("stage", "stages", "calls", "hdb3_stage_calls_total", "Runs of each pipeline stage"),
+        ("stage", "stages", "seconds", "hdb3_stage_seconds_total", "Time spent in each pipeline stage"),
+        ("stage", "stages", "bytes", "hdb3_stage_bytes_total", "Bytes processed by each pipeline stage"),
+        ("stage", "stages", "symbols", "hdb3_stage_symbols_total", "HDB3 symbols processed by each stage"),
+        ("peer", "connections", "calls", "hdb3_connection_messages_total", "Messages per connection"),
+        ("peer", "connections", "seconds", "hdb3_connection_seconds_total", "Transfer time per connection"),
+        ("peer", "connections", "bytes", "hdb3_connection_bytes_total", "Bytes transferred per connection"),
+    ]
+    for label, table, field, metric, help_text in series:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for key, entry in data[table].items():
+            lines.append(f'{metric}{{{label}="{_escape(key)}"}} {entry[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_json(path):
+    """Append the current snapshot, with a timestamp, as one line of a JSON log file."""
+    record = {"time": time.time(), **snapshot()}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_prometheus(port, host="0.0.0.0"):
+    """
+    Serve prometheus_text() at http://host:port/metrics from a background thread.
+
+    Also enables instrumentation, since there would be nothing to export otherwise.
+
+    Returns:
+        ThreadingHTTPServer: The server (call shutdown() to stop it)
+    """
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
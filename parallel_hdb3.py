@@ -0,0 +1,314 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from encoding_module import _b00v_candidates, _decode_hdb3, _encode_hdb3
+
+_executor = None
+_executor_workers = 0
+
+
+def get_executor(workers=None):
+    """Return the shared process pool, (re)creating it for the requested number of workers."""
+    global _executor, _executor_workers
+    workers = workers or os.cpu_count() or 1
+    if _executor is None or _executor_workers != workers:
+        shutdown()
+        _executor = ProcessPoolExecutor(workers)
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown():
+    """Stop the worker processes (they are started again on the next parallel call)."""
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown()
+    _executor, _executor_workers = None, 0
+
+
+class _SharedArray:
+    """A NumPy array in a shared memory block, created by the parent and attached by name in workers."""
+
+    def __init__(self, shape, dtype, name=None):
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.spec = (shape, np.dtype(dtype).str, self.shm.name)
+
+    @classmethod
+    def attach(cls, spec):
+        shape, dtype, name = spec
+        return cls(shape, dtype, name)
+
+    def close(self):
+        del self.array
+        self.shm.close()
+
+    def release(self):
+        self.close()
+        self.shm.unlink()
+
+
+def _segment_bounds(n, segments, minimum=4):
+    """Split range(n) into about `segments` nominal boundaries (at least `minimum` apart)."""
+    segments = max(1, min(segments, n // minimum))
+    return [n * i // segments for i in range(segments + 1)]
+
+
+def _encode_split(bits, boundary):
+    """
+    Move a boundary forward to a point where the encoder carries no pending zeros.
+
+    A segment can be encoded from (last polarity, pulse parity) alone if it
+    starts right after a 1 or at the start of a group of four zeros, so the
+    boundary is moved to the first such point at or after the nominal one
+    (at most 3 bits later).
+    """
+    before = bits[:boundary]
+    last_one = boundary - 1 - int(before[::-1].argmax()) if before.any() else -1
+    for split in range(boundary, min(boundary + 4, len(bits))):
+        if bits[split - 1] == 1:
+            last_one = split - 1
+        if (split - last_one - 1) % 4 == 0:
+            return split
+    return len(bits)
+
+
+def _encode_segment(bits_spec, signal_spec, start, stop):
+    """
+    Worker: encode bits[start:stop] from the canonical state (polarity -1, even parity).
+
+    Returns:
+        tuple: (polarity flipped?, final parity, index of the first V or None, first substitution is B00V?)
+    """
+    bits = _SharedArray.attach(bits_spec)
+    signal = _SharedArray.attach(signal_spec)
+    try:
+        segment = bits.array[start:stop]
+        encoded, last_polarity, one_count = _encode_hdb3(segment)
+        signal.array[start:stop] = encoded
+
+        # The first V is the 4th zero of the first run of at least four zeros
+        zeros = segment == 0
+        runs = np.flatnonzero(zeros[:-3] & zeros[1:-2] & zeros[2:-1] & zeros[3:])
+        first_v = start + int(runs[0]) + 3 if len(runs) else None
+        first_b00v = first_v is not None and encoded[first_v - start - 3] != 0
+        return last_polarity == 1, one_count, first_v, first_b00v
+    finally:
+        bits.close()
+        signal.close()
+
+
+def _negate(values):
+    np.subtract(0, values, out=values)  # 0 - 0 stays +0.0 (np.negative would give -0.0)
+
+
+def _fix_segment(signal_spec, start, stop, negate, first_v, first_b00v):
+    """
+    Worker: turn a canonically encoded segment into the one its real state produces.
+
+    A different parity only changes the type of the first substitution
+    (B00V <-> 000V), which adds or removes one polarity flip from there on;
+    a different initial polarity mirrors the whole segment.
+    """
+    signal = _SharedArray.attach(signal_spec)
+    try:
+        values = signal.array
+        if first_v is not None and first_b00v:  # B00V becomes 000V
+            values[first_v - 3] = 0
+            _negate(values[first_v - 2 : stop])
+        elif first_v is not None:  # 000V becomes B00V
+            _negate(values[first_v:stop])
+            values[first_v - 3] = values[first_v]
+        if negate:
+            _negate(values[start:stop])
+    finally:
+        signal.close()
+
+
+def parallel_encode(bits, workers=None, segments=None):
+    """
+    HDB3-encode a large bit array on several processes.
+
+    The bits are split at points where the encoder state is only the
+    polarity of the last pulse and the parity of the pulses since the last
+    substitution. Each worker encodes its segment from a fixed state into
+    shared memory; a serial pass over the per-segment summaries then finds
+    the real state at every boundary, and the workers patch their segments
+    (a sign flip, plus the first substitution when the parity differs).
+
+    Args:
+        bits (numpy.ndarray): uint8 array of 0/1 values
+        workers (int): Number of processes (None uses every core)
+        segments (int): Number of segments (None: one per process)
+
+    Returns:
+        numpy.ndarray: float32 signal, identical to encode_line_code(bits)
+    """
+    return parallel_encode_state(bits, workers=workers, segments=segments)[0]
+
+
+def parallel_encode_state(bits, last_polarity=-1, one_count=0, workers=None, segments=None):
+    """
+    Like parallel_encode, from and to an encoder state, as _encode_hdb3 (for the streaming encoder).
+
+    Returns:
+        tuple: (float32 signal, polarity of the last pulse, parity of the pulses since the last substitution)
+    """
+    executor = get_executor(workers)
+    n = len(bits)
+    shared_bits = _SharedArray((n,), np.uint8)
+    shared_signal = _SharedArray((n,), np.float32)
+    try:
+        shared_bits.array[:] = bits
+        bounds = [0]
+        for boundary in _segment_bounds(n, segments or _executor_workers)[1:-1]:
+            split = _encode_split(shared_bits.array, boundary)
+            if bounds[-1] < split < n:
+                bounds.append(split)
+        bounds.append(n)
+        segments = list(zip(bounds[:-1], bounds[1:]))
+
+        summaries = executor.map(
+            _encode_segment,
+            *zip(*[(shared_bits.spec, shared_signal.spec, start, stop) for start, stop in segments]),
+        )
+
+        # Serial prefix pass: real (polarity, parity) entering each segment
+        fixes = []
+        for (start, stop), (flipped, final_count, first_v, first_b00v) in zip(segments, summaries):
+            flip_first = first_v is not None and one_count != 0
+            fixes.append((start, stop, last_polarity == 1, first_v if flip_first else None, first_b00v))
+            if flipped != flip_first:
+                last_polarity = -last_polarity
+            one_count = final_count if first_v is not None else one_count ^ final_count
+
+        pending = [(shared_signal.spec,) + fix for fix in fixes if fix[2] or fix[3] is not None]
+        if pending:
+            list(executor.map(_fix_segment, *zip(*pending)))
+        return shared_signal.array.copy(), last_polarity, one_count
+    finally:
+        shared_bits.release()
+        shared_signal.release()
+
+
+def _decode_segment(signal_spec, bits_spec, start, stop):
+    """
+    Worker: decode signal[start:stop] assuming no B00V crosses into it from the left.
+
+    The 4 samples before the segment give the 000V context and 3 samples
+    after it the B00V look-ahead, so only that assumption can be wrong.
+
+    Returns:
+        tuple: (B flags of the last 3 samples, length of the leading chain of B00V candidates per column)
+    """
+    signal = _SharedArray.attach(signal_spec)
+    bits = _SharedArray.attach(bits_spec)
+    try:
+        values = signal.array
+        context = np.zeros(4, dtype=values.dtype)
+        context[4 - min(start, 4) :] = values[max(start - 4, 0) : start]
+        window = values[start : min(stop + 3, len(values))]
+        decoded, balancing = _decode_hdb3(window, context)
+        bits.array[start:stop] = decoded[: stop - start]
+
+        # Candidates at start+k, start+k+3, ... are the ones a B00V from the left would re-pair
+        candidates = _b00v_candidates(window)[: stop - start]
+        chains = []
+        for column in range(3):
+            chain = candidates[column::3]
+            chains.append(int(chain.argmin()) if not chain.all() else len(chain))
+        return balancing[stop - start - 3 : stop - start], chains
+    finally:
+        signal.close()
+        bits.close()
+
+
+def _is_000v(values, i):
+    return (
+        i >= 4
+        and values[i] != 0
+        and values[i - 3] == 0
+        and values[i - 2] == 0
+        and values[i - 1] == 0
+        and values[i] == values[i - 4]
+    )
+
+
+def parallel_decode(signal, workers=None, segments=None):
+    """
+    HDB3-decode a large signal on several processes.
+
+    Each worker decodes its segment assuming the previous one ends without
+    a pending B00V. A serial pass then propagates the real B flags across
+    boundaries: when a B00V does cross one, the candidates that follow it in
+    the same column pair up the other way, which changes exactly one bit
+    (right after that chain) or, if the chain runs to the end of the
+    segment, the flags handed to the next one.
+
+    Args:
+        signal (numpy.ndarray): HDB3 signal
+        workers (int): Number of processes (None uses every core)
+        segments (int): Number of segments (None: one per process)
+
+    Returns:
+        numpy.ndarray: uint8 bit array, identical to decode_line_code(signal)
+    """
+    return parallel_decode_state(signal, workers=workers, segments=segments)[0]
+
+
+def parallel_decode_state(
+    signal, context=None, accepted_before=None, final=True, workers=None, segments=None
+):
+    """
+    Like parallel_decode, with the state and look-ahead of _decode_hdb3 (for the streaming decoder).
+
+    context holds the 4 samples before the signal and accepted_before the B
+    flags of the last 3 of them; with final=False the last 3 samples are
+    left undecided.
+
+    Returns:
+        tuple: (uint8 bits of the decided samples, B flags of the last 3 decided samples)
+    """
+    executor = get_executor(workers)
+    if context is None:
+        context = np.zeros(4, dtype=np.float32)
+    if accepted_before is None:
+        accepted_before = np.zeros(3, dtype=bool)
+    # The context goes in front, so every segment finds its 4 samples of context in the array
+    n = len(signal) + 4
+    end = n if final else max(n - 3, 4)
+    shared_signal = _SharedArray((n,), np.float32)
+    shared_bits = _SharedArray((n,), np.uint8)
+    try:
+        shared_signal.array[:4] = context
+        shared_signal.array[4:] = signal
+        bounds = [4 + bound for bound in _segment_bounds(end - 4, segments or _executor_workers)]
+        segments = list(zip(bounds[:-1], bounds[1:]))
+        summaries = executor.map(
+            _decode_segment,
+            *zip(*[(shared_signal.spec, shared_bits.spec, start, stop) for start, stop in segments]),
+        )
+
+        values, bits = shared_signal.array, shared_bits.array
+        accepted_before = np.asarray(accepted_before, dtype=bool)
+        for (start, stop), (last_balancing, chains) in zip(segments, summaries):
+            accepted_after = last_balancing.copy()
+            for column in np.flatnonzero(accepted_before):
+                chain = chains[column]
+                after_chain = start + column + 3 * chain
+                if after_chain < stop:
+                    # Closed by a V only if the re-paired chain ends on an accepted B
+                    if values[after_chain] != 0 and not _is_000v(values, after_chain):
+                        bits[after_chain] = chain % 2
+                else:
+                    last = after_chain - 3
+                    accepted_after[last - (stop - 3)] ^= True
+            accepted_before = accepted_after
+        return bits[4:end].copy(), accepted_before
+    finally:
+        shared_signal.release()
+        shared_bits.release()
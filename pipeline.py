@@ -0,0 +1,476 @@
+import contextlib
+import itertools
+import mmap
+import os
+
+import numpy as np
+
+import metrics
+from arq import recv_segments, send_segments
+from encoding_module import (
+    FORMAT_PACKED2,
+    LINE_CODE_HDB3,
+    HDB3ViolationDetector,
+    bits_to_bytes,
+    bytes_to_bits,
+    decrypt_bytes,
+    decrypt_into,
+    encrypt_array,
+    encrypt_bytes,
+    pack_signal,
+    signal_line_code,
+    unpack_signal,
+)
+from fec import FecDecoder, FecEncoder
+from framing import recv_frames, send_frames
+from line_codes import get_line_code
+
+# Input bytes processed per chunk (each byte becomes 8 symbols on the line)
+CHUNK_SIZE = 256 * 1024
+
+# Step by which a memory-mapped destination file grows while a message arrives
+FILE_GROWTH = 64 * 1024 * 1024
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    """
+    Split the message into fixed-size chunks without loading it all at once.
+
+    Args:
+        source: A bytes-like object or a binary file object with read()
+        chunk_size (int): Chunk size in bytes
+
+    Yields:
+        bytes-like: Consecutive chunks of the message
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        view = memoryview(source).cast("B")
+        for start in range(0, len(view), chunk_size):
+            yield view[start : start + chunk_size]
+
+
+def encrypt_chunks(chunks, shift=3):
+    """
+    Apply the Caesar cipher to each chunk (shift=None skips encryption).
+
+    Views (e.g. of a memory-mapped file) are encrypted straight into a new
+    uint8 array, without first copying them into bytes.
+    """
+    for chunk in chunks:
+        if shift is None:
+            yield chunk
+            continue
+        with metrics.stage("encrypt") as timer:
+            if isinstance(chunk, (bytes, bytearray)):
+                encrypted = encrypt_bytes(chunk, shift)
+            else:
+                encrypted = encrypt_array(chunk, shift)
+            timer.add(n_bytes=len(encrypted))
+        yield encrypted
+
+
+def fec_chunks(chunks):
+    """Add the FEC layer (Hamming-coded blocks with sync words, see fec.py) to a stream of bytes."""
+    encoder = FecEncoder()
+    for chunk in chunks:
+        with metrics.stage("fec_encode") as timer:
+            blocks = encoder.feed(chunk)
+            timer.add(n_bytes=len(chunk))
+        if blocks:
+            yield blocks
+    blocks = encoder.flush()
+    if blocks:
+        yield blocks
+
+
+def bit_chunks(chunks):
+    """Turn each chunk of bytes into an array of bits (MSB first)."""
+    for chunk in chunks:
+        with metrics.stage("bits") as timer:
+            bits = bytes_to_bits(chunk)
+            timer.add(n_bytes=len(chunk))
+        yield bits
+
+
+def encode_chunks(bit_arrays, line_code="hdb3", workers=1, engine="vector"):
+    """
+    Apply the line code to consecutive bit arrays, carrying the encoder state across chunks.
+
+    The concatenation of the yielded signals equals the line code's encode()
+    (encode_line_code for HDB3) applied to the whole message. With
+    workers != 1, HDB3 chunks are encoded on several processes; engine picks
+    the HDB3 engine (encoding_module.LINE_CODE_ENGINES).
+    """
+    encoder = get_line_code(line_code).encoder(workers=workers, engine=engine)
+    for bits in bit_arrays:
+        with metrics.stage("line_code_encode") as timer:
+            signal = encoder.feed(bits)
+            timer.add(symbols=len(signal))
+        if len(signal):
+            yield signal
+    signal = encoder.flush()
+    if len(signal):
+        yield signal
+
+
+def pack_chunks(signals, signal_format=FORMAT_PACKED2, line_code="hdb3"):
+    """
+    Pack each signal chunk in the wire format (one self-describing payload per chunk).
+
+    Every payload header announces the line code, so the receiver picks the
+    decoder from the first one (see decoded_chunks).
+    """
+    line_code = get_line_code(line_code)
+    signal_format = line_code.wire_format(signal_format)
+    for signal in signals:
+        with metrics.stage("pack") as timer:
+            payload = pack_signal(signal, signal_format, line_code.code)
+            timer.add(n_bytes=len(payload), symbols=len(signal))
+        yield payload
+
+
+def encode_stream(
+    source,
+    shift=3,
+    signal_format=FORMAT_PACKED2,
+    chunk_size=CHUNK_SIZE,
+    fec=False,
+    line_code="hdb3",
+    workers=1,
+    engine="vector",
+):
+    """
+    Build the transmitter pipeline read -> encrypt -> [FEC] -> bits -> line code -> pack.
+
+    Only one chunk is in flight at a time, so memory stays bounded whatever
+    the message size.
+
+    Args:
+        source: A bytes-like object or a binary file object
+        shift (int): Caesar cipher shift (None skips encryption)
+        signal_format (int): Wire format of the symbols
+        chunk_size (int): Input bytes per chunk
+        fec (bool): Add the FEC layer (the receiver must decode it too)
+        line_code (str): Name of the line code (see line_codes.LINE_CODES)
+        workers (int): Processes for the HDB3 encoder (None uses every core; chunks
+            of PARALLEL_MIN_SYMBOLS or more are split among them)
+        engine (str): HDB3 engine ("vector" or "table", same output)
+
+    Returns:
+        generator: Payloads ready to be framed and sent
+    """
+    chunks = encrypt_chunks(read_chunks(source, chunk_size), shift)
+    if fec:
+        chunks = fec_chunks(chunks)
+    signals = encode_chunks(bit_chunks(chunks), line_code, workers, engine)
+    return pack_chunks(signals, signal_format, line_code)
+
+
+def send_stream(
+    sock,
+    source,
+    shift=3,
+    signal_format=FORMAT_PACKED2,
+    chunk_size=CHUNK_SIZE,
+    fec=False,
+    arq_report=None,
+    line_code="hdb3",
+    workers=1,
+    engine="vector",
+):
+    """
+    Encode and send a message chunk by chunk; transmission starts with the first chunk.
+
+    Args:
+        sock (socket.socket): Connected socket
+        source: A bytes-like object or a binary file object
+        shift (int): Caesar cipher shift (None skips encryption)
+        signal_format (int): Wire format of the symbols
+        chunk_size (int): Input bytes per chunk
+        fec (bool): Add the FEC layer
+        arq_report (arq.ArqReport): Send with selective-repeat ARQ, returning only once
+            the receiver has acknowledged every chunk, and record the retransmissions
+            here (None: plain frames, the receiver must not use ARQ either)
+        line_code (str): Name of the line code (the receiver detects it)
+        workers (int): Processes for the HDB3 encoder (see encode_stream)
+        engine (str): HDB3 engine (see encode_stream)
+
+    Returns:
+        int: Number of payload bytes sent
+    """
+    payloads = encode_stream(
+        source, shift, signal_format, chunk_size, fec, line_code, workers, engine
+    )
+    payloads = metrics.counted(payloads, sock)
+    if arq_report is not None:
+        return send_segments(sock, payloads, arq_report)
+    return send_frames(sock, payloads)
+
+
+@contextlib.contextmanager
+def mapped_file(path):
+    """
+    Memory-map a file for reading, as a source for encode_stream/send_stream.
+
+    The pipeline then works on views of the mapping: pages are read by the
+    OS as each chunk is touched and can be dropped afterwards, so files
+    larger than RAM can be sent.
+
+    Args:
+        path (str): File to map
+
+    Yields:
+        mmap.mmap: Read-only mapping (b"" for an empty file, which cannot be mapped)
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapping.madvise(mmap.MADV_SEQUENTIAL)
+            yield mapping
+
+
+def send_file(
+    sock,
+    path,
+    shift=3,
+    signal_format=FORMAT_PACKED2,
+    chunk_size=CHUNK_SIZE,
+    fec=False,
+    arq_report=None,
+    line_code="hdb3",
+    workers=1,
+    engine="vector",
+):
+    """Encode and send a memory-mapped file (see send_stream); returns the payload bytes sent."""
+    with mapped_file(path) as data:
+        return send_stream(
+            sock,
+            data,
+            shift,
+            signal_format,
+            chunk_size,
+            fec,
+            arq_report,
+            line_code,
+            workers,
+            engine,
+        )
+
+
+def unpack_chunks(payloads):
+    """Turn each received payload back into a float32 signal chunk."""
+    for payload in payloads:
+        with metrics.stage("unpack") as timer:
+            signal = unpack_signal(payload)
+            timer.add(n_bytes=len(payload), symbols=len(signal))
+        yield signal
+
+
+def decode_chunks(signals, line_code="hdb3", workers=1, engine="vector"):
+    """
+    Decode line code signal chunks as they arrive.
+
+    The concatenation of the yielded bit arrays equals the line code's
+    decode() (decode_line_code for HDB3) applied to the whole signal.
+    """
+    decoder = get_line_code(line_code).decoder(workers=workers, engine=engine)
+    for signal in signals:
+        with metrics.stage("line_code_decode") as timer:
+            bits = decoder.feed(signal)
+            timer.add(symbols=len(signal))
+        if len(bits):
+            yield bits
+    bits = decoder.flush()
+    if len(bits):
+        yield bits
+
+
+def byte_chunks(bit_arrays):
+    """Pack bit arrays into bytes, holding back the bits of an incomplete byte."""
+    leftover = np.zeros(0, dtype=np.uint8)
+    for bits in bit_arrays:
+        bits = np.concatenate([leftover, bits])
+        complete = len(bits) - len(bits) % 8
+        leftover = bits[complete:]
+        if complete:
+            with metrics.stage("bytes") as timer:
+                chunk = bits_to_bytes(bits[:complete])
+                timer.add(n_bytes=len(chunk))
+            yield chunk
+    if len(leftover):
+        yield bits_to_bytes(leftover)
+
+
+def fec_decode_chunks(signals, report=None, line_code="hdb3", workers=1, engine="vector"):
+    """
+    Decode line code signal chunks that carry the FEC layer, yielding message bytes.
+
+    HDB3 samples also go through the bipolar violation detector; its
+    flags travel with the decoded bits so the FEC decoder can report the
+    blocks where the line code was broken.
+
+    Args:
+        signals (iterable): Signal chunks
+        report (fec.FecReport): Filled with what the FEC decoder found
+        line_code (str | int): Line code name or header number
+        workers (int): Processes for the HDB3 decoder
+        engine (str): HDB3 engine ("vector" or "table")
+    """
+    line_code = get_line_code(line_code)
+    detector = HDB3ViolationDetector() if line_code.code == LINE_CODE_HDB3 else None
+    decoder = line_code.decoder(workers=workers, engine=engine)
+    blocks = FecDecoder(report)
+    flags = np.zeros(0, dtype=bool)  # Detector output not yet matched by decoded bits
+    for signal in _with_end(signals):  # None marks the end of the message
+        if signal is None:
+            bits = decoder.flush()
+        else:
+            if detector is not None:
+                flags = np.concatenate([flags, detector.feed(signal)])
+            with metrics.stage("line_code_decode") as timer:
+                bits = decoder.feed(signal)
+                timer.add(symbols=len(signal))
+        with metrics.stage("fec_decode") as timer:
+            data = blocks.feed(bits, flags[: len(bits)] if detector is not None else None)
+            flags = flags[len(bits) :]
+            if signal is None:
+                data += blocks.flush()
+            timer.add(n_bytes=len(data))
+        if data:
+            yield data
+
+
+def _with_end(items):
+    yield from items
+    yield None
+
+
+def decrypt_chunks(chunks, shift=3):
+    """Undo the Caesar cipher on each chunk (shift=None skips decryption)."""
+    for chunk in chunks:
+        if shift is None:
+            yield chunk
+            continue
+        with metrics.stage("decrypt") as timer:
+            decrypted = decrypt_bytes(chunk, shift)
+            timer.add(n_bytes=len(chunk))
+        yield decrypted
+
+
+def decoded_chunks(payloads, fec_report=None, workers=1, engine="vector"):
+    """
+    Turn received payloads into the (still encrypted) bytes of the message.
+
+    The decoder is the line code announced by the first payload's header
+    (HDB3 for senders that predate the announcement), on workers processes
+    for large HDB3 chunks and with the given HDB3 engine.
+    """
+    payloads = iter(payloads)
+    first = next(payloads, None)
+    if first is None:
+        return
+    line_code = signal_line_code(first)
+    signals = unpack_chunks(itertools.chain([first], payloads))
+    if fec_report is not None:
+        yield from fec_decode_chunks(signals, fec_report, line_code, workers, engine)
+    else:
+        yield from byte_chunks(decode_chunks(signals, line_code, workers, engine))
+
+
+def received_payloads(sock, arq_report=None):
+    """Payloads of one message from the socket: plain frames, or ARQ chunks when arq_report is given."""
+    if arq_report is not None:
+        return metrics.counted(recv_segments(sock, arq_report), sock)
+    return metrics.counted(recv_frames(sock), sock)
+
+
+def receive_stream(sock, shift=3, fec_report=None, arq_report=None, workers=1, engine="vector"):
+    """
+    Build the receiver pipeline frames -> unpack -> line code decode -> [FEC] -> bytes -> decrypt.
+
+    Decoded bytes are yielded while the rest of the message is still arriving.
+
+    Args:
+        sock (socket.socket): Connected socket
+        shift (int): Caesar cipher shift (None skips decryption)
+        fec_report (fec.FecReport): Decode the FEC layer and record what it found
+            here (None: the message was sent without FEC)
+        arq_report (arq.ArqReport): Receive with selective-repeat ARQ, acknowledging
+            each chunk, and record the corrupt and duplicate chunks here (None: plain frames)
+        workers (int): Processes for the HDB3 decoder (None uses every core)
+        engine (str): HDB3 engine ("vector" or "table", same output)
+
+    Returns:
+        generator: Decrypted chunks of the message
+    """
+    payloads = received_payloads(sock, arq_report)
+    return decrypt_chunks(decoded_chunks(payloads, fec_report, workers, engine), shift)
+
+
+def receive_to_file(
+    sock,
+    path,
+    shift=3,
+    fec_report=None,
+    arq_report=None,
+    workers=1,
+    engine="vector",
+    append=False,
+):
+    """
+    Receive one message and write it straight into a memory-mapped file.
+
+    Decoded bytes are packed into the mapping and decrypted there in place.
+    The file grows by FILE_GROWTH at a time and is truncated to the real
+    size at the end. An existing file is replaced by the message, unless
+    append is set.
+
+    Args:
+        sock (socket.socket): Connected socket
+        path (str): Destination file (created if missing)
+        shift (int): Caesar cipher shift (None skips decryption)
+        fec_report (fec.FecReport): Decode the FEC layer (see receive_stream)
+        arq_report (arq.ArqReport): Receive with ARQ (see receive_stream)
+        workers (int): Processes for the HDB3 decoder (see receive_stream)
+        engine (str): HDB3 engine (see receive_stream)
+        append (bool): Write the message after the existing contents
+
+    Returns:
+        int: Number of bytes written
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | (0 if append else os.O_TRUNC), 0o644)
+    mapping = None
+    start = size = capacity = os.fstat(fd).st_size
+    try:
+        payloads = received_payloads(sock, arq_report)
+        for chunk in decoded_chunks(payloads, fec_report, workers, engine):
+            end = size + len(chunk)
+            if end > capacity:
+                if mapping is not None:
+                    mapping.close()
+                capacity = max(end, capacity + FILE_GROWTH)
+                os.ftruncate(fd, capacity)
+                mapping = mmap.mmap(fd, capacity)
+            mapping[size:end] = chunk
+            if shift is not None:
+                with metrics.stage("decrypt") as timer:
+                    decrypt_into(memoryview(mapping)[size:end], shift)
+                    timer.add(n_bytes=len(chunk))
+            size = end
+        if mapping is not None:
+            mapping.flush()
+    finally:
+        if mapping is not None:
+            mapping.close()
+        os.ftruncate(fd, size)
+        os.close(fd)
+    return size - start
@@ -0,0 +1,401 @@
+import argparse
+import asyncio
+import queue
+import threading
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+import metrics
+from arq import (
+    SEGMENT_HEADER,
+    SEGMENT_MAGIC,
+    ArqReport,
+    ReceiveWindow,
+    parse_segment_header,
+    segment_buffers,
+)
+from encoding_module import (
+    LINE_CODE_HDB3,
+    HDB3ViolationDetector,
+    bits_to_bytes,
+    bytes_to_text,
+    decrypt_bytes,
+    signal_line_code,
+    unpack_signal,
+)
+from fec import FecDecoder
+from framing import (
+    FLAG_MORE,
+    FRAME_HEADER,
+    FRAME_MAGIC,
+    FrameError,
+    parse_frame_header,
+    verify_payload,
+)
+from line_codes import get_line_code
+
+# Payloads smaller than this are decoded on the event loop; larger ones go to a worker thread
+INLINE_DECODE_BYTES = 64 * 1024
+
+# Finished messages waiting for the UI; when it falls behind, the oldest are dropped
+MESSAGE_QUEUE_SIZE = 256
+
+# Symbols kept from the start of each message's signal for the viewer (the whole signal only on request)
+PREVIEW_SYMBOLS = 4096
+
+# One decoded message (or the error that interrupted it) from one transmitter. symbols is the length
+# of the signal and preview its first PREVIEW_SYMBOLS samples; signal and bits are None unless the
+# server keeps them (keep_signals). reports holds the message's fec.FecReport (when the server
+# decodes FEC) and arq.ArqReport (when the sender used ARQ)
+ReceivedMessage = namedtuple(
+    "ReceivedMessage",
+    ["peer", "symbols", "preview", "signal", "bits", "encrypted", "message", "error", "reports"],
+)
+
+
+async def read_payloads(reader, writer, arq_report):
+    """
+    Yield the payloads of one message, whatever transport the sender uses.
+
+    The first bytes tell them apart: ARQ segments (SEGMENT_MAGIC) are
+    acknowledged as they arrive (see read_segments); anything else goes
+    through read_frames, which also handles unframed legacy senders.
+
+    Args:
+        reader (asyncio.StreamReader): Stream of one connection
+        writer (asyncio.StreamWriter): The same connection, for the acknowledgements
+        arq_report (arq.ArqReport): Filled if the message arrives as ARQ segments
+
+    Yields:
+        bytes: Payloads, in order
+    """
+    try:
+        magic = await reader.readexactly(len(SEGMENT_MAGIC))
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            yield e.partial  # Short unframed message
+        return
+    if magic == SEGMENT_MAGIC:
+        async for payload in read_segments(reader, writer, arq_report, magic):
+            yield payload
+    else:
+        async for payload in read_frames(reader, magic):
+            yield payload
+
+
+async def read_segments(reader, writer, report=None, prefix=b""):
+    """
+    Yield the chunks of one ARQ message in order, acknowledging them (asyncio arq.recv_segments).
+
+    Args:
+        reader (asyncio.StreamReader): Stream of one connection
+        writer (asyncio.StreamWriter): The same connection, for the acknowledgements
+        report (arq.ArqReport): Filled with the corrupt and duplicate chunks seen
+        prefix (bytes): Start of the first header, already read
+
+    Yields:
+        bytes: Chunk payloads, in order
+
+    Raises:
+        FrameError: If the connection closes mid-message or the sender breaks the protocol
+    """
+    receiver = ReceiveWindow(report)
+    while not receiver.done:
+        try:
+            header = prefix + await reader.readexactly(SEGMENT_HEADER.size - len(prefix))
+            prefix = b""
+            kind, flags, seq, length, checksum = parse_segment_header(header)
+            payload = await reader.readexactly(length)
+        except asyncio.IncompleteReadError as e:
+            if not receiver.started() and not prefix and not e.partial:
+                return  # The sender closed between messages
+            raise FrameError(
+                f"Conexão encerrada após {receiver.expected} trechos da mensagem"
+            ) from e
+        replies, ready = receiver.handle(kind, flags, seq, payload, zlib.crc32(payload) == checksum)
+        for reply in replies:
+            writer.writelines(segment_buffers(*reply))
+        await writer.drain()  # Acknowledged before decoding, so the sender's timers do not wait
+        for payload in ready:
+            yield payload
+
+
+async def read_frames(reader, prefix=b""):
+    """
+    Yield the payloads of one message from an asyncio stream.
+
+    Mirrors framing.recv_frames: unframed (legacy) senders are read until
+    EOF, framed messages end at the first frame without FLAG_MORE.
+
+    Args:
+        reader (asyncio.StreamReader): Stream of one connection
+        prefix (bytes): Start of the first header, already read
+
+    Yields:
+        bytes: Frame payloads, in order
+
+    Raises:
+        FrameError: If the connection closes after a frame with FLAG_MORE
+    """
+    more = False
+    while True:
+        try:
+            header = prefix + await reader.readexactly(FRAME_HEADER.size - len(prefix))
+        except asyncio.IncompleteReadError as e:
+            partial = prefix + e.partial
+            if more or partial[: len(FRAME_MAGIC)] == FRAME_MAGIC[: len(partial)]:
+                if partial:
+                    raise FrameError("Cabeçalho incompleto") from e
+                if more:
+                    raise FrameError("Conexão encerrada no meio da mensagem (faltam quadros)") from e
+                return
+            yield partial  # Short unframed message
+            return
+        prefix = b""
+
+        if header[: len(FRAME_MAGIC)] != FRAME_MAGIC:
+            if more:
+                raise FrameError("Cabeçalho de quadro inválido")
+            yield header + await reader.read()  # Unframed sender: the rest of the stream
+            return
+
+        flags, length, checksum = parse_frame_header(header)
+        try:
+            payload = await reader.readexactly(length)
+        except asyncio.IncompleteReadError as e:
+            raise FrameError(
+                f"Conexão encerrada após {len(e.partial)} de {length} bytes"
+            ) from e
+        verify_payload(payload, checksum)
+        yield payload
+        more = bool(flags & FLAG_MORE)
+        if not more:
+            return
+
+
+class ReceiverServer:
+    """
+    Asyncio receiver that accepts many transmitters at once.
+
+    Each connection is decoded independently with the streaming decoder of
+    the line code its first payload announces, and every finished message is put on ``messages``, a
+    thread-safe queue the UI can poll. The queue is bounded: when it is
+    full the oldest message is dropped (and counted in ``dropped``), so a
+    UI that stops polling never stalls the transmitters or exhausts memory.
+    The event loop runs in a background thread, so the server can be
+    started from Streamlit or from a plain script.
+
+    Args:
+        host (str): Address to bind
+        port (int): Port to listen on
+        shift (int): Caesar cipher shift used to decrypt (None skips decryption)
+        queue_size (int): Messages kept until drained
+        keep_signals (bool): Keep each message's whole signal and bits, not only a preview
+        fec (bool): Decode the FEC layer (the transmitters must use it too). ARQ needs no
+            setting: a message sent as ARQ segments is recognized and acknowledged
+    """
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=65432,
+        shift=3,
+        queue_size=MESSAGE_QUEUE_SIZE,
+        keep_signals=False,
+        fec=False,
+    ):
+        self.host = host
+        self.port = port
+        self.shift = shift
+        self.keep_signals = keep_signals
+        self.fec = fec  # Read at each message's first chunk, so the UI may change it while running
+        self.messages = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writers = set()
+        self._started = threading.Event()
+        self._startup_error = None
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self._writers.add(writer)
+        try:
+            # Transmitters keep the connection open and may send many messages on it
+            while await self._receive_message(peer, reader, writer):
+                pass
+        except (FrameError, ValueError, ConnectionError) as e:
+            self._publish(ReceivedMessage(peer, 0, None, None, None, None, None, e, ()))
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _receive_message(self, peer, reader, writer):
+        """Decode one message from the connection; returns False on a clean EOF."""
+        fec = False
+        arq_report = ArqReport()
+        decoder = detector = None
+        signal_chunks = [np.zeros(0, dtype=np.float32)]
+        kept_symbols = 0  # Without keep_signals, only the samples of the preview are kept
+        bit_chunks = []
+        flag_chunks = []  # Bipolar violations of each HDB3 chunk, for the FEC report
+        frame_count = 0
+        with metrics.connection(peer) as timer:
+            async for payload in read_payloads(reader, writer, arq_report):
+                timer.add(n_bytes=len(payload))
+                if decoder is None:
+                    fec = self.fec
+                    line_code = get_line_code(signal_line_code(payload))
+                    decoder = line_code.decoder()
+                    if fec and line_code.code == LINE_CODE_HDB3:
+                        detector = HDB3ViolationDetector()
+                if len(payload) < INLINE_DECODE_BYTES:
+                    signal, bits = self._decode_chunk(decoder, payload)
+                else:
+                    # Large chunks are decoded in a worker thread so other connections keep being served
+                    signal, bits = await asyncio.to_thread(self._decode_chunk, decoder, payload)
+                if detector is not None:
+                    flag_chunks.append(detector.feed(signal))
+                if self.keep_signals or kept_symbols < PREVIEW_SYMBOLS:
+                    signal_chunks.append(signal)
+                kept_symbols += len(signal)
+                bit_chunks.append(bits)
+                frame_count += 1
+        if frame_count == 0:
+            return False
+
+        bit_chunks.append(decoder.flush())
+        bits = np.concatenate(bit_chunks)
+        reports = (arq_report,) if arq_report.chunks else ()
+        if fec:
+            blocks = FecDecoder()
+            with metrics.stage("fec_decode") as timer:
+                suspect = np.concatenate(flag_chunks) if detector is not None else None
+                encrypted = blocks.feed(bits, suspect) + blocks.flush()
+                timer.add(n_bytes=len(encrypted))
+            reports = (blocks.report,) + reports
+        else:
+            with metrics.stage("bytes") as timer:
+                encrypted = bits_to_bytes(bits)
+                timer.add(n_bytes=len(encrypted))
+        message = encrypted
+        if self.shift is not None:
+            with metrics.stage("decrypt") as timer:
+                message = decrypt_bytes(encrypted, self.shift)
+                timer.add(n_bytes=len(encrypted))
+        signal = np.concatenate(signal_chunks)
+        preview = signal[:PREVIEW_SYMBOLS].copy()
+        if not self.keep_signals:
+            signal = bits = None
+        self._publish(
+            ReceivedMessage(
+                peer, kept_symbols, preview, signal, bits, encrypted, message, None, reports
+            )
+        )
+        return True
+
+    def _publish(self, received):
+        """Queue a finished message, dropping the oldest one if the UI has fallen behind."""
+        while True:
+            try:
+                self.messages.put_nowait(received)
+                return
+            except queue.Full:
+                try:
+                    self.messages.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    @staticmethod
+    def _decode_chunk(decoder, payload):
+        with metrics.stage("unpack") as timer:
+            signal = unpack_signal(payload)
+            timer.add(n_bytes=len(payload), symbols=len(signal))
+        with metrics.stage("line_code_decode") as timer:
+            bits = decoder.feed(signal)
+            timer.add(symbols=len(signal))
+        return signal, bits
+
+    async def _serve(self):
+        try:
+            self._server = await asyncio.start_server(
+                self._handle, self.host, self.port, reuse_address=True
+            )
+        except OSError as e:
+            self._startup_error = e
+            return
+        finally:
+            self._started.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """Start listening in a background thread; raises OSError if the port cannot be bound."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, name=f"receiver-{self.port}", daemon=True
+        )
+        self._thread.start()
+        self._started.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def _shutdown(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+
+    def stop(self):
+        """Stop accepting connections, close the open ones and shut the event loop down."""
+        if self._server is not None:
+            self._loop.call_soon_threadsafe(self._shutdown)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def drain(self):
+        """Return every message received since the last call, without blocking."""
+        received = []
+        while True:
+            try:
+                received.append(self.messages.get_nowait())
+            except queue.Empty:
+                return received
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor receptor (vários transmissores)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=65432)
+    parser.add_argument("--shift", type=int, default=3)
+    parser.add_argument("--fec", action="store_true", help="Decodifica a camada de correção de erros")
+    args = parser.parse_args()
+
+    server = ReceiverServer(args.host, args.port, args.shift, fec=args.fec).start()
+    print(f"Servidor escutando em {args.host}:{args.port}...")
+    try:
+        while True:
+            received = server.messages.get()
+            if received.error is not None:
+                print(f"[{received.peer}] Erro: {received.error}")
+            else:
+                text = bytes_to_text(received.message)
+                print(f"[{received.peer}] {received.symbols} símbolos: {text}")
+    except KeyboardInterrupt:
+        server.stop()
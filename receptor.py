@@ -3,8 +3,30 @@ import socket
 import numpy as np
 import subprocess
 import platform
-from encoding_module import decode_line_code, decrypt_message
-from visualization import plot_signal_waveform, plot_binary_signal
+import metrics
+from arq import ArqReport
+from encoding_module import (
+    LINE_CODE_HDB3,
+    HDB3ViolationDetector,
+    bits_to_bytes,
+    bits_to_string,
+    bytes_to_text,
+    decrypt_bytes,
+    signal_line_code,
+    unpack_signal,
+)
+from fec import FecDecoder, FecReport
+from line_codes import get_line_code
+from pipeline import received_payloads, receive_to_file
+from receiver_server import MESSAGE_QUEUE_SIZE, ReceiverServer
+from visualization import (
+    content_key,
+    render_binary_signal,
+    render_signal_waveform,
+    show_arq_report,
+    show_metrics_sidebar,
+)
+from waveform_viewer import show_waveform_viewer
 
 
 def get_local_ip():
@@ -20,6 +42,12 @@ def get_local_ip():
         return "127.0.0.1"
 
 
+@st.cache_resource
+def get_receiver_server(bind_ip, port):
+    """Start (once per address) the background server that accepts many transmitters"""
+    return ReceiverServer(bind_ip, port).start()
+
+
 def get_all_network_interfaces():
     """Get all available network interfaces and their IPs"""
     interfaces = []
@@ -55,15 +83,39 @@ if "received_message" not in st.session_state:
     st.session_state.received_message = False
 if "reset_requested" not in st.session_state:
     st.session_state.reset_requested = False
+if "server_history" not in st.session_state:
+    st.session_state.server_history = []
+if "last_signal" not in st.session_state:
+    st.session_state.last_signal = None
+
+
+def show_fec_report(report):
+    """Summary of what the FEC layer corrected or could not recover"""
+    st.subheader("🛡️ Correção de Erros (FEC)")
+    st.write(
+        f"{report.blocks} blocos, **{report.corrected_bits} bits corrigidos**, "
+        f"{report.resyncs} ressincronizações"
+    )
+    if report.ok:
+        st.success("Todos os blocos foram recuperados.")
+    else:
+        st.error(
+            f"❌ Blocos danificados (reenviar): {report.damaged} — "
+            f"{report.lost_bits} bits descartados"
+        )
+    if report.suspect:
+        st.caption(f"Violações do código de linha nos blocos {report.suspect}")
 
 
 def request_reset():
     st.session_state.reset_requested = True
     st.session_state.listening = False
     st.session_state.received_message = False
+    st.session_state.last_signal = None
 
 
 st.title("Host B - Receptor")
+show_metrics_sidebar()
 
 # Get network information
 local_ip = get_local_ip()
@@ -158,6 +210,96 @@ with st.expander("⚙️ Configurações Avançadas de Rede"):
             help="Tempo limite para aceitar conexões",
         )
 
+# Must match the transmitter setting
+use_fec = st.toggle(
+    "🛡️ FEC (Hamming + palavras de sincronização)",
+    disabled=st.session_state.listening,
+    help="Ligue se o transmissor enviar com FEC",
+)
+
+# Continuous mode: a background server receives from many transmitters at once
+continuous_mode = st.toggle(
+    "🛰️ Servidor contínuo (vários transmissores simultâneos)",
+    disabled=st.session_state.listening,
+    help="Mantém um servidor em segundo plano; as mensagens recebidas entram em uma fila",
+)
+if continuous_mode:
+    try:
+        server = get_receiver_server(selected_bind_ip, st.session_state.port)
+    except OSError as e:
+        st.error(f"❌ Erro ao iniciar o servidor: {e}")
+        st.stop()
+    server.fec = use_fec  # The server is shared across reruns; applies from the next message on
+
+    st.info(
+        f"🛰️ Servidor contínuo escutando em `{selected_bind_ip}:{st.session_state.port}`"
+    )
+    st.caption("Mensagens enviadas com ARQ são reconhecidas e confirmadas automaticamente.")
+    st.session_state.server_history.extend(server.drain())
+    del st.session_state.server_history[:-MESSAGE_QUEUE_SIZE]  # The session keeps as many as the server
+    st.button("🔄 Atualizar mensagens")
+    if server.dropped:
+        st.warning(f"⚠️ {server.dropped} mensagens antigas descartadas (fila cheia)")
+
+    if not st.session_state.server_history:
+        st.write("Nenhuma mensagem recebida ainda.")
+    for received in reversed(st.session_state.server_history[-20:]):
+        peer = f"{received.peer[0]}:{received.peer[1]}"
+        if received.error is not None:
+            st.error(f"❌ `{peer}`: {received.error}")
+        else:
+            st.success(
+                f"📨 `{peer}` ({received.symbols} símbolos): "
+                f"**{bytes_to_text(received.message)}**"
+            )
+
+    # Zoomable view of the most recent message
+    latest = next(
+        (r for r in reversed(st.session_state.server_history) if r.error is None), None
+    )
+    if latest is not None:
+        for report in latest.reports:
+            if isinstance(report, FecReport):
+                show_fec_report(report)
+            else:
+                show_arq_report(report, sender=False)
+    if latest is not None and st.toggle("🔍 Visualizador interativo (última mensagem)"):
+        # The server keeps only the start of each signal
+        shown = (
+            "" if len(latest.preview) == latest.symbols else f" (primeiros {len(latest.preview)} símbolos)"
+        )
+        show_waveform_viewer(
+            latest.preview,
+            content_key(latest.preview),
+            title=f"Forma de onda da última mensagem{shown}",
+        )
+    st.stop()
+
+use_arq = st.toggle(
+    "🔁 Confirmação e retransmissão (ARQ)",
+    disabled=st.session_state.listening,
+    help="Ligue se o transmissor enviar com ARQ",
+)
+
+# File mode: the message is decoded straight into a memory-mapped file (no plots)
+save_to_file = st.toggle(
+    "📁 Salvar em arquivo (para arquivos grandes)",
+    disabled=st.session_state.listening,
+)
+output_path = (
+    st.text_input(
+        "Arquivo de destino:",
+        value="recebido.bin",
+        disabled=st.session_state.listening,
+        help="A mensagem substitui o conteúdo do arquivo",
+    )
+    if save_to_file
+    else None
+)
+append_to_file = save_to_file and st.checkbox(
+    "Acrescentar ao final do arquivo", disabled=st.session_state.listening
+)
+
 # Control buttons
 col1, col2, col3 = st.columns(3)
 
@@ -220,10 +362,55 @@ if listen_button:
                         placeholder.success(
                             f"✅ **Conectado!** Cliente: `{addr[0]}:{addr[1]}`"
                         )
-                        data = conn.recv(65536)  # Increased buffer size
+                        if output_path:
+                            placeholder.info(f"📥 Recebendo em `{output_path}`...")
+                            fec_report = FecReport() if use_fec else None
+                            arq_report = ArqReport() if use_arq else None
+                            size = receive_to_file(
+                                conn,
+                                output_path,
+                                fec_report=fec_report,
+                                arq_report=arq_report,
+                                append=append_to_file,
+                            )
+                            st.session_state.received_message = True
+                            status.empty()
+                            placeholder.empty()
+                            st.success(
+                                f"📨 **{size:,} bytes recebidos de** `{addr[0]}:{addr[1]}` "
+                                f"e gravados em `{output_path}`"
+                            )
+                            if fec_report is not None:
+                                show_fec_report(fec_report)
+                            if arq_report is not None:
+                                show_arq_report(arq_report, sender=False)
+                            break
 
-                        if data:
-                            received_signal = np.frombuffer(data, dtype=np.float32)
+                        # Reads every frame of the message, decoding each one as it arrives
+                        # with the line code announced by the first one
+                        line_code = decoder = None
+                        signal_chunks = [np.zeros(0, dtype=np.float32)]
+                        bit_chunks = [np.zeros(0, dtype=np.uint8)]
+                        symbol_count = 0
+                        arq_report = ArqReport() if use_arq else None
+                        for payload in received_payloads(conn, arq_report):
+                            if decoder is None:
+                                line_code = get_line_code(signal_line_code(payload))
+                                decoder = line_code.decoder()
+                            with metrics.stage("unpack") as timer:
+                                signal_chunks.append(unpack_signal(payload))
+                                timer.add(len(payload), len(signal_chunks[-1]))
+                            with metrics.stage("line_code_decode") as timer:
+                                bit_chunks.append(decoder.feed(signal_chunks[-1]))
+                                timer.add(symbols=len(signal_chunks[-1]))
+                            symbol_count += len(signal_chunks[-1])
+                            placeholder.info(f"📥 Recebendo... {symbol_count} símbolos")
+                        if decoder is not None:
+                            bit_chunks.append(decoder.flush())
+                        received_signal = np.concatenate(signal_chunks)
+                        received_bits = np.concatenate(bit_chunks)
+
+                        if len(received_signal):
                             st.session_state.received_message = True
 
                             # Clear status messages
@@ -232,50 +419,69 @@ if listen_button:
 
                             # Display results
                             st.success(
-                                f"📨 **Mensagem recebida de:** `{addr[0]}:{addr[1]}`"
+                                f"📨 **Mensagem recebida de:** `{addr[0]}:{addr[1]}` "
+                                f"(código de linha {line_code.name.upper()})"
                             )
+                            if arq_report is not None:
+                                show_arq_report(arq_report, sender=False)
 
                             # T2: Show received waveform
                             st.subheader("📊 Sinal Recebido")
-                            fig = plot_signal_waveform(
-                                received_signal, title="Forma de onda do sinal recebido"
+                            signal_key = content_key(received_signal)
+                            # Kept so the interactive viewer survives reruns
+                            st.session_state.last_signal = (signal_key, received_signal)
+                            waveform_png = render_signal_waveform(
+                                signal_key,
+                                received_signal,
+                                title="Forma de onda do sinal recebido",
                             )
-                            st.pyplot(fig)
-
-                            # T8: Reverse process
-                            binary_msg = decode_line_code(received_signal)
+                            st.image(waveform_png, use_container_width=True)
 
+                            # T8: Reverse process (already decoded while receiving)
                             # Visualize binary data
                             st.subheader("🔢 Representação Binária")
-                            binary_fig = plot_binary_signal(
-                                binary_msg,
+                            binary_png = render_binary_signal(
+                                signal_key,
+                                received_bits,
                                 title="Bits recebidos",
                             )
-                            st.pyplot(binary_fig)
+                            st.image(binary_png, use_container_width=True)
 
                             st.subheader("💾 Binário Recuperado")
-                            formatted_binary = " ".join(
-                                [
-                                    binary_msg[i : i + 8]
-                                    for i in range(0, len(binary_msg), 8)
-                                ]
-                            )
+                            formatted_binary = bits_to_string(received_bits, group=8)
                             st.text(formatted_binary)
 
                             # Convert binary to text
                             try:
-                                encrypted_msg = "".join(
-                                    [
-                                        chr(int(binary_msg[i : i + 8], 2))
-                                        for i in range(0, len(binary_msg), 8)
-                                    ]
-                                )
+                                if use_fec:
+                                    # Blocks are checked and corrected; violations locate the damaged ones
+                                    fec_decoder = FecDecoder()
+                                    violations = (
+                                        HDB3ViolationDetector().feed(received_signal)
+                                        if line_code.code == LINE_CODE_HDB3
+                                        else None
+                                    )
+                                    with metrics.stage("fec_decode") as timer:
+                                        encrypted_bytes = fec_decoder.feed(
+                                            received_bits, violations
+                                        )
+                                        encrypted_bytes += fec_decoder.flush()
+                                        timer.add(n_bytes=len(encrypted_bytes))
+                                    show_fec_report(fec_decoder.report)
+                                else:
+                                    with metrics.stage("bytes") as timer:
+                                        encrypted_bytes = bits_to_bytes(received_bits)
+                                        timer.add(n_bytes=len(encrypted_bytes))
+                                # The ciphertext is not UTF-8: shown as one character per byte
+                                encrypted_msg = encrypted_bytes.decode("latin-1")
 
                                 st.subheader("🔐 Mensagem Criptografada")
                                 st.text(encrypted_msg)
 
                                 # Decrypt
-                                original_msg = decrypt_message(encrypted_msg)
+                                with metrics.stage("decrypt") as timer:
+                                    original_msg = bytes_to_text(decrypt_bytes(encrypted_bytes))
+                                    timer.add(n_bytes=len(encrypted_bytes))
 
                                 st.subheader("✅ Mensagem Decodificada")
                                 st.success(f"**{original_msg}**")
@@ -301,3 +507,11 @@ if st.session_state.received_message:
     st.info(
         "✅ **Mensagem recebida com sucesso!** Clique em 'Reiniciar' para escutar novamente."
     )
+
+# Zoomable view of the received signal
+if st.session_state.last_signal is not None:
+    st.subheader("🔍 Inspecionar Sinal Recebido")
+    signal_key, received_signal = st.session_state.last_signal
+    show_waveform_viewer(
+        received_signal, signal_key, title="Visão geral do sinal recebido"
+    )
@@ -0,0 +1,7 @@
+from benchmark import arq_transfer, make_data
+
+
+def test_lossy_link():
+    """A transfer through a link losing and corrupting 20% of the chunks arrives intact."""
+    report = arq_transfer(make_data(512 * 1024), 0.1, 0.1, chunk_size=8 * 1024)
+    assert report.retransmitted, report
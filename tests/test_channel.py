@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from channel import ROW_GUARD, Channel, run_trials, slicer
+from encoding_module import decode_line_code, encode_line_code
+
+
+def test_noiseless_channel_is_error_free():
+    clean = run_trials(Channel(attenuation_db=6, coupling=1000), trials=64, n_bits=4096)
+    assert not clean["bit_errors"], clean
+
+
+def test_slicer_ser_matches_theory():
+    noisy = run_trials(Channel(snr_db=14), trials=256, n_bits=4096)
+    assert abs(noisy["ser"] / noisy["ideal_ser"] - 1) <= 0.1, noisy
+
+
+@pytest.mark.parametrize("n_bits", [4096, 8192, 9000])
+def test_gain_control_on_sparsest_signal(n_bits):
+    """
+    Sparsest HDB3 signal (1 000V 000: a pulse on 1 symbol in 4): the gain
+    control must still find the pulse amplitude, at any length (strides in
+    and out of phase with the pattern).
+    """
+    sparsest = np.array([1, 0, 0, 0, 0, 0, 0, 0], dtype=np.uint8)
+    sent = encode_line_code(np.tile(sparsest, n_bits // 8))
+    received = Channel(attenuation_db=6, snr_db=14).apply(sent[None], np.random.default_rng(0))
+    ser = np.count_nonzero(slicer(received) != sent) / len(sent)
+    assert abs(ser / Channel(snr_db=14).ideal_ser(0.75) - 1) <= 0.25, ser
+
+
+def test_row_guard_isolates_trials(trials=500):
+    """Rows decoded in one pass, ROW_GUARD zeros apart, decode as if each were a whole signal."""
+    rng = np.random.default_rng(0)
+    levels = np.array([-1, 0, 1], dtype=np.float32)
+    for _ in range(trials):
+        count, n = int(rng.integers(1, 6)), int(rng.integers(1, 40))
+        rows = rng.choice(levels, (count, n), p=rng.dirichlet(np.ones(3)))
+        guarded = np.zeros((count, n + ROW_GUARD), dtype=np.float32)
+        guarded[:, :n] = rows
+        decoded = decode_line_code(guarded.ravel()).reshape(count, -1)[:, :n]
+        assert np.array_equal(decoded, np.stack([decode_line_code(row) for row in rows])), rows
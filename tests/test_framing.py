@@ -0,0 +1,59 @@
+import socket
+
+import pytest
+
+import framing
+from arq import SEGMENT_HEADER, SEGMENT_MAGIC, SEGMENT_VERSION, recv_segment, send_segment
+from framing import (
+    FRAME_HEADER,
+    FRAME_MAGIC,
+    FRAME_VERSION,
+    FrameError,
+    recv_frame,
+    recv_frames,
+    send_frame,
+)
+
+
+def test_frames_roundtrip():
+    a, b = socket.socketpair()
+    with a, b:
+        send_frame(a, b"primeiro", more=True)
+        send_frame(a, b"segundo")
+        a.shutdown(socket.SHUT_WR)
+        assert [bytes(p) for p in recv_frames(b)] == [b"primeiro", b"segundo"]
+
+
+def test_oversized_length_is_rejected_before_reading():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, 0, 2**63, 0))
+        with pytest.raises(FrameError):
+            recv_frame(b)
+
+
+def test_oversized_segment_is_rejected():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, 0, 0, 0, 2**32 - 1, 0))
+        with pytest.raises(FrameError):
+            recv_segment(b)
+
+
+def test_sender_refuses_oversized_payload(monkeypatch):
+    monkeypatch.setattr(framing, "MAX_FRAME_BYTES", 16)
+    a, b = socket.socketpair()
+    with a, b:
+        with pytest.raises(FrameError):
+            send_frame(a, bytes(17))
+        with pytest.raises(FrameError):
+            send_segment(a, 0, 0, bytes(17))
+
+
+def test_message_cut_after_more_flag():
+    a, b = socket.socketpair()
+    with a, b:
+        send_frame(a, b"primeiro", more=True)
+        a.shutdown(socket.SHUT_WR)
+        with pytest.raises(FrameError):
+            list(recv_frames(b))
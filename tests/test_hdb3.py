@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+import encoding_module
+from encoding_module import (
+    LINE_CODE_ENGINES,
+    StreamingHDB3Decoder,
+    StreamingHDB3Encoder,
+    as_bit_array,
+    bits_to_string,
+    decode_line_code,
+    decode_line_code_python,
+    encode_line_code,
+    encode_line_code_python,
+)
+
+LEVELS = np.array([-1, 0, 1], dtype=np.float32)
+
+
+def random_bits(rng, max_bits):
+    """Bits of random length and density (from almost all zeros to almost all ones)."""
+    return (rng.random(int(rng.integers(0, max_bits))) < rng.random()).astype(np.uint8)
+
+
+@pytest.mark.parametrize("engine", LINE_CODE_ENGINES)
+def test_encode_matches_original(engine, trials=200, max_bits=4096):
+    rng = np.random.default_rng(0)
+    for _ in range(trials):
+        bits = random_bits(rng, max_bits)
+        expected = encode_line_code_python(bits_to_string(bits))
+        assert encode_line_code(bits, engine=engine).tobytes() == expected.tobytes(), bits
+
+
+@pytest.mark.parametrize("engine", LINE_CODE_ENGINES)
+def test_decode_matches_original(engine, trials=200, max_symbols=4096):
+    """Valid HDB3 signals and random ternary ones (arbitrary violations)."""
+    rng = np.random.default_rng(0)
+    for trial in range(trials):
+        if trial % 2:
+            signal = encode_line_code(random_bits(rng, max_symbols))
+        else:
+            signal = rng.choice(LEVELS, int(rng.integers(0, max_symbols)))
+        expected = decode_line_code_python(signal)
+        assert bits_to_string(decode_line_code(signal, engine=engine)) == expected, signal
+
+
+@pytest.mark.parametrize("engine", LINE_CODE_ENGINES)
+def test_streaming_matches_whole(engine, trials=50, max_bits=4096, cuts=6):
+    rng = np.random.default_rng(0)
+    for _ in range(trials):
+        bits = random_bits(rng, max_bits)
+        signal = encode_line_code(bits)
+        cut = np.sort(rng.integers(0, len(bits) + 1, cuts))
+
+        encoder = StreamingHDB3Encoder(engine=engine)
+        parts = [encoder.feed(part) for part in np.split(bits, cut)] + [encoder.flush()]
+        assert np.concatenate(parts).tobytes() == signal.tobytes(), bits
+
+        decoder = StreamingHDB3Decoder()
+        parts = [decoder.feed(part) for part in np.split(signal, cut)] + [decoder.flush()]
+        assert np.array_equal(np.concatenate(parts), bits), signal
+
+
+def test_parallel_segments(monkeypatch, trials=30, max_bits=2048, workers=2):
+    """
+    Multiprocess engines with many short segments.
+
+    Small inputs are split into up to one segment per 4 symbols, so every
+    boundary case (B00V crossing a boundary, chains of candidates, parity
+    flips) shows up. The streaming encoder/decoder go through the same path
+    with PARALLEL_MIN_SYMBOLS lowered.
+    """
+    from parallel_hdb3 import parallel_decode, parallel_encode, shutdown
+
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr(encoding_module, "PARALLEL_MIN_SYMBOLS", 16)
+    try:
+        for _ in range(trials):
+            n_bits = int(rng.integers(16, max_bits))
+            bits = (rng.random(n_bits) < rng.random()).astype(np.uint8)
+            signal = encode_line_code(bits)
+            segments = int(rng.integers(2, n_bits // 4 + 1))
+            assert parallel_encode(bits, workers, segments).tobytes() == signal.tobytes()
+            for received in (signal, rng.choice(LEVELS, n_bits)):
+                assert np.array_equal(
+                    parallel_decode(received, workers, segments), decode_line_code(received)
+                )
+
+            cuts = np.sort(rng.integers(0, n_bits, 4))
+            encoder, decoder = StreamingHDB3Encoder(workers), StreamingHDB3Decoder(workers)
+            parts = [encoder.feed(part) for part in np.split(bits, cuts)] + [encoder.flush()]
+            assert np.concatenate(parts).tobytes() == signal.tobytes()
+            parts = [decoder.feed(part) for part in np.split(signal, cuts)] + [decoder.flush()]
+            assert np.array_equal(np.concatenate(parts), bits)
+    finally:
+        shutdown()
+
+
+def test_packed_input():
+    rng = np.random.default_rng(0)
+    bits = rng.integers(0, 2, 8 * 100, dtype=np.uint8)
+    packed = np.packbits(bits)
+    assert np.array_equal(as_bit_array(packed, packed=True), bits)
+    assert np.array_equal(encode_line_code(packed, packed=True), encode_line_code(bits))
+    assert np.array_equal(as_bit_array(packed.tobytes()), bits)
+    with pytest.raises(ValueError):
+        as_bit_array(packed)  # Unpacked bits must be 0/1
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from benchmark import make_bits
+from encoding_module import (
+    FORMAT_PACKED2,
+    LINE_CODE_ENGINES,
+    LINE_CODE_HDB3,
+    pack_signal,
+    signal_line_code,
+    unpack_signal,
+)
+from line_codes import LINE_CODES
+
+PATTERNS = ("random", "zeros", "ones", "sparse")
+
+
+def test_cli_choices_match_registry():
+    from cli import ENGINE_NAMES, LINE_CODE_NAMES
+
+    assert set(LINE_CODE_NAMES) == set(LINE_CODES)
+    assert set(ENGINE_NAMES) == set(LINE_CODE_ENGINES)
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+@pytest.mark.parametrize("name", sorted(LINE_CODES))
+def test_roundtrip(name, pattern, n_bits=20_000, cuts=20):
+    """decode(encode(bits)) == bits, and streaming equal to whole-array coding (each HDB3 engine)."""
+    line_code = LINE_CODES[name]
+    rng = np.random.default_rng(0)
+    bits = make_bits(n_bits, pattern)
+    signal = line_code.encode(bits)
+    assert set(np.unique(signal).tolist()) <= set(line_code.levels)
+    assert np.array_equal(line_code.decode(signal), bits)
+
+    engines = LINE_CODE_ENGINES if line_code.code == LINE_CODE_HDB3 else ("vector",)
+    for engine in engines:
+        encoder, decoder = line_code.encoder(engine=engine), line_code.decoder(engine=engine)
+        cut = np.sort(rng.integers(0, n_bits, cuts))
+        parts = [encoder.feed(part) for part in np.split(bits, cut)]
+        assert np.array_equal(np.concatenate(parts + [encoder.flush()]), signal), engine
+        cut = np.sort(rng.integers(0, len(signal), cuts))
+        parts = [decoder.feed(part) for part in np.split(signal, cut)]
+        assert np.array_equal(np.concatenate(parts + [decoder.flush()]), bits), engine
+
+
+@pytest.mark.parametrize("name", sorted(LINE_CODES))
+def test_packed_header(name):
+    line_code = LINE_CODES[name]
+    signal = line_code.encode(make_bits(1000))
+    payload = pack_signal(signal, line_code.wire_format(FORMAT_PACKED2), line_code.code)
+    assert signal_line_code(payload) == line_code.code
+    assert np.array_equal(unpack_signal(payload), signal)
+
+
+@pytest.mark.parametrize("n_bits", [1, 7, 8193])
+def test_2b1q_rejects_odd_length(n_bits):
+    """An odd bit count cannot be padded without decode(encode(bits)) growing by one bit."""
+    with pytest.raises(ValueError):
+        LINE_CODES["2b1q"].encode(make_bits(n_bits))
+    encoder = LINE_CODES["2b1q"].encoder()
+    encoder.feed(make_bits(n_bits))
+    with pytest.raises(ValueError):
+        encoder.flush()
+    assert len(encoder.flush()) == 0  # Ready for the next message
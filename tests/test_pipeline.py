@@ -0,0 +1,10 @@
+from encoding_module import bytes_to_text, decrypt_bytes, decrypt_message, encrypt_message, text_to_bytes
+from pipeline import decoded_chunks, encode_stream
+
+
+def test_text_survives_cipher_and_pipeline(message="Olá, 世界 🚀 ÿ\x00"):
+    """Text above U+00FF survives the cipher and the chunked pipeline (UTF-8 end to end)."""
+    assert decrypt_message(encrypt_message(message)) == message
+    payloads = encode_stream(text_to_bytes(message), shift=3, chunk_size=5)
+    received = b"".join(decrypt_bytes(chunk) for chunk in decoded_chunks(payloads))
+    assert bytes_to_text(received) == message
@@ -0,0 +1,275 @@
+import select
+import socket
+import threading
+
+import metrics
+from arq import _with_last, send_segments
+from encoding_module import FORMAT_PACKED2
+from framing import FLAG_MORE, FrameError, frame_header, sendall_buffers
+from pipeline import CHUNK_SIZE, encode_stream
+
+# Queued bytes that trigger an automatic flush, so a batch never grows without bound. A batch
+# only holds whole messages; a single message larger than this is streamed on its own
+BATCH_BYTES = 4 * 1024 * 1024
+
+
+def _rewinder(source):
+    """
+    Return a function that puts the source back at the start of the message, or None if it cannot.
+
+    Bytes-like sources are read through fresh views, so they need nothing;
+    file objects (and mappings) must be seekable.
+    """
+    if not hasattr(source, "read"):
+        return lambda: None
+    try:
+        if getattr(source, "seekable", lambda: True)():
+            start = source.tell()
+            return lambda: source.seek(start)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class Transmitter:
+    """
+    Keep-alive connection to one receiver, with batched writes.
+
+    Messages are encoded into frames and queued; flush() writes the whole
+    batch with a single scatter/gather call. The connection is opened
+    lazily, reused across messages and re-established once if it turns out
+    to be broken.
+
+    Args:
+        host (str): Receiver address
+        port (int): Receiver port
+        timeout (float): Connect/send timeout in seconds
+    """
+
+    def __init__(self, host, port, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+        self._batch = []
+        self._batch_bytes = 0
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        # Batches are already coalesced here, so Nagle would only add latency
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return sock
+
+    def _connection_alive(self):
+        """Check, without blocking, that the receiver has not closed the connection."""
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            if not readable:
+                return True
+            return self._sock.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+    def _socket(self):
+        if self._sock is not None and not self._connection_alive():
+            self.close()
+        if self._sock is None:
+            self._sock = self._connect()
+        return self._sock
+
+    def queue(
+        self,
+        source,
+        shift=3,
+        signal_format=FORMAT_PACKED2,
+        chunk_size=CHUNK_SIZE,
+        fec=False,
+        line_code="hdb3",
+        workers=1,
+        engine="vector",
+    ):
+        """
+        Encode a message and add its frames to the pending batch.
+
+        The message joins the batch only once it is completely encoded, so a
+        flush never splits a message. One that outgrows BATCH_BYTES while it
+        is encoded is not batched: the pending batch is flushed and the
+        message is streamed on its own (see _stream_message).
+
+        Args:
+            source: A bytes-like object or a binary file object
+            shift (int): Caesar cipher shift (None skips encryption)
+            signal_format (int): Wire format of the symbols
+            chunk_size (int): Input bytes per chunk
+            fec (bool): Add the FEC layer (pipeline.fec_chunks)
+            line_code (str): Name of the line code (see line_codes.LINE_CODES)
+            workers (int): Processes for the HDB3 encoder (None uses every core)
+            engine (str): HDB3 engine ("vector" or "table", same output)
+        """
+        with self._lock:
+            rewind = _rewinder(source)
+
+            def encode():
+                return _with_last(
+                    encode_stream(
+                        source, shift, signal_format, chunk_size, fec, line_code, workers, engine
+                    )
+                )
+
+            def restart():
+                rewind()
+                return encode()
+
+            payloads = encode()
+            frames, size = [], 0
+            for payload, last in payloads:
+                frames += [frame_header(payload, 0 if last else FLAG_MORE), payload]
+                size += len(payload)
+                if size >= BATCH_BYTES and not last:
+                    self.flush()
+                    self._stream_message(frames, payloads, restart if rewind else None)
+                    return
+            self._batch += frames
+            self._batch_bytes += size
+            if self._batch_bytes >= BATCH_BYTES:
+                self.flush()
+
+    def _stream_message(self, frames, payloads, restart):
+        """
+        Send one large message straight to the socket, BATCH_BYTES at a time.
+
+        If a write fails, the connection is closed (the receiver sees the
+        message cut short after a FLAG_MORE frame and drops it), reopened,
+        and the whole message is encoded and sent again once from the start
+        of the source; restart is None when the source cannot be rewound, and
+        the error is raised instead.
+
+        Args:
+            frames (list): Headers and payloads already encoded
+            payloads (iterator): The rest of the message, as (payload, last) pairs
+            restart (callable): Rewinds the source and returns the pairs from the start
+        """
+        for attempt in range(2):
+            try:
+                self._write_message(frames, payloads)
+                return
+            except OSError:
+                self.close()
+                if attempt or restart is None:
+                    raise
+                frames, payloads = [], restart()
+            except BaseException:
+                self.close()  # The connection may hold half a message
+                raise
+
+    def _write_message(self, frames, payloads):
+        with metrics.connection((self.host, self.port)) as timer:
+            sock = self._socket()
+            frames = list(frames)
+            pending = sum(memoryview(frame).nbytes for frame in frames[1::2])
+            for payload, last in payloads:
+                frames += [frame_header(payload, 0 if last else FLAG_MORE), payload]
+                pending += len(payload)
+                if pending >= BATCH_BYTES:
+                    sendall_buffers(sock, frames)
+                    timer.add(n_bytes=pending)
+                    frames, pending = [], 0
+            sendall_buffers(sock, frames)
+            timer.add(n_bytes=pending)
+
+    def flush(self):
+        """
+        Write every queued frame in one batch.
+
+        The batch holds whole messages only. If the write fails the
+        connection is reopened and the whole batch is sent again once; a
+        second failure is raised to the caller.
+        """
+        with self._lock:
+            if not self._batch:
+                return
+            with metrics.connection((self.host, self.port)) as timer:
+                try:
+                    sendall_buffers(self._socket(), self._batch)
+                except OSError:
+                    self.close()
+                    sendall_buffers(self._socket(), self._batch)
+                timer.add(n_bytes=self._batch_bytes)
+            self._batch = []
+            self._batch_bytes = 0
+
+    def send(
+        self,
+        source,
+        shift=3,
+        signal_format=FORMAT_PACKED2,
+        chunk_size=CHUNK_SIZE,
+        fec=False,
+        arq_report=None,
+        line_code="hdb3",
+        workers=1,
+        engine="vector",
+    ):
+        """
+        Queue one message and flush it right away.
+
+        With arq_report, the message is instead sent with selective-repeat
+        ARQ (after flushing anything queued) and this returns once the
+        receiver has acknowledged every chunk; the report records the
+        retransmissions.
+        """
+        with self._lock:
+            if arq_report is None:
+                self.queue(
+                    source, shift, signal_format, chunk_size, fec, line_code, workers, engine
+                )
+                self.flush()
+                return
+            self.flush()
+            sock = self._socket()
+            with metrics.connection((self.host, self.port)) as timer:
+                try:
+                    payloads = encode_stream(
+                        source,
+                        shift,
+                        signal_format,
+                        chunk_size,
+                        fec,
+                        line_code,
+                        workers,
+                        engine,
+                    )
+                    timer.add(n_bytes=send_segments(sock, payloads, arq_report))
+                except (OSError, FrameError):
+                    self.close()  # The connection may hold half a message
+                    raise
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                try:
+                    self._sock.close()
+                finally:
+                    self._sock = None
+
+
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def get_transmitter(host, port):
+    """Return the pooled Transmitter for (host, port), creating it on first use."""
+    with _pool_lock:
+        if (host, port) not in _pool:
+            _pool[(host, port)] = Transmitter(host, port)
+        return _pool[(host, port)]
+
+
+def close_all():
+    """Close every pooled connection."""
+    with _pool_lock:
+        for transmitter in _pool.values():
+            transmitter.close()
+        _pool.clear()
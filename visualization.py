@@ -1,78 +1,169 @@
+import hashlib
+import io
+
 import matplotlib.pyplot as plt
 import numpy as np
 import streamlit as st
 
+import metrics
+from encoding_module import as_bit_array
+
+
+# Above this many samples the waveform drops its per-bit tick labels (they would overlap);
+# the switch to a min/max envelope happens separately, once there are more samples than pixel columns
+WAVEFORM_TICK_MAX_SAMPLES = 1024
+
+# Above this many visible bits the binary plot shows density bands instead of per-bit annotations
+BINARY_ANNOTATION_MAX_BITS = 256
+
+# Rendered plots kept across Streamlit reruns; the least recently used are evicted first
+RENDER_CACHE_ENTRIES = 64
+
+# Refresh period (seconds) of the live per-stage timing breakdown
+METRICS_REFRESH_SECONDS = 2
+
+
+def _step_trace(signal):
+    """
+    Build the step-like (pulse) trace of a signal with NumPy.
+
+    Each sample spans one time unit; a vertical edge is inserted wherever
+    the level changes, giving the same points as drawing it sample by sample.
 
-def plot_signal_waveform(signal, title="Forma de onda do sinal", figsize=(12, 5)):
+    Args:
+        signal (numpy.ndarray): The signal samples
+
+    Returns:
+        tuple: (time, amplitude) arrays of the trace
+    """
+    n = len(signal)
+    time = np.repeat(np.arange(n + 1), 2)[1:-1]  # t_start, t_end of every sample
+    amplitude = np.repeat(signal, 2)
+
+    changes = np.flatnonzero(signal[1:] != signal[:-1]) + 1
+    time = np.insert(time, 2 * changes, changes)
+    amplitude = np.insert(amplitude, 2 * changes, signal[changes - 1])
+    return time, amplitude
+
+
+def _envelope(signal, columns):
+    """
+    Decimate a long signal into min/max pairs, one per pixel column.
+
+    Args:
+        signal (numpy.ndarray): The signal samples
+        columns (int): Number of horizontal pixels available
+
+    Returns:
+        tuple: (bin edges, minimum per bin, maximum per bin)
+    """
+    n = len(signal)
+    bin_size = -(-n // columns)
+    padded = np.pad(signal, (0, (-n) % bin_size), mode="edge").reshape(-1, bin_size)
+    edges = np.minimum(np.arange(len(padded) + 1) * bin_size, n)
+    return edges, padded.min(axis=1), padded.max(axis=1)
+
+
+def plot_signal_waveform(
+    signal,
+    title="Forma de onda do sinal",
+    figsize=(12, 5),
+    max_samples=None,
+    max_ticks=WAVEFORM_TICK_MAX_SAMPLES,
+):
     """
     Create a beautifully styled plot of a signal waveform with logical pulse appearance.
 
+    Signals with more samples than the figure has pixel columns are drawn
+    as a min/max envelope per column, so rendering time no longer grows with
+    the signal length. Per-bit tick labels are drawn up to max_ticks samples.
+
     Args:
         signal (numpy.ndarray): The signal to plot
         title (str): The title of the plot
         figsize (tuple): Figure size (width, height)
+        max_samples (int): Largest signal drawn sample by sample (None: the pixel columns)
+        max_ticks (int): Largest signal labelled bit by bit
 
     Returns:
         matplotlib.figure.Figure: The created figure
     """
+    signal = np.asarray(signal)
+
     # Create figure with modern styling
     plt.style.use("default")
     fig, ax = plt.subplots(figsize=figsize, facecolor="white")
     ax.set_facecolor("#fafafa")
 
-    # Create time axis for better pulse representation
-    time_per_bit = 1.0  # Each bit takes 1 time unit
+    columns = int(figsize[0] * fig.dpi)
+    detailed = len(signal) <= (columns if max_samples is None else max_samples)
+
+    # Each bit takes 1 time unit
+    time_per_bit = 1.0
     total_time = len(signal) * time_per_bit
-    time = np.linspace(0, total_time, len(signal))
-
-    # Create step-like signal for pulse appearance
-    extended_time = []
-    extended_signal = []
-
-    for i, amplitude in enumerate(signal):
-        t_start = i * time_per_bit
-        t_end = (i + 1) * time_per_bit
-
-        # Add vertical transitions for sharp edges
-        if i > 0 and signal[i - 1] != amplitude:
-            extended_time.append(t_start)
-            extended_signal.append(signal[i - 1])
-
-        # Add the pulse duration
-        extended_time.extend([t_start, t_end])
-        extended_signal.extend([amplitude, amplitude])
-
-    # Plot the signal with sharp, logical pulse appearance
-    ax.plot(
-        extended_time,
-        extended_signal,
-        linewidth=2.5,
-        color="#2E86AB",
-        alpha=0.9,
-        solid_capstyle="butt",
-    )
 
-    # Fill positive and negative areas with different colors
-    ax.fill_between(
-        extended_time,
-        extended_signal,
-        0,
-        where=np.array(extended_signal) > 0,
-        color="#A23B72",
-        alpha=0.2,
-        interpolate=True,
-        label="Nível Alto",
-    )
-    ax.fill_between(
-        extended_time,
-        extended_signal,
-        0,
-        where=np.array(extended_signal) < 0,
-        color="#F18F01",
-        alpha=0.2,
-        interpolate=True,
-        label="Nível Baixo",
-    )
+    if detailed:
+        # Step-like signal for pulse appearance, with sharp vertical transitions
+        extended_time, extended_signal = _step_trace(signal)
+
+        # Plot the signal with sharp, logical pulse appearance
+        ax.plot(
+            extended_time,
+            extended_signal,
+            linewidth=2.5,
+            color="#2E86AB",
+            alpha=0.9,
+            solid_capstyle="butt",
+        )
+
+        # Fill positive and negative areas with different colors
+        ax.fill_between(
+            extended_time,
+            extended_signal,
+            0,
+            where=extended_signal > 0,
+            color="#A23B72",
+            alpha=0.2,
+            interpolate=True,
+            label="Nível Alto",
+        )
+        ax.fill_between(
+            extended_time,
+            extended_signal,
+            0,
+            where=extended_signal < 0,
+            color="#F18F01",
+            alpha=0.2,
+            interpolate=True,
+            label="Nível Baixo",
+        )
+    elif len(signal):
+        # Level of detail: min/max envelope, one bin per pixel column
+        edges, lows, highs = _envelope(signal, columns)
+        lows = np.append(lows, lows[-1])
+        highs = np.append(highs, highs[-1])
+
+        ax.fill_between(
+            edges, lows, highs, step="post", color="#2E86AB", alpha=0.5, linewidth=0
+        )
+        ax.fill_between(
+            edges,
+            np.maximum(highs, 0),
+            0,
+            step="post",
+            color="#A23B72",
+            alpha=0.2,
+            label="Nível Alto",
+        )
+        ax.fill_between(
+            edges,
+            np.minimum(lows, 0),
+            0,
+            step="post",
+            color="#F18F01",
+            alpha=0.2,
+            label="Nível Baixo",
+        )
 
     # Add zero reference line
     ax.axhline(y=0, color="#666666", linestyle="-", alpha=0.6, linewidth=1)
@@ -96,13 +187,16 @@ def plot_signal_waveform(signal, title="Forma de onda do sinal", figsize=(12, 5)
     ax.grid(True, linestyle="--", alpha=0.4, color="#bdc3c7")
     ax.set_axisbelow(True)
 
-    # Add bit markers on x-axis
-    bit_positions = np.arange(0, total_time + 1, time_per_bit)
-    ax.set_xticks(bit_positions)
-    ax.set_xticklabels([f"{int(i)}" for i in bit_positions], fontsize=3)
+    # Add bit markers on x-axis (too dense to read on long signals)
+    if detailed and len(signal) <= max_ticks:
+        bit_positions = np.arange(0, total_time + 1, time_per_bit)
+        ax.set_xticks(bit_positions)
+        ax.set_xticklabels([f"{int(i)}" for i in bit_positions], fontsize=3)
 
-    # Add amplitude level indicators
+    # Add amplitude level indicators (only for signals with a few discrete levels)
     unique_levels = np.unique(signal)
+    if len(unique_levels) > 8:
+        unique_levels = []
     for level in unique_levels:
         if level != 0:
             ax.axhline(
@@ -119,7 +213,7 @@ def plot_signal_waveform(signal, title="Forma de onda do sinal", figsize=(12, 5)
             )
 
     # Add legend if we have both positive and negative values
-    if np.any(np.array(signal) > 0) and np.any(np.array(signal) < 0):
+    if np.any(signal > 0) and np.any(signal < 0):
         ax.legend(loc="upper right", frameon=True, fancybox=True, shadow=True)
 
     # Remove top and right spines for cleaner look
@@ -135,50 +229,81 @@ def plot_signal_waveform(signal, title="Forma de onda do sinal", figsize=(12, 5)
 
 
 def plot_binary_signal(
-    binary_string, title="Representação do Sinal Binário", figsize=(10, 3)
+    bits,
+    title="Representação do Sinal Binário",
+    figsize=(10, 3),
+    view=None,
+    max_annotated_bits=BINARY_ANNOTATION_MAX_BITS,
 ):
     """
     Create a plot representing a binary signal as discrete levels.
 
+    Bit values and per-bit ticks are only drawn when the bits in view fit
+    under max_annotated_bits; longer inputs are aggregated into density
+    bands (fraction of 1s per pixel column) so the number of Matplotlib
+    artists stays constant.
+
     Args:
-        binary_string (str): The binary string to visualize
+        bits (numpy.ndarray | str): Bit array (0/1) or binary string to visualize
         title (str): The title of the plot
         figsize (tuple): Figure size (width, height)
+        view (tuple): Optional (start, stop) range of bits shown in the viewport
+        max_annotated_bits (int): Largest number of visible bits drawn with annotations
 
     Returns:
         matplotlib.figure.Figure: The created figure
     """
-    bits = [int(bit) for bit in binary_string.replace(" ", "")]
+    bits = as_bit_array(bits)
+    start, stop = view if view is not None else (0, len(bits))
+    start, stop = max(0, start), min(len(bits), stop)
+    visible = bits[start:stop]
 
     # Create figure
     fig, ax = plt.subplots(figsize=figsize, facecolor="#f9f9f9")
     ax.set_facecolor("#f9f9f9")
 
-    # Create a step plot for binary data
-    x = np.arange(len(bits) + 1)
-    y = np.array(bits + [bits[-1]])  # Repeat last bit for step plot
-    ax.step(x, y, "g-", linewidth=1.5, where="post", alpha=0.8)
-
-    # Fill areas
-    ax.fill_between(x, y, step="post", alpha=0.3, color="green")
+    if len(visible) <= max_annotated_bits:
+        # Create a step plot for binary data
+        x = np.arange(start, stop + 1)
+        y = np.append(visible, visible[-1:])  # Repeat last bit for step plot
+        if len(visible):
+            ax.step(x, y, "g-", linewidth=1.5, where="post", alpha=0.8)
+
+            # Fill areas
+            ax.fill_between(x, y, step="post", alpha=0.3, color="green")
+
+        # Add bit values as text annotations
+        for i, bit in zip(range(start, stop), visible):
+            ax.text(i + 0.5, bit + 0.1, str(bit), ha="center", fontsize=5)
+
+        # Set tick positions at the bit transitions
+        ax.set_xticks(x)
+        ax.set_xticklabels([f"{int(i)}" for i in x], fontsize=3, rotation=90)
+        ax.set_ylabel("Nível lógico", fontsize=12)
+    else:
+        # Density bands: fraction of 1s in each pixel column
+        columns = int(figsize[0] * fig.dpi)
+        bin_size = -(-len(visible) // columns)
+        padded = np.zeros(len(visible) + (-len(visible)) % bin_size, dtype=np.float32)
+        padded[: len(visible)] = visible
+        counts = np.full(len(padded) // bin_size, bin_size)
+        counts[-1] -= len(padded) - len(visible)
+        density = padded.reshape(-1, bin_size).sum(axis=1) / counts
+
+        edges = np.minimum(start + np.arange(len(density) + 1) * bin_size, stop)
+        density = np.append(density, density[-1])
+        ax.step(edges, density, "g-", linewidth=1, where="post", alpha=0.8)
+        ax.fill_between(edges, density, step="post", alpha=0.3, color="green")
+        ax.set_ylabel("Densidade de 1s", fontsize=12)
 
     # Set proper y-limits with margin
     ax.set_ylim(-0.2, 1.2)
-
-    # Add bit values as text annotations
-    for i, bit in enumerate(bits):
-        ax.text(i + 0.5, bit + 0.1, str(bit), ha="center", fontsize=5)
-
-    # Set tick positions at the bit transitions
-    ax.set_xticks(range(len(bits) + 1))
-    ax.set_xticklabels(
-        [f"{int(i)}" for i in range(len(bits) + 1)], fontsize=3, rotation=90
-    )
+    if view is not None:
+        ax.set_xlim(start, max(stop, start + 1))
 
     # Set labels and title
     ax.set_title(title, fontsize=14, fontweight="bold")
     ax.set_xlabel("Tempo (bits)", fontsize=12)
-    ax.set_ylabel("Nível lógico", fontsize=12)
 
     # Add grid
     ax.grid(True, linestyle="--", alpha=0.7)
@@ -189,3 +314,202 @@ def plot_binary_signal(
     fig.tight_layout()
 
     return fig
+
+
+def content_key(*parts):
+    """
+    Hash the contents of the data behind a plot into a short cache key.
+
+    Arrays are hashed byte for byte (with their dtype and shape); any other
+    part (str, bytes, numbers) is hashed through its repr. Unlike the
+    sampled hash Streamlit applies to large arrays, equal keys mean equal
+    contents.
+
+    Args:
+        *parts: Arrays, bytes, strings or numbers identifying the data
+
+    Returns:
+        str: Hex digest of the parts
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(f"{part.dtype.str}{part.shape}".encode())
+            digest.update(np.ascontiguousarray(part).data)
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def figure_to_png(fig, dpi=150):
+    """
+    Render a figure to PNG bytes and close it.
+
+    Closing releases the figure from pyplot, which otherwise keeps every
+    figure created on each Streamlit rerun alive.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure to render
+        dpi (int): Resolution of the image
+
+    Returns:
+        bytes: The PNG image
+    """
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format="png", dpi=dpi)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+def render_signal_waveform(
+    key,
+    _signal,
+    title="Forma de onda do sinal",
+    figsize=(12, 5),
+    max_samples=None,
+    max_ticks=WAVEFORM_TICK_MAX_SAMPLES,
+):
+    """
+    PNG of plot_signal_waveform, cached on (key, plot parameters).
+
+    The signal itself is not hashed by Streamlit (leading underscore): key
+    must identify its contents, e.g. content_key(signal) or the hash of the
+    message and shift it was encoded from.
+
+    Args:
+        key (str): Content key of the signal
+        _signal (numpy.ndarray): The signal to plot
+        title (str): The title of the plot
+        figsize (tuple): Figure size (width, height)
+        max_samples (int): Largest signal drawn sample by sample (None: the pixel columns)
+        max_ticks (int): Largest signal labelled bit by bit
+
+    Returns:
+        bytes: The PNG image
+    """
+    with metrics.stage("plot") as timer:
+        png = figure_to_png(
+            plot_signal_waveform(_signal, title, figsize, max_samples, max_ticks)
+        )
+        timer.add(symbols=len(_signal))
+    return png
+
+
+@st.cache_data(max_entries=RENDER_CACHE_ENTRIES, show_spinner=False)
+def render_binary_signal(
+    key,
+    _bits,
+    title="Representação do Sinal Binário",
+    figsize=(10, 3),
+    view=None,
+    max_annotated_bits=BINARY_ANNOTATION_MAX_BITS,
+):
+    """
+    PNG of plot_binary_signal, cached on (key, plot parameters).
+
+    Args:
+        key (str): Content key of the bits (see render_signal_waveform)
+        _bits (numpy.ndarray | str): Bit array (0/1) or binary string to visualize
+        title (str): The title of the plot
+        figsize (tuple): Figure size (width, height)
+        view (tuple): Optional (start, stop) range of bits shown in the viewport
+        max_annotated_bits (int): Largest number of visible bits drawn with annotations
+
+    Returns:
+        bytes: The PNG image
+    """
+    with metrics.stage("plot") as timer:
+        png = figure_to_png(
+            plot_binary_signal(_bits, title, figsize, view, max_annotated_bits)
+        )
+        timer.add(symbols=len(_bits))
+    return png
+
+
+def show_metrics_sidebar():
+    """
+    Sidebar switch for the instrumentation (metrics module) and its live timing breakdown.
+
+    The switch applies to the whole process, so it also covers the
+    background receiver server.
+    """
+    with st.sidebar:
+        metrics.enable(st.toggle("⏱️ Instrumentação", value=metrics.is_enabled()))
+        if metrics.is_enabled():
+            show_stage_timings()
+            st.button("🧹 Zerar medidas", on_click=metrics.reset)
+
+
+@st.fragment(run_every=METRICS_REFRESH_SECONDS)
+def show_stage_timings():
+    """Per-stage and per-connection timings collected so far, refreshed every METRICS_REFRESH_SECONDS."""
+    data = metrics.snapshot()
+    if not data["stages"]:
+        st.caption("Nenhuma etapa medida ainda.")
+        return
+
+    def rate(entry):
+        speed = entry["bytes_per_second"]
+        return round(speed / 1e6, 2) if speed and entry["bytes"] else None
+
+    st.markdown("**Tempo por etapa**")
+    st.bar_chart(
+        {
+            "Etapa": list(data["stages"]),
+            "ms": [entry["seconds"] * 1000 for entry in data["stages"].values()],
+        },
+        x="Etapa",
+        y="ms",
+        horizontal=True,
+    )
+    st.dataframe(
+        [
+            {
+                "Etapa": name,
+                "Execuções": entry["calls"],
+                "Total (ms)": round(entry["seconds"] * 1000, 2),
+                "Última (ms)": round(entry["last_seconds"] * 1000, 2),
+                "Bytes": entry["bytes"],
+                "Símbolos": entry["symbols"],
+                "MB/s": rate(entry),
+            }
+            for name, entry in data["stages"].items()
+        ],
+        hide_index=True,
+        use_container_width=True,
+    )
+    if data["connections"]:
+        st.markdown("**Vazão por conexão**")
+        st.dataframe(
+            [
+                {
+                    "Conexão": peer,
+                    "Mensagens": entry["calls"],
+                    "Bytes": entry["bytes"],
+                    "MB/s": rate(entry),
+                }
+                for peer, entry in data["connections"].items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def show_arq_report(report, sender=True):
+    """Summary of what the ARQ layer retransmitted (sender) or rejected (receiver) for one message."""
+    st.subheader("🔁 Confirmação e Retransmissão (ARQ)")
+    if sender:
+        st.write(
+            f"{report.chunks} trechos confirmados, **{report.retransmitted} retransmissões** "
+            f"({report.corrupt} corrompidos, {report.lost} perdidos, "
+            f"{report.timeouts} por tempo esgotado)"
+        )
+    else:
+        st.write(
+            f"{report.chunks} trechos aceitos, **{report.corrupt} corrompidos** (pedidos de novo), "
+            f"{report.duplicates} duplicados descartados"
+        )
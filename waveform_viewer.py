@@ -0,0 +1,175 @@
+import altair as alt
+import numpy as np
+import pyarrow as pa
+import streamlit as st
+
+# Rows sent to the browser for the overview and for each zoomed window
+OVERVIEW_POINTS = 1000
+DETAIL_POINTS = 2000
+
+# Each pyramid level aggregates this many bins of the level below
+PYRAMID_FACTOR = 4
+
+# Pyramids kept in memory (one per inspected signal)
+PYRAMID_CACHE_ENTRIES = 8
+
+
+class SignalPyramid:
+    """
+    Multi-resolution min/max summary of a signal.
+
+    Level 0 is the signal itself; level k holds the minimum and maximum of
+    consecutive bins of PYRAMID_FACTOR**k samples, down to a level small
+    enough for the overview. Any window can then be served at the finest
+    resolution that fits in a fixed number of points, so the cost of a zoom
+    does not depend on the length of the signal.
+
+    Args:
+        signal (numpy.ndarray): The signal samples
+        factor (int): Bins merged from one level to the next
+        min_size (int): Largest number of bins at the coarsest level
+    """
+
+    def __init__(self, signal, factor=PYRAMID_FACTOR, min_size=OVERVIEW_POINTS):
+        signal = np.asarray(signal, dtype=np.float32)
+        self.factor = factor
+        self.length = len(signal)
+        self.levels = [(signal, signal)]
+        while len(self.levels[-1][0]) > min_size:
+            low, high = self.levels[-1]
+            pad = (-len(low)) % factor
+            low = np.pad(low, (0, pad), mode="edge").reshape(-1, factor).min(axis=1)
+            high = np.pad(high, (0, pad), mode="edge").reshape(-1, factor).max(axis=1)
+            self.levels.append((low, high))
+
+    def bin_size(self, level):
+        return self.factor**level
+
+    def level_for(self, span, max_points):
+        """Return the finest level showing span samples in at most max_points bins."""
+        for level in range(len(self.levels)):
+            if -(-span // self.bin_size(level)) <= max_points:
+                return level
+        return len(self.levels) - 1
+
+    def window(self, start, stop, max_points=DETAIL_POINTS):
+        """
+        Summarize the samples in [start, stop) for plotting.
+
+        Args:
+            start (int): First sample of the window
+            stop (int): End of the window (exclusive)
+            max_points (int): Largest number of bins returned
+
+        Returns:
+            tuple: (pyarrow.Table with columns time/low/high, bin size in samples).
+                The last row repeats the last bin at time=stop so step
+                interpolation draws it with its full width.
+        """
+        start = max(0, min(int(start), self.length))
+        stop = max(start, min(int(stop), self.length))
+        if start == stop:  # Empty selection: widen it to one sample
+            start, stop = min(start, self.length - 1), min(start, self.length - 1) + 1
+        level = self.level_for(stop - start, max_points)
+        size = self.bin_size(level)
+        low, high = self.levels[level]
+
+        first, last = start // size, -(-stop // size)
+        time = np.minimum(np.arange(first, last + 1) * size, self.length)
+        time[0], time[-1] = start, stop
+        low = low[first:last]
+        high = high[first:last]
+        table = pa.table(
+            {
+                "time": time,
+                "low": np.append(low, low[-1:]),
+                "high": np.append(high, high[-1:]),
+            }
+        )
+        return table, size
+
+
+@st.cache_resource(max_entries=PYRAMID_CACHE_ENTRIES, show_spinner=False)
+def get_pyramid(key, _signal):
+    """Build (once per content key, see visualization.content_key) the pyramid of a signal."""
+    return SignalPyramid(_signal)
+
+
+def waveform_chart(table, bin_size, title, height=250):
+    """
+    Altair chart of a pyramid window.
+
+    Full-resolution windows are drawn as a step line; aggregated windows as
+    a min/max band, one step per bin.
+
+    Args:
+        table (pyarrow.Table): Window returned by SignalPyramid.window
+        bin_size (int): Samples per row of the table
+        title (str): The title of the chart
+        height (int): Chart height in pixels
+
+    Returns:
+        altair.Chart: The chart
+    """
+    x = alt.X("time:Q", title="Tempo (unidades de bit)", scale=alt.Scale(nice=False))
+    chart = alt.Chart(table, title=title, height=height)
+    if bin_size == 1:
+        return chart.mark_line(interpolate="step-after", color="#2E86AB").encode(
+            x=x,
+            y=alt.Y("low:Q", title="Amplitude do Sinal"),
+            tooltip=[alt.Tooltip("time:Q", title="Tempo"), alt.Tooltip("low:Q", title="Nível")],
+        )
+    return chart.mark_area(
+        interpolate="step-after", color="#2E86AB", opacity=0.5
+    ).encode(
+        x=x,
+        y=alt.Y("low:Q", title="Amplitude do Sinal"),
+        y2="high:Q",
+    )
+
+
+def show_waveform_viewer(signal, key, title="Forma de onda do sinal"):
+    """
+    Interactive waveform viewer: overview plus a zoomed window.
+
+    Only the downsampled overview (OVERVIEW_POINTS rows) and the current
+    window (DETAIL_POINTS rows) are sent to the browser. Selecting a range
+    on the overview reruns the script and fetches that range from the
+    cached pyramid at the finest resolution that fits.
+
+    Args:
+        signal (numpy.ndarray): The signal to inspect
+        key (str): Content key of the signal (visualization.content_key)
+        title (str): Title of the overview chart
+    """
+    if len(signal) == 0:
+        st.write("Sinal vazio.")
+        return
+
+    pyramid = get_pyramid(key, signal)
+    overview, overview_bin = pyramid.window(0, pyramid.length, OVERVIEW_POINTS)
+    brush = alt.selection_interval(encodings=["x"], name="zoom")
+    event = st.altair_chart(
+        waveform_chart(overview, overview_bin, title, height=150).add_params(brush),
+        use_container_width=True,
+        on_select="rerun",
+        key=f"waveform-overview-{key}",
+    )
+
+    selected = event.selection.get("zoom", {}).get("time") if event else None
+    if selected:
+        start, stop = int(np.floor(selected[0])), int(np.ceil(selected[1]))
+    else:
+        start, stop = 0, min(pyramid.length, DETAIL_POINTS)
+
+    detail, detail_bin = pyramid.window(start, stop, DETAIL_POINTS)
+    resolution = (
+        "resolução completa"
+        if detail_bin == 1
+        else f"mín/máx a cada {detail_bin} símbolos"
+    )
+    st.altair_chart(
+        waveform_chart(detail, detail_bin, f"Símbolos {start}–{stop} ({resolution})"),
+        use_container_width=True,
+    )
+    st.caption("Selecione um trecho no gráfico de visão geral para ampliá-lo.")